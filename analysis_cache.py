@@ -0,0 +1,90 @@
+# analysis_cache.py
+"""Shared on-disk cache for per-document analysis results.
+
+Results are Arrow tables stored as Parquet files, named by analyzer, the
+analyzer's version and the SHA-256 of the PDF. An identical handout
+uploaded in another session, or after a server restart, is not analyzed
+again. Bumping an analyzer's version invalidates its old entries, which
+are deleted on the next write. The least recently used files are evicted
+once the cache grows past its size budget.
+
+    ANALYSIS_CACHE_DIR=/var/tmp/...  (default: a temp directory)
+    ANALYSIS_CACHE_MAX_MB=512
+"""
+
+import hashlib
+import os
+import re
+import tempfile
+from functools import partial
+
+import pyarrow.parquet as pq
+
+from disk_cache import DiskCache
+
+CACHE_DIR = os.environ.get(
+    'ANALYSIS_CACHE_DIR',
+    os.path.join(tempfile.gettempdir(), 'faculty-tools-analysis')
+)
+CACHE_MAX_BYTES = int(float(os.environ.get('ANALYSIS_CACHE_MAX_MB', 512)) * 1024 * 1024)
+
+ENTRY_PATTERN = re.compile(r'(?P<analyzer>\w+)-v(?P<version>\d+)-(?P<sha>[0-9a-f]{64})\.parquet')
+
+
+def content_hash(pdf_bytes):
+    """Return the SHA-256 hex digest that keys a document's cache entries"""
+    return hashlib.sha256(pdf_bytes).hexdigest()
+
+
+class AnalysisCache(DiskCache):
+    """Disk cache of Arrow tables stored as Parquet files"""
+
+    suffix = '.parquet'
+
+    def __init__(self, cache_dir=CACHE_DIR, max_bytes=CACHE_MAX_BYTES):
+        super().__init__(cache_dir, max_bytes)
+        self._pruned = set()
+        self._counters = {'hits': 0, 'misses': 0, 'writes': 0, 'evictions': 0, 'invalidations': 0}
+
+    @staticmethod
+    def _name(sha, analyzer, version):
+        return f"{analyzer}-v{version}-{sha}"
+
+    def get(self, sha, analyzer, version):
+        """Return the cached Arrow table, or None on a miss"""
+        table = self._read(self._name(sha, analyzer, version), pq.read_table)
+        with self._lock:
+            self._counters['misses' if table is None else 'hits'] += 1
+        return table
+
+    def put(self, sha, analyzer, version, table):
+        """Store an Arrow table and evict old entries if over budget"""
+        self._invalidate(analyzer, version)
+        evicted = self._write(
+            self._name(sha, analyzer, version), partial(pq.write_table, table, compression='zstd')
+        )
+        with self._lock:
+            self._counters['writes'] += 1
+            self._counters['evictions'] += evicted
+
+    def stats(self):
+        """Return cache metrics for monitoring"""
+        with self._lock:
+            entries, total = self._scan()
+            return {'entries': len(entries), 'bytes': total, 'max_bytes': self.max_bytes, **self._counters}
+
+    def _invalidate(self, analyzer, version):
+        # Once per analyzer and version: drop entries written by other versions
+        if (analyzer, version) in self._pruned:
+            return
+        with self._lock:
+            for entry in os.scandir(self.cache_dir):
+                match = ENTRY_PATTERN.fullmatch(entry.name)
+                if match and match['analyzer'] == analyzer and int(match['version']) != version:
+                    try:
+                        os.remove(entry.path)
+                        self._counters['invalidations'] += 1
+                    except FileNotFoundError:
+                        pass
+            self._total_bytes = None
+            self._pruned.add((analyzer, version))
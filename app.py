@@ -1,8 +1,13 @@
 import streamlit as st
 import pandas as pd
-from ics import Calendar
 from datetime import datetime, timedelta
+import io
 import re
+from itertools import islice
+
+from course_index import CourseIndex
+from ics_events import CalendarParseError, iter_events, shift_lines
+from recurrence import EventTimeline, as_utc
 
 # --- PAGE SETUP ---
 st.set_page_config(page_title="Faculty Tools", page_icon="📚", layout="wide")
@@ -53,6 +58,8 @@ st.markdown("""
 
 # --- CONSTANTS ---
 COURSE_PATTERN = r'([A-Z]{3,4}\s*[-]?\s*\d{4}(?:[\s-][A-Z0-9]{4,6})?)'
+# How far repeating events are listed when nothing in the calendar ends
+DEFAULT_SEMESTER_LENGTH = timedelta(weeks=17)
 TIME_PATTERN = r'(\d{1,2}:\d{2}\s*[AP]M)\s*-\s*(\d{1,2}:\d{2}\s*[AP]M)'
 MONTHS = ["", "January", "February", "March", "April", "May", "June", 
           "July", "August", "September", "October", "November", "December"]
@@ -70,12 +77,32 @@ HOUR_MAP = {
 
 @st.cache_data
 def parse_calendar_file(file_contents):
-    """Parse ICS calendar file with caching"""
+    """Parse the events of an ICS calendar file with caching.
+
+    Returns:
+        (list of events, CourseIndex of the codes they mention), or (None, None)
+    """
     try:
-        return Calendar(file_contents)
+        events = []
+        course_index = CourseIndex(COURSE_PATTERN)
+        for e in iter_events(file_contents):
+            course_index.add(len(events), e.summary, e.description)
+            events.append(e)
+        return events, course_index
     except Exception as e:
         st.error(f"Error reading calendar file: {str(e)}")
-        return None
+        return None, None
+
+@st.cache_resource(max_entries=16)
+def build_timeline(file_contents, selected_course=None):
+    """Index a parsed calendar's events, or one course's, for date window queries.
+
+    Built once per file and course and shared read-only between reruns.
+    """
+    events, course_index = parse_calendar_file(file_contents)
+    if selected_course:
+        events = [events[i] for i in course_index.event_ids(selected_course)]
+    return EventTimeline(events)
 
 def get_minutes(time_str):
     """Convert time string to minutes since midnight"""
@@ -111,22 +138,6 @@ def parse_office_hours_time(time_str):
         h += 12
     return h * 60 + m
 
-def extract_course_codes(events):
-    """Extract unique course codes from calendar events"""
-    found_codes = []
-    for e in events:
-        found_codes.extend(re.findall(COURSE_PATTERN, e.name))
-        if e.description:
-            found_codes.extend(re.findall(COURSE_PATTERN, e.description))
-    
-    unique_raw = sorted(list(set(found_codes)), key=len, reverse=True)
-    course_codes = []
-    for code in unique_raw:
-        if not any(code in longer_code for longer_code in course_codes):
-            course_codes.append(code)
-    course_codes.sort()
-    return course_codes
-
 # --- MAIN APP ---
 
 st.title("Faculty Tools")
@@ -161,6 +172,7 @@ if tool_choice == "Syllabus Schedule":
         <strong>Step 2: Generate & Paste</strong>
         <ul>
             <li>Select the specific class from the dropdown menu.</li>
+            <li>Set the first day of the semester, and the last day if you want to stop before the calendar's last event. Repeating events, like weekly quizzes, are listed on every date they occur.</li>
             <li>Copy the HTML code and paste it into the Simple Syllabus HTML/code field (&lt; &gt;).</li>
         </ul>
         </div>
@@ -171,43 +183,55 @@ if tool_choice == "Syllabus Schedule":
     col1, col2 = st.columns(2)
     with col1:
         start_date = st.date_input("First Day of Semester", value=datetime(2026, 1, 12))
+        end_date = st.date_input(
+            "Last Day of Semester", value=None,
+            help="Leave empty to list everything through the calendar's last event"
+        )
         class_format = st.selectbox("Format", ["In-Person", "Hybrid", "Online"])
     with col2:
         uploaded_file = st.file_uploader("Upload your .ics file", type="ics", key="syl_upload")
 
     if uploaded_file:
         with st.spinner("Parsing calendar..."):
-            calendar = parse_calendar_file(uploaded_file.read().decode("utf-8"))
+            calendar_text = uploaded_file.read().decode("utf-8")
+            all_events, course_index = parse_calendar_file(calendar_text)
             
-        if not calendar:
+        if all_events is None:
             st.stop()
             
-        all_events = list(calendar.events)
-        course_codes = extract_course_codes(all_events)
+        course_codes = course_index.course_codes()
         
         selected_course = None
         if len(course_codes) > 1:
             st.info("Multiple sections found. Please select:")
             selected_course = st.selectbox("Select Class & Section:", course_codes)
-            filtered_events = [
-                e for e in all_events 
-                if selected_course in e.name or (e.description and selected_course in e.description)
-            ]
         elif len(course_codes) == 1:
             selected_course = course_codes[0]
-            filtered_events = [
-                e for e in all_events 
-                if selected_course in e.name or (e.description and selected_course in e.description)
-            ]
-        else:
-            filtered_events = all_events
 
-        # Filter events by start date
         start_date_obj = start_date.date() if hasattr(start_date, 'date') else start_date
-        events = sorted(
-            [e for e in filtered_events if e.begin.date() >= start_date_obj],
-            key=lambda x: x.begin
-        )
+        timeline = build_timeline(calendar_text, selected_course)
+        if end_date is None:
+            # Through the last event; repeating events that never end stop there too
+            last_start = timeline.last_start()
+            if last_start is not None and last_start.date() >= start_date_obj:
+                end_date_obj = last_start.date()
+            else:
+                end_date_obj = start_date_obj + DEFAULT_SEMESTER_LENGTH
+            st.caption(f"Listing events through {end_date_obj:%B} {end_date_obj.day}, {end_date_obj.year}.")
+        else:
+            end_date_obj = end_date.date() if hasattr(end_date, 'date') else end_date
+        if end_date_obj < start_date_obj:
+            st.error("The last day of the semester is before the first day.")
+            st.stop()
+
+        # Expand recurring events within the semester; the window has a day to
+        # spare on each side for time zones, and dates are checked exactly below
+        events = [
+            e for e in timeline.between(
+                as_utc(start_date_obj - timedelta(days=1)), as_utc(end_date_obj + timedelta(days=2))
+            )
+            if start_date_obj <= e.start.date() <= end_date_obj
+        ]
 
         if events:
             html_output = ["<div style='font-family: sans-serif; max-width: 800px; margin: 0 auto;'>"]
@@ -216,7 +240,7 @@ if tool_choice == "Syllabus Schedule":
                 # Group by week
                 events_by_week = {}
                 for e in events:
-                    monday = e.begin.date() - timedelta(days=e.begin.date().weekday())
+                    monday = e.start.date() - timedelta(days=e.start.date().weekday())
                     if monday not in events_by_week:
                         events_by_week[monday] = []
                     events_by_week[monday].append(e)
@@ -224,7 +248,7 @@ if tool_choice == "Syllabus Schedule":
                 for week_start in sorted(events_by_week.keys()):
                     week_events = events_by_week[week_start]
                     is_break = any(
-                        "break" in x.name.lower() or "holiday" in x.name.lower() 
+                        "break" in x.summary.lower() or "holiday" in x.summary.lower() 
                         for x in week_events
                     )
                     week_num = ((week_start - start_date_obj).days // 7) + 1
@@ -241,8 +265,8 @@ if tool_choice == "Syllabus Schedule":
                     
                     for e in week_events:
                         display_name = (
-                            e.name.replace(selected_course, "").strip(": ") 
-                            if selected_course else e.name
+                            e.summary.replace(selected_course, "").strip(": ") 
+                            if selected_course else e.summary
                         )
                         style = (
                             "color:#900; font-weight:bold;" 
@@ -256,12 +280,12 @@ if tool_choice == "Syllabus Schedule":
                 # In-person format
                 for e in events:
                     display_name = (
-                        e.name.replace(selected_course, "").strip(": ") 
-                        if selected_course else e.name
+                        e.summary.replace(selected_course, "").strip(": ") 
+                        if selected_course else e.summary
                     )
                     html_output.append(
                         f"<div style='border-bottom:1px solid #eee; padding:10px;'>"
-                        f"<strong>{e.begin.format('ddd, MMM D')}:</strong> {display_name}</div>"
+                        f"<strong>{e.start:%a, %b} {e.start.day}:</strong> {display_name}</div>"
                     )
             
             html_output.append("</div>")
@@ -938,22 +962,26 @@ elif tool_choice == "Date Shifter & Calculator":
     
     if shift_file:
         with st.spinner("Parsing calendar..."):
-            calendar = parse_calendar_file(shift_file.read().decode("utf-8"))
+            calendar_text = shift_file.getvalue().decode("utf-8")
+            shift_events, _ = parse_calendar_file(calendar_text)
         
-        if not calendar:
+        if shift_events is None:
             st.stop()
         
         # Show preview of changes
         st.markdown("### Preview of Changes")
         
-        sample_events = list(calendar.events)[:5]  # Show first 5 events
+        # Show the first 5 events, with recurring events expanded
+        shift_timeline = build_timeline(calendar_text)
+        first_start = shift_timeline.first_start()
+        sample_events = list(islice(shift_timeline.occurrences(first_start), 5)) if first_start else []
         preview_data = []
         
         for e in sample_events:
-            old_date = e.begin.format('YYYY-MM-DD HH:mm')
-            new_date = (e.begin + timedelta(days=final_shift)).format('YYYY-MM-DD HH:mm')
+            old_date = e.start.strftime('%Y-%m-%d %H:%M')
+            new_date = (e.start + timedelta(days=final_shift)).strftime('%Y-%m-%d %H:%M')
             preview_data.append({
-                "Event": e.name[:50] + "..." if len(e.name) > 50 else e.name,
+                "Event": e.summary[:50] + "..." if len(e.summary) > 50 else e.summary,
                 "Old Date": old_date,
                 "New Date": new_date
             })
@@ -963,18 +991,22 @@ elif tool_choice == "Date Shifter & Calculator":
         
         if st.button(f"Generate Shifted ICS (+{final_shift} days)", type="primary"):
             with st.spinner("Shifting dates..."):
-                new_calendar = Calendar()
-                
-                for e in calendar.events:
-                    e.begin += timedelta(days=final_shift)
-                    e.end += timedelta(days=final_shift)
-                    new_calendar.events.add(e)
-                
-                st.success(f"Shifted {len(calendar.events)} events by {final_shift} days!")
+                # Rewrite the uploaded text line by line; the cached events are never touched
+                shift_file.seek(0)
+                reader = io.TextIOWrapper(shift_file, encoding="utf-8", newline="")
+                try:
+                    shifted_calendar = "".join(shift_lines(reader, final_shift))
+                except CalendarParseError as e:
+                    st.error(f"Error shifting calendar file: {str(e)}")
+                    st.stop()
+                finally:
+                    reader.detach()
+                
+                st.success(f"Shifted {len(shift_events)} events by {final_shift} days!")
                 
                 st.download_button(
                     "Download Shifted ICS",
-                    str(new_calendar),
+                    shifted_calendar,
                     "shifted_calendar.ics",
                     mime="text/calendar"
                 )
@@ -0,0 +1,111 @@
+"""Benchmark finding course codes in calendar events and filtering by section.
+
+Run from the repo root:
+
+    python benchmarks/bench_course_index.py
+
+Builds events for a department-wide feed (20k events naming 100 to 3,000
+section codes, with base codes mixed in) and compares the Syllabus tool's
+former approach with CourseIndex. The former approach scanned every event
+with the course pattern, dropped codes contained in longer codes with a
+pairwise substring test, then rescanned all events on each section
+switch. Reports the time to list the codes and the time per section
+switch, and checks that both give the same codes and events.
+"""
+
+import os
+import random
+import re
+import sys
+import time
+from datetime import datetime, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from course_index import CourseIndex  # noqa: E402
+from ics_events import Event  # noqa: E402
+
+COURSE_PATTERN = r'([A-Z]{3,4}\s*[-]?\s*\d{4}(?:[\s-][A-Z0-9]{4,6})?)'
+EVENTS = 20000
+SECTION_COUNTS = [100, 1000, 3000]
+SWITCHES = 20
+
+
+def build_events(sections, seed=23):
+    rng = random.Random(seed)
+    codes = [
+        f"{rng.choice(['ENGL', 'MATH', 'HIST', 'BIOL', 'CHEM', 'PSYC'])} {rng.randrange(1000, 3000)}"
+        f"-{rng.choice(['W', 'O', 'H', '0'])}{rng.randrange(100, 1000)}"
+        for _ in range(sections)
+    ]
+    stamp = datetime(2026, 1, 12, tzinfo=timezone.utc)
+    events = []
+    for n in range(EVENTS):
+        code = rng.choice(codes)
+        base = code.split('-')[0]
+        events.append(Event(
+            uid=str(n), summary=f"{code}: Assignment {n % 30 + 1}",
+            description=f"Due for {base}. Read chapter {n % 12 + 1}." if rng.random() < 0.5 else '',
+            start=stamp, end=stamp, all_day=False,
+        ))
+    return events
+
+
+def rescan_codes(events):
+    """The Syllabus tool's former extract_course_codes"""
+    found_codes = []
+    for e in events:
+        found_codes.extend(re.findall(COURSE_PATTERN, e.summary))
+        if e.description:
+            found_codes.extend(re.findall(COURSE_PATTERN, e.description))
+    unique_raw = sorted(list(set(found_codes)), key=len, reverse=True)
+    course_codes = []
+    for code in unique_raw:
+        if not any(code in longer_code for longer_code in course_codes):
+            course_codes.append(code)
+    course_codes.sort()
+    return course_codes
+
+
+def rescan_filter(events, selected_course):
+    return [e for e in events if selected_course in e.summary or (e.description and selected_course in e.description)]
+
+
+def index_codes(events):
+    course_index = CourseIndex(COURSE_PATTERN)
+    for event_id, e in enumerate(events):
+        course_index.add(event_id, e.summary, e.description)
+    return course_index, course_index.course_codes()
+
+
+def main():
+    print(f"{EVENTS} events")
+    print(f"{'sections':>9} {'codes':>6} {'rescan list ms':>15} {'index list ms':>14} "
+          f"{'rescan switch ms':>17} {'index switch ms':>16}")
+    for sections in SECTION_COUNTS:
+        events = build_events(sections)
+        rng = random.Random(sections)
+
+        start = time.perf_counter()
+        codes = rescan_codes(events)
+        rescan_list = time.perf_counter() - start
+        start = time.perf_counter()
+        course_index, index_list_codes = index_codes(events)
+        index_list = time.perf_counter() - start
+        assert codes == index_list_codes
+
+        selections = [rng.choice(codes) for _ in range(SWITCHES)]
+        start = time.perf_counter()
+        expected = [rescan_filter(events, code) for code in selections]
+        rescan_switch = (time.perf_counter() - start) / SWITCHES
+        start = time.perf_counter()
+        found = [[events[i] for i in course_index.event_ids(code)] for code in selections]
+        index_switch = (time.perf_counter() - start) / SWITCHES
+        assert expected == found
+
+        print(f"{sections:>9} {len(codes):>6} {rescan_list * 1000:>15.1f} {index_list * 1000:>14.1f} "
+              f"{rescan_switch * 1000:>17.2f} {index_switch * 1000:>16.3f}")
+
+
+if __name__ == '__main__':
+    main()
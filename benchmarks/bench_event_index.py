@@ -0,0 +1,84 @@
+"""Benchmark date-window queries over a feed's events.
+
+Run from the repo root:
+
+    python benchmarks/bench_event_index.py
+
+Builds feeds of 10k to 200k one-off events (due dates, class meetings and
+a few multi-day breaks and projects spread over six years) and answers
+200 "events overlapping the next 7 days" queries two ways: sorting the
+feed and scanning every event, as the podium's Upcoming card did on every
+rerun, and with an IntervalIndex built once. Reports the build time and
+the time per query, and checks that both find the same events.
+"""
+
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from event_index import IntervalIndex, overlaps  # noqa: E402
+from ics_events import Event  # noqa: E402
+
+EVENT_COUNTS = [10000, 50000, 200000]
+QUERIES = 200
+FIRST_DAY = datetime(2020, 1, 6, tzinfo=timezone.utc)
+SPAN_DAYS = 6 * 365
+
+
+def build_events(count, seed=25):
+    rng = random.Random(seed)
+    events = []
+    for n in range(count):
+        start = FIRST_DAY + timedelta(minutes=rng.randrange(SPAN_DAYS * 24 * 60))
+        kind = rng.random()
+        if kind < 0.6:
+            length = timedelta(0)  # Due date
+        elif kind < 0.98:
+            length = timedelta(minutes=rng.choice([50, 75, 110]))
+        else:
+            length = timedelta(days=rng.randrange(2, 60))  # Break or project
+        events.append(Event(uid=str(n), summary=f"Event {n}", description='', start=start, end=start + length,
+                            all_day=False))
+    return events
+
+
+def scan(events, t0, t1):
+    return [e for e in sorted(events, key=lambda e: e.start) if overlaps(e, t0, t1)]
+
+
+def main():
+    rng = random.Random(1)
+    windows = []
+    for _ in range(QUERIES):
+        t0 = FIRST_DAY + timedelta(days=rng.randrange(SPAN_DAYS))
+        windows.append((t0, t0 + timedelta(days=7)))
+
+    print(f"{QUERIES} queries of 7 days")
+    print(f"{'events':>7} {'found':>6} {'build ms':>9} {'scan ms/query':>14} {'index ms/query':>15}")
+    for count in EVENT_COUNTS:
+        events = build_events(count)
+        start = time.perf_counter()
+        index = IntervalIndex(events)
+        build = time.perf_counter() - start
+
+        scan_windows = windows[:max(1, QUERIES * 10000 // count)]  # The scan is slow; fewer queries
+        start = time.perf_counter()
+        expected = [scan(events, t0, t1) for t0, t1 in scan_windows]
+        scan_time = (time.perf_counter() - start) / len(scan_windows)
+
+        start = time.perf_counter()
+        found = [index.overlapping(t0, t1) for t0, t1 in windows]
+        index_time = (time.perf_counter() - start) / len(windows)
+
+        for want, got in zip(expected, found):
+            assert sorted(e.uid for e in want) == sorted(e.uid for e in got)
+        average = sum(len(f) for f in found) / len(found)
+        print(f"{count:>7} {average:>6.0f} {build * 1000:>9.1f} {scan_time * 1000:>14.2f} {index_time * 1000:>15.3f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,59 @@
+"""Benchmark line extraction for the accessibility tagger.
+
+Run from the repo root:
+
+    python benchmarks/bench_extraction.py
+
+Compares the old sequential get_text("dict") loop, image blocks included,
+with extract_lines on 100- and 300-page chapters from the heading corpus.
+The pool is started and warmed up first, as the app's shared pool would be.
+"""
+
+import os
+import sys
+import time
+
+import fitz
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pdf_structure  # noqa: E402
+from process_pool import MAX_WORKERS, spawn_pool  # noqa: E402
+from heading_corpus import build_document  # noqa: E402
+
+SIZES = [100, 300]
+
+
+def legacy_extract(pdf_bytes):
+    """Sequential extraction with default flags, as analyze_pdf_hierarchy did"""
+    doc = fitz.open(stream=pdf_bytes, filetype="pdf")
+    lines = 0
+    for page in doc:
+        for block in page.get_text("dict")["blocks"]:
+            if block["type"] == 0:
+                lines += len(block["lines"])
+    doc.close()
+    return lines
+
+
+def main():
+    executor = spawn_pool()
+    pdf_structure.extract_lines(build_document('textbook', pages=40)[0], executor=executor)
+    print(f"{MAX_WORKERS} worker(s)")
+    print(f"{'pages':>6} {'impl':>10} {'seconds':>9} {'lines':>8}")
+    for pages in SIZES:
+        pdf_bytes, _ = build_document('textbook', pages=pages)
+
+        start = time.perf_counter()
+        lines = legacy_extract(pdf_bytes)
+        print(f"{pages:>6} {'sequential':>10} {time.perf_counter() - start:>9.3f} {lines:>8}")
+
+        start = time.perf_counter()
+        lines = pdf_structure.extract_lines(pdf_bytes, executor=executor)
+        print(f"{pages:>6} {'pool':>10} {time.perf_counter() - start:>9.3f} {len(lines):>8}")
+    executor.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+"""Benchmark the heading classifier against the labeled fixture corpus.
+
+Run from the repo root:
+
+    python benchmarks/bench_headings.py
+
+For each corpus document, reports classification throughput in lines per
+second and the share of lines whose tag matches the label, for both the
+old rule-based tagger and the font-statistics classifier.
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pdf_structure  # noqa: E402
+from heading_corpus import build_document  # noqa: E402
+
+DOCUMENTS = [
+    ('textbook', {'pages': 300}),
+    ('syllabus', {}),
+    ('article', {}),
+    ('newsletter', {}),
+]
+
+
+def legacy_suggest_tags(text_elements):
+    """Rule-based tagging that classify_lines replaced"""
+    tags = []
+    for i, elem in enumerate(text_elements):
+        char_count = elem['char_count']
+        word_count = elem['word_count']
+        if char_count > 300:
+            tags.append('Body Text')
+        elif char_count < 100 and word_count <= 10:
+            has_space_before = i == 0 or text_elements[i-1]['char_count'] > 200
+            has_space_after = i == len(text_elements)-1 or text_elements[i+1]['char_count'] > 200
+            if has_space_before or has_space_after:
+                tags.append('H1' if elem['y_position'] < 200 else 'H2')
+            else:
+                tags.append('H3')
+        elif 50 <= char_count <= 200:
+            tags.append('H3' if elem['bold'] or elem['italic'] else 'Body Text')
+        else:
+            tags.append('Body Text')
+    return tags
+
+
+def agreement(text_elements, tags, labels):
+    """Share of all lines, and of labeled heading lines, tagged as labeled"""
+    matched = headings = headings_matched = 0
+    for elem, tag in zip(text_elements, tags):
+        label = labels.get((elem['page'], elem['text']), 'Body Text')
+        matched += tag == label
+        if label != 'Body Text':
+            headings += 1
+            headings_matched += tag == label
+    return matched / len(tags), headings_matched / max(headings, 1)
+
+
+def timed(func, text_elements, repeat=5):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        tags = func(text_elements)
+        best = min(best, time.perf_counter() - start)
+    return tags, best
+
+
+def main():
+    print(f"{'document':>9} {'lines':>7} {'tagger':>10} {'lines/s':>11} {'agreement':>10} {'headings':>9}")
+    for name, kwargs in DOCUMENTS:
+        pdf_bytes, labels = build_document(name, **kwargs)
+        lines = pdf_structure.extract_lines(pdf_bytes)
+        # The rule-based tagger ran over line dicts
+        text_elements = list(lines)
+        for tagger, func, data in (('rules', legacy_suggest_tags, text_elements),
+                                   ('fontstats', pdf_structure.classify_lines, lines)):
+            tags, elapsed = timed(func, data)
+            overall, heading = agreement(text_elements, tags, labels)
+            print(
+                f"{name:>9} {len(text_elements):>7} {tagger:>10} {len(text_elements) / elapsed:>11,.0f} "
+                f"{overall:>10.1%} {heading:>9.1%}"
+            )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,142 @@
+"""Benchmark reading Canvas-style calendar feeds.
+
+Run from the repo root:
+
+    python benchmarks/bench_ics.py [--skip-ics-above 10000]
+
+Builds feeds of 1k, 10k and 100k events like a multi-year instructor feed
+(UTC due dates, all-day events, TZID class meetings, folded descriptions
+with escaped text) and times ics.Calendar against ics_events.iter_events.
+Reports parse time, the growth in peak memory while parsing (read from
+/proc, so Linux only) and the pickled size that st.cache_data stores.
+Each reader runs on each feed in a fresh process so the peaks do not
+mix. Before timing, checks that both readers agree on every event's
+summary, start and end.
+
+ics.Calendar takes several minutes on the 100k-event feed.
+"""
+
+import argparse
+import json
+import os
+import pickle
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from ics import Calendar
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ics_events import iter_events  # noqa: E402
+
+EVENT_COUNTS = [1000, 10000, 100000]
+COURSES = ['ENGL-1170-01', 'ENGL-1181-W02', 'ENGL-1190-OL1', 'ENGL-1210-03', 'ENGL-1220-02']
+
+
+def fold(line):
+    """Fold a content line at 75 octets, as feed writers do"""
+    parts = [line[:75]]
+    parts.extend(' ' + line[i:i + 74] for i in range(75, len(line), 74))
+    return '\r\n'.join(parts)
+
+
+def build_feed(events, seed=21):
+    """Return the text of a feed with the given number of events"""
+    rng = random.Random(seed)
+    start = datetime(2019, 8, 26)
+    out = ['BEGIN:VCALENDAR', 'VERSION:2.0', 'PRODID:-//Instructure//Canvas//EN', 'X-WR-CALNAME:Calendar']
+    for n in range(events):
+        course = rng.choice(COURSES)
+        day = start + timedelta(days=rng.randrange(6 * 365), minutes=rng.randrange(0, 24 * 60, 5))
+        out += ['BEGIN:VEVENT', f'UID:event-assignment-{n}@canvas.example.edu']
+        kind = rng.random()
+        if kind < 0.15:
+            out += [f'DTSTART;VALUE=DATE:{day:%Y%m%d}', f'DTEND;VALUE=DATE:{day + timedelta(days=1):%Y%m%d}',
+                    f'SUMMARY:{course}: No class\\, campus closed']
+        elif kind < 0.45:
+            out += [f'DTSTART;TZID=America/New_York:{day:%Y%m%dT%H%M00}', 'DURATION:PT1H15M',
+                    f'SUMMARY:{course}: Class meeting']
+        else:
+            out += [f'DTSTART:{day:%Y%m%dT%H%M00Z}', f'DTEND:{day:%Y%m%dT%H%M00Z}',
+                    f'SUMMARY:Essay {n % 40 + 1} due [{course}]']
+        description = ' '.join(rng.choice(['Read', 'chapter', 'submit', 'the', 'draft', 'peer', 'review;', 'notes,'])
+                               for _ in range(rng.randrange(5, 60)))
+        out.append(fold('DESCRIPTION:' + description.replace(';', '\\;').replace(',', '\\,') + '\\nSee Canvas.'))
+        out += ['BEGIN:VALARM', 'ACTION:DISPLAY', 'DESCRIPTION:Reminder', 'TRIGGER:-PT15M', 'END:VALARM', 'END:VEVENT']
+    out.append('END:VCALENDAR')
+    return '\r\n'.join(out) + '\r\n'
+
+
+READERS = {
+    'ics': lambda text: list(Calendar(text).events),
+    'stream': lambda text: list(iter_events(text)),
+}
+
+
+def memory_status(field):
+    """Read a memory figure, in bytes, from /proc/self/status (Linux)"""
+    with open('/proc/self/status') as f:
+        for line in f:
+            if line.startswith(field + ':'):
+                return int(line.split()[1]) * 1024
+
+
+def measure(reader, feed_path):
+    """Parse a feed file with one reader; runs in its own process"""
+    with open(feed_path, encoding='utf-8', newline='') as f:
+        text = f.read()
+    # Reset the peak so decoding the file does not hide the parser's own peak
+    with open('/proc/self/clear_refs', 'w') as f:
+        f.write('5')
+    before = memory_status('VmRSS')
+    start = time.perf_counter()
+    events = READERS[reader](text)
+    seconds = time.perf_counter() - start
+    peak = memory_status('VmHWM') - before
+    pickled = len(pickle.dumps(events, protocol=pickle.HIGHEST_PROTOCOL))
+    print(json.dumps({'seconds': seconds, 'peak': peak, 'pickled': pickled}))
+
+
+def check_agreement(text):
+    """Both readers must find the same events"""
+    expected = sorted((e.name, e.begin.datetime, e.end.datetime) for e in Calendar(text).events)
+    found = sorted((e.summary, e.start, e.end) for e in iter_events(text))
+    assert expected == found, "ics.Calendar and iter_events disagree"
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--skip-ics-above', type=int, default=None,
+                        help="Skip ics.Calendar for feeds with more events than this")
+    parser.add_argument('--measure', nargs=2, metavar=('READER', 'FEED'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.measure:
+        measure(*args.measure)
+        return
+
+    check_agreement(build_feed(300))
+    print(f"{'events':>7} {'feed MB':>8} {'reader':>8} {'seconds':>8} {'peak MB':>8} {'pickled MB':>11}")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for count in EVENT_COUNTS:
+            text = build_feed(count)
+            feed_path = os.path.join(tmp_dir, f'{count}.ics')
+            with open(feed_path, 'w', encoding='utf-8', newline='') as f:
+                f.write(text)
+            for reader in READERS:
+                if reader == 'ics' and args.skip_ics_above is not None and count > args.skip_ics_above:
+                    continue
+                output = subprocess.run(
+                    [sys.executable, __file__, '--measure', reader, feed_path],
+                    check=True, capture_output=True, text=True
+                ).stdout
+                result = json.loads(output.splitlines()[-1])
+                print(f"{count:>7} {len(text) / 1e6:>8.1f} {reader:>8} {result['seconds']:>8.2f} "
+                      f"{result['peak'] / 1e6:>8.1f} {result['pickled'] / 1e6:>11.1f}", flush=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,131 @@
+"""Benchmark the reading-order stage and line matching on dense pages.
+
+Run from the repo root:
+
+    python benchmarks/bench_layout.py
+
+First reports how often each line is followed by the right line, in
+content order and after reading_order, on the corpus documents; the
+newsletter is drawn row by row across its two columns. Then times one
+page holding a shuffled grid of 500 to 5,000 table cells: extraction,
+reading_order, and matching the page's text operators to lines with the
+tagger's LineIndex against a scan over every line.
+"""
+
+import os
+import random
+import sys
+import time
+from io import BytesIO
+
+import fitz
+import numpy as np
+from pypdf import PdfReader
+from pypdf.generic import ContentStream
+from reportlab.lib.pagesizes import letter
+from reportlab.pdfgen import canvas
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pdf_structure  # noqa: E402
+import pdf_tagging  # noqa: E402
+from heading_corpus import build_document  # noqa: E402
+from line_table import LineTable  # noqa: E402
+from pdf_layout import order_lines, reading_order  # noqa: E402
+
+DOCUMENTS = [
+    ('textbook', {'pages': 30}),
+    ('article', {}),
+    ('newsletter', {}),
+]
+CELL_COUNTS = [500, 2000, 5000]
+GRID_COLUMNS = 20
+
+
+class ScanIndex:
+    """Compares a text origin with every line on the page"""
+
+    def __init__(self, boxes):
+        self.boxes = list(boxes)
+
+    def match(self, x, y):
+        return pdf_tagging.match_line(self.boxes, x, y)
+
+
+def content_order(pdf_bytes):
+    """Lines as PyMuPDF returns them, before reading_order"""
+    doc = fitz.open(stream=pdf_bytes, filetype="pdf")
+    lines = LineTable.from_elements(
+        [elem for page_num, page in enumerate(doc) for elem in pdf_structure.page_lines(page, page_num)]
+    )
+    doc.close()
+    return lines
+
+
+def successor_agreement(lines, labels):
+    """Share of lines followed by the line that follows them in the labels"""
+    expected = list(labels)
+    successor = dict(zip(expected, expected[1:]))
+    keys = list(zip(lines.page.tolist(), lines.text))
+    return np.mean([successor.get(a) == b for a, b in zip(keys, keys[1:])])
+
+
+def grid_page(cells, seed=5):
+    """One page of table cells, drawn in shuffled order"""
+    rng = random.Random(seed)
+    rows = cells // GRID_COLUMNS
+    pitch = 640 / rows
+    size = min(8, pitch * 0.8)
+    width = 468 / GRID_COLUMNS
+    positions = [(row, col) for row in range(rows) for col in range(GRID_COLUMNS)]
+    rng.shuffle(positions)
+    packet = BytesIO()
+    pdf = canvas.Canvas(packet, pagesize=letter)
+    pdf.setFont("Helvetica", size)
+    for row, col in positions:
+        pdf.drawString(72 + col * width, 720 - row * pitch, f"{rng.randint(50, 100)}.{rng.randint(0, 9)}")
+    pdf.showPage()
+    pdf.save()
+    return packet.getvalue()
+
+
+def timed(func, *args, repeat=3):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(*args)
+        best = min(best, time.perf_counter() - start)
+    return result, best
+
+
+def main():
+    print(f"{'document':>10} {'lines':>6} {'content order':>14} {'reading order':>14}")
+    for name, kwargs in DOCUMENTS:
+        pdf_bytes, labels = build_document(name, **kwargs)
+        lines = content_order(pdf_bytes)
+        print(f"{name:>10} {len(lines):>6} {successor_agreement(lines, labels):>14.1%} "
+              f"{successor_agreement(order_lines(lines), labels):>14.1%}")
+
+    print()
+    print(f"{'cells':>6} {'lines':>6} {'extract ms':>11} {'order ms':>9} {'scan ms':>8} {'index ms':>9}")
+    for cells in CELL_COUNTS:
+        pdf_bytes = grid_page(cells)
+        lines, extract_seconds = timed(content_order, pdf_bytes)
+        order, order_seconds = timed(reading_order, lines.bbox)
+        lines = lines.take(order)
+
+        boxes = [(x0, y0, x1, y1, group) for group, (x0, y0, x1, y1) in enumerate(lines.bbox.tolist())]
+        group_types = ['/P'] * len(lines)
+        reader = PdfReader(BytesIO(pdf_bytes))
+        operations = ContentStream(reader.pages[0].get_contents(), reader).operations
+        timings = []
+        for index in (ScanIndex, pdf_tagging.LineIndex):
+            _, seconds = timed(pdf_tagging.mark_operations, operations, index(boxes), group_types, repeat=1)
+            timings.append(seconds)
+        print(f"{cells:>6} {len(lines):>6} {extract_seconds * 1000:>11.1f} {order_seconds * 1000:>9.1f} "
+              f"{timings[0] * 1000:>8.1f} {timings[1] * 1000:>9.1f}")
+
+
+if __name__ == '__main__':
+    main()
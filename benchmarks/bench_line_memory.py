@@ -0,0 +1,71 @@
+"""Benchmark the memory held by a document's text lines.
+
+Run from the repo root:
+
+    python benchmarks/bench_line_memory.py
+
+Extracts a 200-page chapter from the heading corpus and compares the list
+of per-line dicts that session state used to hold with the LineTable that
+replaced it. Reports the memory each keeps alive (measured with
+tracemalloc) and its pickled size, which is what crosses the process pool
+boundary during extraction.
+"""
+
+import gc
+import os
+import pickle
+import sys
+import tracemalloc
+
+import fitz
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pdf_structure  # noqa: E402
+from heading_corpus import build_document  # noqa: E402
+from line_table import LineTable  # noqa: E402
+
+PAGES = 200
+
+
+def legacy_extract(pdf_bytes):
+    """One dict per line with tags filled in, as analyze_pdf_hierarchy kept them"""
+    doc = fitz.open(stream=pdf_bytes, filetype="pdf")
+    text_elements = [elem for page_num, page in enumerate(doc) for elem in pdf_structure.page_lines(page, page_num)]
+    doc.close()
+    for elem, tag in zip(text_elements, pdf_structure.classify_lines(LineTable.from_elements(text_elements))):
+        elem['suggested_tag'] = tag
+        elem['user_tag'] = tag
+    return text_elements
+
+
+def held_bytes(build, pdf_bytes):
+    """Return what build(pdf_bytes) returns, and the bytes it keeps allocated"""
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    result = build(pdf_bytes)
+    gc.collect()
+    held = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    return result, held
+
+
+def main():
+    pdf_bytes, _ = build_document('textbook', pages=PAGES)
+    print(f"{PAGES} pages")
+    print(f"{'format':>10} {'lines':>7} {'held MB':>8} {'bytes/line':>11} {'pickled KB':>11}")
+    for name, build in (
+        ('dicts', legacy_extract),
+        ('LineTable', lambda data: pdf_structure.suggest_tags(pdf_structure.extract_lines(data))),
+    ):
+        lines, held = held_bytes(build, pdf_bytes)
+        pickled = len(pickle.dumps(lines, protocol=pickle.HIGHEST_PROTOCOL))
+        print(f"{name:>10} {len(lines):>7} {held / 1024 / 1024:>8.1f} {held / len(lines):>11.0f} "
+              f"{pickled / 1024:>11.0f}")
+        del lines
+
+
+if __name__ == '__main__':
+    main()
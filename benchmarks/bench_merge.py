@@ -0,0 +1,172 @@
+"""Benchmark the manifest merge engine against the old per-page merge.
+
+Run from the repo root:
+
+    python benchmarks/bench_merge.py
+
+Each (implementation, size) pair runs in a fresh process so the reported
+peak RSS belongs to that merge alone.
+"""
+
+import multiprocessing
+import os
+import resource
+import sys
+import time
+from io import BytesIO
+
+from pypdf import PdfReader, PdfWriter
+from reportlab.pdfgen import canvas
+from reportlab.lib.pagesizes import letter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pdf_merge  # noqa: E402
+
+SIZES = [10, 100, 1000]
+PAGES_PER_FILE = 10
+
+
+def make_source_pdf(num_pages, label):
+    """Build a text PDF with a few lines per page"""
+    packet = BytesIO()
+    can = canvas.Canvas(packet, pagesize=letter)
+    for i in range(num_pages):
+        can.setFont("Helvetica-Bold", 18)
+        can.drawString(72, 720, f"{label} - page {i + 1}")
+        can.setFont("Times-Roman", 11)
+        for line in range(40):
+            can.drawString(72, 690 - line * 15, f"Line {line} of sample course packet text for benchmarking.")
+        can.showPage()
+    can.save()
+    return packet.getvalue()
+
+
+def split_pages(pdf_bytes):
+    """Split a PDF into single-page PDFs the way the old uploader did"""
+    pages = []
+    for i, page in enumerate(PdfReader(BytesIO(pdf_bytes)).pages):
+        writer = PdfWriter()
+        writer.add_page(page)
+        output = BytesIO()
+        writer.write(output)
+        pages.append({'page_num': i + 1, 'bytes': output.getvalue()})
+    return pages
+
+
+def legacy_add_page_numbers(input_pdf_bytes, position='bottom-center', start_num=1):
+    """Per-page reportlab overlay numbering that PageNumberStamper replaced"""
+    reader = PdfReader(BytesIO(input_pdf_bytes))
+    writer = PdfWriter()
+    for page_num, page in enumerate(reader.pages):
+        packet = BytesIO()
+        can = canvas.Canvas(packet, pagesize=letter)
+        page_width = float(page.mediabox.width)
+        page_height = float(page.mediabox.height)
+        x, y = pdf_merge.number_position(position, page_width, page_height)
+        can.setFont("Helvetica", 10)
+        can.drawCentredString(x, y, str(page_num + start_num))
+        can.save()
+        packet.seek(0)
+        page.merge_page(PdfReader(packet).pages[0])
+        writer.add_page(page)
+    output = BytesIO()
+    writer.write(output)
+    return output.getvalue()
+
+
+def legacy_create_toc_page(toc_entries):
+    """Single reportlab TOC document that write_toc_pages replaced"""
+    packet = BytesIO()
+    can = canvas.Canvas(packet, pagesize=letter)
+    can.setFont("Helvetica-Bold", 20)
+    can.drawString(50, 750, "Table of Contents")
+    can.setFont("Helvetica", 12)
+    y_position = 700
+    for entry in toc_entries:
+        if y_position < 50:
+            can.showPage()
+            y_position = 750
+        can.drawString(70, y_position, f"{entry['title']}")
+        can.drawRightString(550, y_position, f"Page {entry['page']}")
+        y_position -= 25
+    can.save()
+    return packet.getvalue()
+
+
+def legacy_merge(pdf_list, add_toc=True, page_num_position='bottom-center', start_num=1):
+    """The merge_pdfs implementation this engine replaced"""
+    writer = PdfWriter()
+    toc_entries = []
+    current_page = 2 if add_toc else 1
+
+    all_pages = []
+    for pdf_info in pdf_list:
+        toc_entries.append({'title': pdf_info['toc_title'], 'page': current_page})
+        for page_info in pdf_info['pages']:
+            reader = PdfReader(BytesIO(page_info['bytes']))
+            all_pages.append(reader.pages[0])
+            current_page += 1
+
+    if add_toc:
+        for page in PdfReader(BytesIO(legacy_create_toc_page(toc_entries))).pages:
+            writer.add_page(page)
+    for page in all_pages:
+        writer.add_page(page)
+
+    output = BytesIO()
+    writer.write(output)
+    merged_bytes = output.getvalue()
+    if page_num_position != 'none':
+        merged_bytes = legacy_add_page_numbers(merged_bytes, page_num_position, start_num)
+    return merged_bytes
+
+
+def build_pdf_list(total_pages):
+    """Split total_pages across source files of PAGES_PER_FILE pages"""
+    pdf_list = []
+    for file_idx in range(max(1, total_pages // PAGES_PER_FILE)):
+        pdf_bytes = make_source_pdf(min(PAGES_PER_FILE, total_pages), f"File {file_idx + 1}")
+        doc_id = pdf_merge.document_id(pdf_bytes)
+        pdf_list.append({
+            'id': doc_id,
+            'name': f"file_{file_idx + 1}.pdf",
+            'bytes': pdf_bytes,
+            'toc_title': f"File {file_idx + 1}",
+            'pages': pdf_merge.extract_pages_from_pdf(pdf_bytes, doc_id),
+        })
+    return pdf_list
+
+
+def run_case(impl, total_pages, results):
+    pdf_list = build_pdf_list(total_pages)
+    if impl == 'legacy':
+        for pdf_info in pdf_list:
+            pdf_info['pages'] = split_pages(pdf_info['bytes'])
+    start = time.perf_counter()
+    if impl == 'legacy':
+        size = len(legacy_merge(pdf_list))
+    else:
+        with pdf_merge.merge_pdfs(pdf_list) as merged:
+            merged.seek(0, os.SEEK_END)
+            size = merged.tell()
+    elapsed = time.perf_counter() - start
+    peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    results.put((elapsed, peak_kb / 1024, size))
+
+
+def main():
+    ctx = multiprocessing.get_context('spawn')
+    print(f"{'pages':>6} {'impl':>8} {'seconds':>9} {'peak RSS MB':>12} {'output KB':>10}")
+    for total_pages in SIZES:
+        for impl in ('legacy', 'engine'):
+            results = ctx.Queue()
+            proc = ctx.Process(target=run_case, args=(impl, total_pages, results))
+            proc.start()
+            elapsed, peak_mb, size = results.get()
+            proc.join()
+            print(f"{total_pages:>6} {impl:>8} {elapsed:>9.3f} {peak_mb:>12.1f} {size / 1024:>10.0f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,61 @@
+"""Benchmark page number stamping on a 1000-page document.
+
+Run from the repo root:
+
+    python benchmarks/bench_numbering.py
+
+Compares the old reportlab overlay per page with PageNumberStamper, which
+appends a small text content stream to each page.
+"""
+
+import os
+import sys
+import time
+from io import BytesIO
+
+from pypdf import PdfReader, PdfWriter
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pdf_merge  # noqa: E402
+from bench_merge import legacy_add_page_numbers, make_source_pdf  # noqa: E402
+
+NUM_PAGES = 1000
+
+
+def stamp_only(pdf_bytes, label_format):
+    """Time stamping alone, excluding parsing and serialization"""
+    reader = PdfReader(BytesIO(pdf_bytes))
+    writer = PdfWriter()
+    pages = [writer.add_page(page) for page in reader.pages]
+    stamper = pdf_merge.PageNumberStamper(writer)
+    labels = pdf_merge.page_labels(len(pages), label_format=label_format, front_matter=4)
+
+    start = time.perf_counter()
+    for page, label in zip(pages, labels):
+        stamper.stamp(page, label)
+    elapsed = time.perf_counter() - start
+
+    writer.write(BytesIO())
+    return elapsed
+
+
+def main():
+    pdf_bytes = make_source_pdf(NUM_PAGES, "Numbering")
+
+    start = time.perf_counter()
+    legacy_add_page_numbers(pdf_bytes)
+    print(f"reportlab overlay, end to end:     {time.perf_counter() - start:8.3f} s")
+
+    start = time.perf_counter()
+    pdf_merge.add_page_numbers(pdf_bytes)
+    print(f"content stream stamp, end to end:  {time.perf_counter() - start:8.3f} s")
+
+    for label_format in ('{n}', 'Page {n} of {total}'):
+        elapsed = stamp_only(pdf_bytes, label_format)
+        print(f"stamping only, {label_format!r:<22} {elapsed:8.3f} s")
+
+
+if __name__ == '__main__':
+    main()
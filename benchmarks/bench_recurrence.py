@@ -0,0 +1,126 @@
+"""Benchmark window queries on feeds with many recurring series.
+
+Run from the repo root:
+
+    python benchmarks/bench_recurrence.py
+
+Builds feeds with 100 to 1,000 recurring series (daily, weekly on set days
+and monthly rules, most with no end, started up to six years before the
+query, with EXDATEs and RECURRENCE-ID overrides) next to 2,000 one-off
+events. Times the podium's 7-day Upcoming window and a 17-week semester
+window three ways:
+
+- EventTimeline as shipped;
+- EventTimeline without moving rule starts forward;
+- expanding every rule from its DTSTART up to the window end and then
+  filtering, which is what expanding a feed without a window amounts to.
+
+All three must return the same occurrences.
+"""
+
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import recurrence  # noqa: E402
+from ics_events import iter_events  # noqa: E402
+
+SERIES_COUNTS = [100, 300, 1000]
+SINGLE_EVENTS = 2000
+QUERY_START = datetime(2026, 1, 12, 5, tzinfo=timezone.utc)
+WINDOWS = [('7 days', timedelta(days=7)), ('semester', timedelta(weeks=17))]
+RULES = [
+    'FREQ=DAILY',
+    'FREQ=WEEKLY;BYDAY=MO,WE',
+    'FREQ=WEEKLY;INTERVAL=2;BYDAY=TU,TH',
+    'FREQ=WEEKLY;UNTIL=20270101T000000Z',
+    'FREQ=MONTHLY;BYMONTHDAY=1,15',
+]
+
+
+def build_feed(series, seed=24):
+    rng = random.Random(seed)
+    out = ['BEGIN:VCALENDAR', 'VERSION:2.0', 'X-WR-TIMEZONE:America/New_York']
+    for n in range(series):
+        start = datetime(2020, 1, 6, rng.randrange(8, 18)) + timedelta(days=rng.randrange(6 * 365))
+        out += ['BEGIN:VEVENT', f'UID:series-{n}', f'DTSTART;TZID=America/New_York:{start:%Y%m%dT%H%M%S}',
+                f'DTEND;TZID=America/New_York:{start + timedelta(minutes=50):%Y%m%dT%H%M%S}',
+                f'RRULE:{rng.choice(RULES)}', f'SUMMARY:ENGL 1181 meeting {n}']
+        for _ in range(3):
+            skipped = start + timedelta(weeks=rng.randrange(1, 400))
+            out.append(f'EXDATE;TZID=America/New_York:{skipped:%Y%m%dT%H%M%S}')
+        out.append('END:VEVENT')
+        if n % 5 == 0:
+            # Move the meeting in the week of the query to the next day
+            moved = start + timedelta(weeks=(QUERY_START.replace(tzinfo=None) - start).days // 7 + 1)
+            out += ['BEGIN:VEVENT', f'UID:series-{n}',
+                    f'RECURRENCE-ID;TZID=America/New_York:{moved:%Y%m%dT%H%M%S}',
+                    f'DTSTART;TZID=America/New_York:{moved + timedelta(days=1):%Y%m%dT%H%M%S}',
+                    f'DTEND;TZID=America/New_York:{moved + timedelta(days=1, minutes=50):%Y%m%dT%H%M%S}',
+                    f'SUMMARY:ENGL 1181 meeting {n} (moved)', 'END:VEVENT']
+    for n in range(SINGLE_EVENTS):
+        due = datetime(2020, 1, 6, 23, 59) + timedelta(days=rng.randrange(7 * 365))
+        out += ['BEGIN:VEVENT', f'UID:single-{n}', f'DTSTART:{due:%Y%m%dT%H%M%SZ}',
+                f'DTEND:{due:%Y%m%dT%H%M%SZ}', f'SUMMARY:Essay {n} due', 'END:VEVENT']
+    out.append('END:VCALENDAR')
+    return '\r\n'.join(out) + '\r\n'
+
+
+def no_fast_forward(timeline):
+    for series in timeline.series:
+        series.step_days = series.step_months = None
+    return timeline
+
+
+def full_expansion(timeline, start, end):
+    """Expand every rule from its start, then keep the window"""
+    found = [event for event in timeline.single if start <= event.start < end]
+    for series in timeline.series:
+        event = series.event
+        starts = set(event.rdate) | {event.start}
+        for moment in series.rule:
+            if moment >= end:
+                break
+            starts.add(moment)
+        found.extend(
+            event._replace(start=moment, end=moment + series.duration, rrule='', rdate=(), exdate=(),
+                           recurrence_id=moment)
+            for moment in starts if start <= moment < end and moment not in series.exdates
+        )
+    return sorted(found, key=lambda event: event.start)
+
+
+def timed(func, repeat=3):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    return result, best
+
+
+def main():
+    print(f"{SINGLE_EVENTS} one-off events")
+    print(f"{'series':>7} {'window':>9} {'occurrences':>12} {'timeline ms':>12} {'no skip ms':>11} {'full ms':>9}")
+    for count in SERIES_COUNTS:
+        events = list(iter_events(build_feed(count)))
+        for label, length in WINDOWS:
+            end = QUERY_START + length
+            expected, timeline_seconds = timed(lambda: recurrence.EventTimeline(events).between(QUERY_START, end))
+            slow, slow_seconds = timed(
+                lambda: no_fast_forward(recurrence.EventTimeline(events)).between(QUERY_START, end)
+            )
+            full, full_seconds = timed(lambda: full_expansion(recurrence.EventTimeline(events), QUERY_START, end))
+            key = [(e.uid, e.start) for e in expected]
+            assert key == [(e.uid, e.start) for e in slow]
+            assert sorted(key) == sorted((e.uid, e.start) for e in full)
+            print(f"{count:>7} {label:>9} {len(expected):>12} {timeline_seconds * 1000:>12.1f} "
+                  f"{slow_seconds * 1000:>11.1f} {full_seconds * 1000:>9.1f}")
+
+
+if __name__ == '__main__':
+    main()
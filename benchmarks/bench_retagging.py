@@ -0,0 +1,130 @@
+"""Check and time tagging PDFs that are already tagged.
+
+Run from the repo root:
+
+    python benchmarks/bench_retagging.py
+
+Tags corpus documents, then tags the output again, as happens when a
+teacher runs a handout through the tagger twice or uploads a Word export.
+Each document is re-tagged in two forms:
+
+- this tool's own output, with inline <</MCID n>> property lists and
+  /Artifact BMC sequences;
+- a Word-style export of it, whose MCIDs are named in the page's
+  /Properties resources (/P /MC0 BDC) and whose running headers are
+  /Artifact <</Type /Pagination>> BDC sequences.
+
+A re-tagged page must number its MCIDs 0..n-1, map each one through the
+ParentTree to an element that lists it, and never put a sequence with an
+MCID inside other marked content. Text in a kept Artifact must stay
+without an MCID. Exits with status 1 if any page breaks these rules.
+"""
+
+import os
+import sys
+import time
+from io import BytesIO
+
+from pypdf import PdfReader, PdfWriter
+from pypdf.generic import ContentStream, DecodedStreamObject, DictionaryObject, NameObject
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pdf_structure  # noqa: E402
+import pdf_tagging  # noqa: E402
+from heading_corpus import build_document  # noqa: E402
+
+DOCUMENTS = [('textbook', {'pages': 20}), ('syllabus', {}), ('article', {})]
+
+
+def tag(pdf_bytes):
+    lines = pdf_structure.suggest_tags(pdf_structure.extract_lines(pdf_bytes, parallel=False))
+    return pdf_tagging.create_tagged_pdf(pdf_bytes, lines)
+
+
+def word_style(tagged, header):
+    """Name each MCID property list in /Properties and turn running headers into Pagination artifacts"""
+    reader = PdfReader(BytesIO(tagged))
+    writer = PdfWriter(clone_from=reader)
+    for page in writer.pages:
+        content = ContentStream(page.get_contents(), writer)
+        named = DictionaryObject()
+        operations = []
+        in_header = False
+        for operands, operator in content.operations:
+            if operator == b'BDC' and '/MCID' in operands[1]:
+                name = NameObject(f"/MC{len(named)}")
+                named[name] = operands[1]
+                operands = [operands[0], name]
+            elif operator == b'BMC' and operands[0] == '/Artifact':
+                operands, operator = [operands[0], DictionaryObject({NameObject('/Type'): NameObject('/Pagination')})], b'BDC'
+            operations.append((operands, operator))
+            # A header is the first text on the page; wrap it in a Pagination artifact
+            if operator == b'Tj' and operands[0] == header and not in_header:
+                in_header = True
+                operations[-1:] = [
+                    ([NameObject('/Artifact'), DictionaryObject({NameObject('/Type'): NameObject('/Pagination')})],
+                     b'BDC'),
+                    (operands, operator),
+                    ([], b'EMC'),
+                ]
+        content.operations = operations
+        stream = DecodedStreamObject()
+        stream.set_data(content.get_data())
+        page[NameObject('/Contents')] = writer._add_object(stream)
+        page['/Resources'][NameObject('/Properties')] = named
+    output = BytesIO()
+    writer.write(output)
+    return output.getvalue()
+
+
+def problems(tagged, header):
+    """Count pages that break the MCID rules, and the MCIDs found"""
+    reader = PdfReader(BytesIO(tagged))
+    nums = reader.trailer['/Root']['/StructTreeRoot']['/ParentTree']['/Nums']
+    parents = {int(nums[i]): nums[i + 1].get_object() for i in range(0, len(nums), 2)}
+    bad = 0
+    total = 0
+    for page_num, page in enumerate(reader.pages):
+        mcids = []
+        open_sequences = []  # Whether each open sequence is a kept Artifact
+        ok = True
+        for operands, operator in ContentStream(page.get_contents(), reader).operations:
+            if operator in (b'BMC', b'BDC'):
+                if operator == b'BDC' and '/MCID' in operands[1]:
+                    ok &= not open_sequences
+                    mcids.append(int(operands[1]['/MCID']))
+                open_sequences.append(operands[0] == '/Artifact')
+            elif operator == b'EMC' and open_sequences:
+                open_sequences.pop()
+            elif operator == b'Tj' and operands[0] == header:
+                ok &= any(open_sequences)
+        elements = parents.get(page_num, [])
+        ok &= mcids == list(range(len(mcids))) and len(elements) == len(mcids)
+        ok &= all(mcid in [int(k) for k in elements[mcid]['/K']] for mcid in mcids if mcid < len(elements))
+        bad += not ok
+        total += len(mcids)
+    return bad, total
+
+
+def main():
+    failed = False
+    print(f"{'document':>9} {'input':>10} {'pages':>6} {'MCIDs':>6} {'seconds':>8} {'bad pages':>10}")
+    for name, kwargs in DOCUMENTS:
+        pdf_bytes, _ = build_document(name, **kwargs)
+        header = "Chapter 7: Writing From Sources" if name == 'textbook' else None
+        once = tag(pdf_bytes)
+        for label, source in (('own', once), ('word', word_style(once, header))):
+            start = time.perf_counter()
+            twice = tag(source)
+            seconds = time.perf_counter() - start
+            bad, mcids = problems(twice, header if label == 'word' else None)
+            failed |= bad > 0
+            pages = len(PdfReader(BytesIO(twice)).pages)
+            print(f"{name:>9} {label:>10} {pages:>6} {mcids:>6} {seconds:>8.2f} {bad:>10}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
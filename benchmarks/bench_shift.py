@@ -0,0 +1,107 @@
+"""Benchmark shifting every date in a calendar feed.
+
+Run from the repo root:
+
+    python benchmarks/bench_shift.py
+
+Shifts a 50k-event Canvas-style feed (from bench_ics) by 140 days, reading
+it from a file and writing the result to another, in two ways: building an
+ics.Calendar, moving each event and serializing it with str(), as the Date
+Shifter used to; and streaming the file through ics_events.shift_lines.
+Reports time and growth in peak memory (Linux), each run in a fresh
+process. Before timing, checks on a small feed that both outputs hold the
+same events at the same instants.
+"""
+
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import timedelta
+
+from ics import Calendar
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_ics import build_feed, memory_status  # noqa: E402
+from ics_events import iter_events, shift_lines  # noqa: E402
+
+EVENTS = 50000
+DAYS = 140
+
+
+def shift_ics(in_path, out_path):
+    with open(in_path, encoding='utf-8', newline='') as f:
+        calendar = Calendar(f.read())
+    shifted = Calendar()
+    for e in calendar.events:
+        # End first: a later begin than end is rejected
+        e.end += timedelta(days=DAYS)
+        e.begin += timedelta(days=DAYS)
+        shifted.events.add(e)
+    with open(out_path, 'w', encoding='utf-8', newline='') as f:
+        f.write(str(shifted))
+
+
+def shift_stream(in_path, out_path):
+    with open(in_path, encoding='utf-8', newline='') as src, \
+            open(out_path, 'w', encoding='utf-8', newline='') as dst:
+        dst.writelines(shift_lines(src, DAYS))
+
+
+SHIFTERS = {'ics': shift_ics, 'stream': shift_stream}
+
+
+def measure(shifter, in_path, out_path):
+    """Run one shifter; runs in its own process"""
+    with open('/proc/self/clear_refs', 'w') as f:
+        f.write('5')
+    before = memory_status('VmRSS')
+    start = time.perf_counter()
+    SHIFTERS[shifter](in_path, out_path)
+    seconds = time.perf_counter() - start
+    print(json.dumps({'seconds': seconds, 'peak': memory_status('VmHWM') - before}))
+
+
+def instants(path):
+    with open(path, encoding='utf-8', newline='') as f:
+        return sorted((e.uid, e.start, e.end) for e in iter_events(f))
+
+
+def check_agreement(tmp_dir):
+    in_path = os.path.join(tmp_dir, 'small.ics')
+    with open(in_path, 'w', encoding='utf-8', newline='') as f:
+        f.write(build_feed(300))
+    outputs = []
+    for name, shift in SHIFTERS.items():
+        outputs.append(os.path.join(tmp_dir, f'small-{name}.ics'))
+        shift(in_path, outputs[-1])
+    assert instants(outputs[0]) == instants(outputs[1]), "ics.Calendar and shift_lines disagree"
+
+
+def main():
+    if len(sys.argv) == 5 and sys.argv[1] == '--measure':
+        measure(*sys.argv[2:])
+        return
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        check_agreement(tmp_dir)
+        in_path = os.path.join(tmp_dir, 'feed.ics')
+        with open(in_path, 'w', encoding='utf-8', newline='') as f:
+            f.write(build_feed(EVENTS))
+        print(f"{EVENTS} events, {os.path.getsize(in_path) / 1e6:.1f} MB, shifted {DAYS} days")
+        print(f"{'shifter':>8} {'seconds':>8} {'peak MB':>8}")
+        for name in SHIFTERS:
+            output = subprocess.run(
+                [sys.executable, __file__, '--measure', name, in_path, os.path.join(tmp_dir, f'{name}.ics')],
+                check=True, capture_output=True, text=True
+            ).stdout
+            result = json.loads(output.splitlines()[-1])
+            print(f"{name:>8} {result['seconds']:>8.2f} {result['peak'] / 1e6:>8.1f}", flush=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+"""Benchmark the structure tree writer on long documents.
+
+Run from the repo root:
+
+    python benchmarks/bench_tagging.py
+
+Tags 100- and 500-page chapters from the heading corpus with the old
+page-copying create_tagged_pdf and with pdf_tagging.create_tagged_pdf.
+Each pair runs in a fresh process so the reported peak RSS belongs to
+that run alone.
+"""
+
+import multiprocessing
+import os
+import resource
+import sys
+import time
+from io import BytesIO
+
+from pypdf import PdfReader, PdfWriter
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pdf_structure  # noqa: E402
+import pdf_tagging  # noqa: E402
+from heading_corpus import build_document  # noqa: E402
+
+SIZES = [100, 500]
+
+
+def legacy_create_tagged_pdf(original_pdf_bytes, lines):
+    """Page copy with a /Tagged info entry, which create_tagged_pdf replaced"""
+    reader = PdfReader(BytesIO(original_pdf_bytes))
+    writer = PdfWriter()
+    for page in reader.pages:
+        writer.add_page(page)
+    writer.add_metadata({'/Title': 'Accessible Document', '/Tagged': 'True'})
+    output = BytesIO()
+    writer.write(output)
+    return output.getvalue()
+
+
+def run_case(impl, pages, results):
+    pdf_bytes, _ = build_document('textbook', pages=pages)
+    lines = pdf_structure.suggest_tags(pdf_structure.extract_lines(pdf_bytes))
+    baseline_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    tag = legacy_create_tagged_pdf if impl == 'legacy' else pdf_tagging.create_tagged_pdf
+    start = time.perf_counter()
+    tagged = tag(pdf_bytes, lines)
+    elapsed = time.perf_counter() - start
+    peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    elements = 0
+    catalog = PdfReader(BytesIO(tagged)).trailer['/Root']
+    if '/StructTreeRoot' in catalog:
+        elements = len(catalog['/StructTreeRoot']['/K']['/K'])
+    results.put((elapsed, (peak_kb - baseline_kb) / 1024, peak_kb / 1024, len(tagged), elements))
+
+
+def main():
+    ctx = multiprocessing.get_context('spawn')
+    print(f"{'pages':>6} {'impl':>8} {'seconds':>9} {'extra RSS MB':>13} {'peak RSS MB':>12} "
+          f"{'output KB':>10} {'elements':>9}")
+    for pages in SIZES:
+        for impl in ('legacy', 'tagger'):
+            results = ctx.Queue()
+            proc = ctx.Process(target=run_case, args=(impl, pages, results))
+            proc.start()
+            elapsed, extra_mb, peak_mb, size, elements = results.get()
+            proc.join()
+            print(f"{pages:>6} {impl:>8} {elapsed:>9.2f} {extra_mb:>13.1f} {peak_mb:>12.1f} "
+                  f"{size / 1024:>10.0f} {elements:>9}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,194 @@
+"""Labeled fixture corpus for the heading classifier.
+
+Each document is generated with reportlab from a fixed seed, so the corpus
+is reproducible without checking binary PDFs in. Every drawn line is
+recorded with the tag a careful human would give it, keyed by page number
+and text the same way extract_lines reports them. Multi-column documents can
+be drawn row by row across the columns, as some layout programs do, so
+their content order differs from their reading order.
+
+    from heading_corpus import CORPUS, build_document
+    pdf_bytes, labels = build_document('textbook', pages=300)
+"""
+
+import random
+from io import BytesIO
+
+from reportlab.lib.pagesizes import letter
+from reportlab.pdfgen import canvas
+
+WORDS = (
+    "the of and to in is that for as with on by are this be from an which or "
+    "students learning course writing research analysis evidence argument "
+    "theory practice reading discussion context history language method "
+    "example source question response community structure process design"
+).split()
+
+TOP_Y = 730
+BOTTOM_Y = 72
+LEFT_X = 72
+
+
+def sentence(rng, min_words=8, max_words=14):
+    words = [rng.choice(WORDS) for _ in range(rng.randint(min_words, max_words))]
+    return " ".join(words).capitalize() + "."
+
+
+class LabeledCanvas:
+    """Draws lines top to bottom and records a label for each one, in reading order"""
+
+    def __init__(self, seed, interleave=False):
+        self.rng = random.Random(seed)
+        self.packet = BytesIO()
+        self.canvas = canvas.Canvas(self.packet, pagesize=letter)
+        self.page = 1
+        self.y = TOP_Y
+        self.labels = {}
+        self.header = None
+        self.interleave = interleave
+        self.draws = []
+        self.columns = [LEFT_X]
+        self.column = 0
+        self.column_top = TOP_Y
+
+    def start_columns(self, count, gutter=18):
+        """Continue in count columns below the current line"""
+        width = (612 - 2 * LEFT_X - gutter * (count - 1)) / count
+        self.columns = [LEFT_X + i * (width + gutter) for i in range(count)]
+        self.column = 0
+        self.column_top = self.y
+
+    def line(self, text, font, size, tag, gap_before=0, x=None):
+        if self.y - gap_before - size < BOTTOM_Y:
+            if self.column + 1 < len(self.columns):
+                self.column += 1
+                self.y = self.column_top
+            else:
+                self.new_page()
+        else:
+            self.y -= gap_before
+        if x is None:
+            x = self.columns[self.column]
+        self.draws.append((self.y, x, font, size, text))
+        self.labels[(self.page, text)] = tag
+        self.y -= size * 1.3
+
+    def paragraph(self, lines=5, font="Times-Roman", size=11, per_line=13):
+        text = " ".join(sentence(self.rng) for _ in range(lines * 2))
+        words = text.split()
+        for start in range(0, len(words), per_line):
+            self.line(" ".join(words[start:start + per_line]), font, size, 'Body Text')
+        self.y -= size * 0.6
+
+    def flush(self):
+        # Row by row across the columns, or in the order the lines were laid out
+        draws = sorted(self.draws, key=lambda d: (-d[0], d[1])) if self.interleave else self.draws
+        for y, x, font, size, text in draws:
+            self.canvas.setFont(font, size)
+            self.canvas.drawString(x, y, text)
+        self.draws = []
+
+    def new_page(self):
+        self.flush()
+        self.canvas.setFont("Times-Roman", 9)
+        self.canvas.drawCentredString(306, 40, f"- {self.page} -")
+        self.labels[(self.page, f"- {self.page} -")] = 'Body Text'
+        self.canvas.showPage()
+        self.page += 1
+        self.y = TOP_Y
+        self.column = 0
+        self.column_top = TOP_Y
+        if self.header:
+            self.line(self.header, "Helvetica-Oblique", 9, 'Body Text')
+            self.y -= 10
+
+    def save(self):
+        self.new_page()
+        self.flush()
+        self.canvas.save()
+        return self.packet.getvalue(), self.labels
+
+
+def textbook(pages=300, seed=1):
+    """A textbook chapter: numbered sections and subsections, footnotes"""
+    doc = LabeledCanvas(seed)
+    doc.line("Chapter 7: Writing From Sources", "Helvetica-Bold", 24, 'H1')
+    doc.header = "Chapter 7: Writing From Sources"
+    section = 0
+    while doc.page <= pages:
+        section += 1
+        doc.line(f"7.{section} {sentence(doc.rng, 3, 6)[:-1]}", "Helvetica-Bold", 16, 'H2', gap_before=18)
+        for sub in range(1, doc.rng.randint(2, 4)):
+            doc.line(f"7.{section}.{sub} {sentence(doc.rng, 2, 5)[:-1]}", "Helvetica-Bold", 13, 'H3', gap_before=10)
+            for _ in range(doc.rng.randint(2, 4)):
+                doc.paragraph(doc.rng.randint(3, 7))
+            if doc.rng.random() < 0.3:
+                doc.line(f"{section}. {sentence(doc.rng, 10, 16)}", "Times-Roman", 8, 'Body Text')
+    return doc.save()
+
+
+def syllabus(seed=2):
+    """A course syllabus: bold run-in labels at body size under each section"""
+    doc = LabeledCanvas(seed)
+    doc.line("ENGL 1181: College Composition I", "Helvetica-Bold", 20, 'H1')
+    doc.line("Fall Semester, Section 1601", "Helvetica", 11, 'Body Text', gap_before=4)
+    sections = {
+        "Course Information": ["Instructor", "Office Hours", "Email", "Meeting Times"],
+        "Course Description": [],
+        "Required Materials": ["Textbook", "Software"],
+        "Grading": ["Essays", "Participation", "Final Portfolio"],
+        "Policies": ["Attendance", "Late Work", "Academic Integrity", "Accessibility"],
+        "Schedule": ["Weeks 1-4", "Weeks 5-8", "Weeks 9-12", "Weeks 13-16"],
+    }
+    for title, labels in sections.items():
+        doc.line(title, "Helvetica-Bold", 14, 'H2', gap_before=16)
+        if not labels:
+            doc.paragraph(6, size=11)
+        for label in labels:
+            doc.line(label, "Times-Bold", 11, 'H3', gap_before=6)
+            doc.paragraph(doc.rng.randint(1, 3))
+    return doc.save()
+
+
+def article(seed=3):
+    """A journal article: title, byline, abstract and bold run-in sections"""
+    doc = LabeledCanvas(seed)
+    doc.line("Peer Review in First-Year Writing", "Times-Bold", 18, 'H1')
+    doc.line("A. Rivera and J. Chen", "Times-Roman", 12, 'Body Text', gap_before=4)
+    doc.line("Abstract", "Times-Bold", 10, 'H2', gap_before=12)
+    doc.paragraph(5, size=10)
+    for title in ["Introduction", "Methods", "Results", "Discussion", "Conclusion", "References"]:
+        doc.line(title, "Times-Bold", 10, 'H2', gap_before=12)
+        for _ in range(doc.rng.randint(3, 6)):
+            doc.paragraph(doc.rng.randint(4, 8), size=10)
+    return doc.save()
+
+
+def newsletter(pages=12, seed=4):
+    """A department newsletter: full-width title, then two columns drawn row by row"""
+    doc = LabeledCanvas(seed, interleave=True)
+    doc.line("Writing Center News", "Helvetica-Bold", 22, 'H1')
+    doc.line("Spring issue for faculty and tutors", "Helvetica", 11, 'Body Text', gap_before=4)
+    doc.y -= 12
+    doc.start_columns(2)
+    while doc.page <= pages:
+        doc.line(sentence(doc.rng, 2, 3)[:-1], "Helvetica-Bold", 13, 'H2', gap_before=12)
+        for _ in range(doc.rng.randint(2, 4)):
+            doc.paragraph(doc.rng.randint(2, 4), size=10, per_line=5)
+        if doc.rng.random() < 0.4:
+            doc.line(sentence(doc.rng, 2, 3)[:-1], "Times-Bold", 10, 'H3', gap_before=6)
+            doc.paragraph(doc.rng.randint(2, 3), size=10, per_line=5)
+    return doc.save()
+
+
+CORPUS = {
+    'textbook': textbook,
+    'syllabus': syllabus,
+    'article': article,
+    'newsletter': newsletter,
+}
+
+
+def build_document(name, **kwargs):
+    """Return (pdf_bytes, {(page, text): tag}) for a corpus document, labels in reading order"""
+    return CORPUS[name](**kwargs)
@@ -0,0 +1,271 @@
+# blob_store.py
+"""Shared storage for uploaded and generated PDF bytes.
+
+The Streamlit apps keep only blob ids in st.session_state and fetch bytes
+from a store shared by every session on the server. Identical content is
+stored once however many sessions reference it. Blobs are evicted least
+recently used first once the store passes its size budget, and blobs that
+have not been touched within the TTL are dropped. Each session has a
+quota on the bytes it references.
+
+Pick the backend with environment variables:
+
+    BLOB_STORE=memory|disk      (default: memory)
+    BLOB_STORE_DIR=/var/tmp/... (disk backend parent directory)
+    BLOB_STORE_MAX_MB=1024
+    BLOB_STORE_TTL_HOURS=12
+    BLOB_STORE_SESSION_QUOTA_MB=300
+"""
+
+import atexit
+import hashlib
+import mmap
+import os
+import shutil
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from io import BytesIO
+
+class BlobNotFoundError(KeyError):
+    """The blob was evicted or never stored"""
+
+
+class QuotaExceededError(Exception):
+    """Storing the blob would put the session over its quota"""
+
+
+class BlobStore:
+    """Content-addressed blob store with LRU/TTL eviction and session quotas.
+
+    Subclasses provide _write, _read, _open and _delete for the actual bytes;
+    this class keeps the index, reference tracking and metrics.
+    """
+
+    def __init__(self, max_bytes=1024 * 1024 * 1024, ttl_seconds=12 * 3600,
+                 session_quota_bytes=300 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.session_quota_bytes = session_quota_bytes
+        self._lock = threading.RLock()
+        # blob_id -> {'size', 'sessions', 'last_access'}, least recent first
+        self._index = OrderedDict()
+        self._total_bytes = 0
+        self._counters = {'hits': 0, 'misses': 0, 'evictions': 0, 'expirations': 0}
+
+    def put(self, data, session_id):
+        """Store bytes for a session and return the blob id.
+
+        Raises:
+            QuotaExceededError: If the session would exceed its quota
+        """
+        blob_id = hashlib.sha256(data).hexdigest()
+        with self._lock:
+            self._expire()
+            entry = self._index.get(blob_id)
+            if entry is None or session_id not in entry['sessions']:
+                used = self.session_bytes(session_id)
+                if used + len(data) > self.session_quota_bytes:
+                    raise QuotaExceededError(
+                        f"This session already holds {used / 1048576:.0f} MB; "
+                        f"the limit is {self.session_quota_bytes / 1048576:.0f} MB"
+                    )
+            if entry is None:
+                self._write(blob_id, data)
+                entry = {'size': len(data), 'sessions': set(), 'last_access': 0}
+                self._index[blob_id] = entry
+                self._total_bytes += len(data)
+            entry['sessions'].add(session_id)
+            self._touch(blob_id)
+            self._evict(keep=blob_id)
+        return blob_id
+
+    def get(self, blob_id):
+        """Return the blob's bytes.
+
+        Raises:
+            BlobNotFoundError: If the blob was evicted or never stored
+        """
+        with self._lock:
+            self._check(blob_id)
+            return self._read(blob_id)
+
+    def open(self, blob_id):
+        """Return a seekable, read-only binary stream over the blob"""
+        with self._lock:
+            self._check(blob_id)
+            return self._open(blob_id)
+
+    def contains(self, blob_id):
+        with self._lock:
+            return blob_id in self._index
+
+    def release(self, blob_id, session_id):
+        """Drop a session's reference; unreferenced blobs are deleted"""
+        with self._lock:
+            entry = self._index.get(blob_id)
+            if entry is None:
+                return
+            entry['sessions'].discard(session_id)
+            if not entry['sessions']:
+                self._remove(blob_id)
+
+    def release_session(self, session_id):
+        """Drop every reference held by a session"""
+        with self._lock:
+            for blob_id in [b for b, e in self._index.items() if session_id in e['sessions']]:
+                self.release(blob_id, session_id)
+
+    def session_bytes(self, session_id):
+        """Total size of the blobs a session references"""
+        with self._lock:
+            return sum(e['size'] for e in self._index.values() if session_id in e['sessions'])
+
+    def stats(self):
+        """Return store-wide metrics for monitoring"""
+        with self._lock:
+            sessions = set()
+            for entry in self._index.values():
+                sessions.update(entry['sessions'])
+            return {
+                'blobs': len(self._index),
+                'bytes': self._total_bytes,
+                'max_bytes': self.max_bytes,
+                'sessions': len(sessions),
+                **self._counters
+            }
+
+    def _check(self, blob_id):
+        self._expire()
+        if blob_id not in self._index:
+            self._counters['misses'] += 1
+            raise BlobNotFoundError(blob_id)
+        self._counters['hits'] += 1
+        self._touch(blob_id)
+
+    def _touch(self, blob_id):
+        self._index[blob_id]['last_access'] = time.monotonic()
+        self._index.move_to_end(blob_id)
+
+    def _remove(self, blob_id):
+        self._forget(blob_id)
+        self._delete(blob_id)
+
+    def _forget(self, blob_id):
+        entry = self._index.pop(blob_id)
+        self._total_bytes -= entry['size']
+
+    def _expire(self):
+        cutoff = time.monotonic() - self.ttl_seconds
+        # The index is in access order, so stale entries are at the front
+        while self._index:
+            blob_id, entry = next(iter(self._index.items()))
+            if entry['last_access'] >= cutoff:
+                break
+            self._remove(blob_id)
+            self._counters['expirations'] += 1
+
+    def _evict(self, keep=None):
+        for blob_id in list(self._index):
+            if self._total_bytes <= self.max_bytes:
+                break
+            if blob_id != keep:
+                self._remove(blob_id)
+                self._counters['evictions'] += 1
+
+    def _write(self, blob_id, data):
+        raise NotImplementedError
+
+    def _read(self, blob_id):
+        raise NotImplementedError
+
+    def _open(self, blob_id):
+        raise NotImplementedError
+
+    def _delete(self, blob_id):
+        raise NotImplementedError
+
+
+class MemoryBlobStore(BlobStore):
+    """Keeps blobs in process memory"""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self._blobs = {}
+
+    def _write(self, blob_id, data):
+        self._blobs[blob_id] = bytes(data)
+
+    def _read(self, blob_id):
+        return self._blobs[blob_id]
+
+    def _open(self, blob_id):
+        return BytesIO(self._blobs[blob_id])
+
+    def _delete(self, blob_id):
+        del self._blobs[blob_id]
+
+
+class DiskBlobStore(BlobStore):
+    """Keeps blobs as files on local disk and reads them through mmap.
+
+    The index lives in memory, so each store writes to its own new
+    subdirectory of the given directory and removes it at exit. Apps
+    sharing the parent directory never touch each other's files.
+    """
+
+    def __init__(self, directory, **kwargs):
+        super().__init__(**kwargs)
+        os.makedirs(directory, exist_ok=True)
+        self.directory = tempfile.mkdtemp(prefix=f"{os.getpid()}-", dir=directory)
+        atexit.register(shutil.rmtree, self.directory, ignore_errors=True)
+
+    def _path(self, blob_id):
+        return os.path.join(self.directory, blob_id)
+
+    def _write(self, blob_id, data):
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, self._path(blob_id))
+
+    def _open(self, blob_id):
+        try:
+            f = open(self._path(blob_id), 'rb')
+        except FileNotFoundError:
+            # Deleted behind the store's back, e.g. by a temp directory cleaner
+            self._forget(blob_id)
+            raise BlobNotFoundError(blob_id) from None
+        with f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return BytesIO(b"")
+            return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def _read(self, blob_id):
+        stream = self._open(blob_id)
+        try:
+            return stream[:] if isinstance(stream, mmap.mmap) else stream.getvalue()
+        finally:
+            stream.close()
+
+    def _delete(self, blob_id):
+        try:
+            os.remove(self._path(blob_id))
+        except FileNotFoundError:
+            pass
+
+
+def create_blob_store():
+    """Build the blob store configured by the BLOB_STORE_* environment variables"""
+    limits = {
+        'max_bytes': int(float(os.environ.get('BLOB_STORE_MAX_MB', 1024)) * 1024 * 1024),
+        'ttl_seconds': float(os.environ.get('BLOB_STORE_TTL_HOURS', 12)) * 3600,
+        'session_quota_bytes': int(float(os.environ.get('BLOB_STORE_SESSION_QUOTA_MB', 300)) * 1024 * 1024),
+    }
+    if os.environ.get('BLOB_STORE', 'memory') == 'disk':
+        directory = os.environ.get(
+            'BLOB_STORE_DIR', os.path.join(tempfile.gettempdir(), 'faculty-tools-blobs')
+        )
+        return DiskBlobStore(directory, **limits)
+    return MemoryBlobStore(**limits)
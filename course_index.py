@@ -0,0 +1,91 @@
+# course_index.py
+"""Index of the course codes mentioned in calendar events.
+
+A Canvas feed mixes events from every course an instructor teaches.
+Events name a course by its base code ("ENGL 1181") or by a section code
+that extends it ("ENGL 1181-W02"). CourseIndex is filled once per event
+while the feed is read. It keeps an inverted index from each code to the
+events that mention it, and a character trie of the codes. In the trie a
+base code is an ancestor of its section codes, so finding the codes to
+offer and the events for a selection never compares codes pairwise or
+rescans the events.
+"""
+
+import heapq
+import re
+from itertools import groupby
+
+END = ''  # Trie key marking the end of a code; codes are never empty
+
+
+class CourseIndex:
+    """Inverted index from course codes to event ids, with a trie of the codes"""
+
+    def __init__(self, pattern):
+        self.pattern = re.compile(pattern)
+        self.postings = {}  # code -> ascending event ids
+        self.trie = {}
+        self._event_ids = {}
+
+    def add(self, event_id, *texts):
+        """Index the codes mentioned in an event's texts; ids must be added in ascending order"""
+        for text in texts:
+            if not text:
+                continue
+            for code in self.pattern.findall(text):
+                ids = self.postings.get(code)
+                if ids is None:
+                    ids = self.postings[code] = []
+                    self._insert(code)
+                if not ids or ids[-1] != event_id:
+                    ids.append(event_id)
+        self._event_ids.clear()
+
+    def _insert(self, code):
+        node = self.trie
+        for char in code:
+            node = node.setdefault(char, {})
+        node[END] = code
+
+    def _subtree_codes(self, node):
+        stack = [node]
+        while stack:
+            node = stack.pop()
+            for key, child in node.items():
+                if key == END:
+                    yield child
+                else:
+                    stack.append(child)
+
+    def _node(self, code):
+        node = self.trie
+        for char in code:
+            node = node.get(char)
+            if node is None:
+                return None
+        return node
+
+    def course_codes(self):
+        """Return the most specific codes, sorted: base codes with sections are left out"""
+        codes = []
+        stack = [self.trie]
+        while stack:
+            node = stack.pop()
+            children = [child for key, child in node.items() if key != END]
+            if END in node and not children:
+                codes.append(node[END])
+            stack.extend(children)
+        return sorted(codes)
+
+    def event_ids(self, code):
+        """Return the ascending ids of events that mention the code or a section of it"""
+        ids = self._event_ids.get(code)
+        if ids is None:
+            node = self._node(code)
+            if node is None:
+                ids = []
+            else:
+                merged = heapq.merge(*(self.postings[c] for c in self._subtree_codes(node)))
+                ids = [event_id for event_id, _ in groupby(merged)]
+            self._event_ids[code] = ids
+        return ids
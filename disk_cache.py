@@ -0,0 +1,96 @@
+# disk_cache.py
+"""Size-bounded cache directories shared by the PDF tools.
+
+DiskCache keeps one file per entry. Writes go to a temporary file that is
+renamed into place, so readers in other processes never see a partial
+entry. Reading an entry marks it as recently used, and once the directory
+grows past its size budget the least recently used files are evicted.
+Subclasses decide the file suffix and how entries are read and written.
+"""
+
+import os
+import tempfile
+import threading
+
+
+class DiskCache:
+    """Size-bounded directory of files with least-recently-used eviction"""
+
+    suffix = ''
+
+    def __init__(self, cache_dir, max_bytes):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._total_bytes = None
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _path(self, name):
+        return os.path.join(self.cache_dir, f"{name}{self.suffix}")
+
+    def contains(self, name):
+        return os.path.exists(self._path(name))
+
+    def _read(self, name, read):
+        """Return read(path) for a cached file and mark it recently used, or None on a miss"""
+        path = self._path(name)
+        try:
+            value = read(path)
+            os.utime(path)
+        except OSError:
+            # A missing file, or one another process is replacing or evicting
+            return None
+        return value
+
+    def _write(self, name, write):
+        """Store the file write(path) creates and evict old entries if over budget.
+
+        Returns:
+            Number of files evicted
+        """
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+        os.close(fd)
+        try:
+            write(tmp_path)
+            size = os.path.getsize(tmp_path)
+            os.replace(tmp_path, self._path(name))
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+
+        with self._lock:
+            if self._total_bytes is None:
+                self._total_bytes = self._scan()[1]
+            else:
+                self._total_bytes += size
+            if self._total_bytes > self.max_bytes:
+                return self._evict()
+        return 0
+
+    def _scan(self):
+        entries = []
+        for entry in os.scandir(self.cache_dir):
+            if entry.name.endswith(self.suffix):
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+        return entries, sum(size for _, size, _ in entries)
+
+    def _evict(self):
+        # Drop the oldest files until the cache is back under 90% of budget
+        entries, total = self._scan()
+        target = self.max_bytes * 0.9
+        evicted = 0
+        for _, size, path in sorted(entries):
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+                total -= size
+                evicted += 1
+            except FileNotFoundError:
+                pass
+        self._total_bytes = total
+        return evicted
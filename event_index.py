@@ -0,0 +1,123 @@
+# event_index.py
+"""Time-window queries over calendar events.
+
+IntervalIndex is built once per parsed feed and answers "which events
+overlap [t0, t1)" without scanning the feed. Almost every event in a
+course feed is a due date or a class meeting shorter than a day. Those are
+kept in one array sorted by start, and a query bisects it from a day
+before t0 to t1. The few multi-day events, such as a week-long break, go
+in a centered interval tree. A query costs O(log n + k) for k events
+found, plus the short events in the day before t0.
+
+An event overlaps [t0, t1) when it starts before t1 and ends after t0. An
+event that ends when it starts (a due date) overlaps the window it starts
+in.
+"""
+
+from bisect import bisect_left
+from datetime import timedelta
+from operator import attrgetter
+
+SHORT_SPAN = timedelta(days=1)  # Longer events go in the interval tree
+
+start_of = attrgetter('start')
+
+
+def overlaps(event, t0, t1):
+    return event.start < t1 and (event.end > t0 or event.start >= t0)
+
+
+class IntervalNode:
+    """Events containing a center time, with the events before and after it in subtrees"""
+
+    __slots__ = ('center', 'by_start', 'by_end', 'left', 'right')
+
+    def __init__(self, center, events):
+        self.center = center
+        self.by_start = sorted(events, key=start_of)
+        self.by_end = sorted(events, key=attrgetter('end'), reverse=True)
+        self.left = None
+        self.right = None
+
+
+def build_tree(events):
+    """Build a centered interval tree of events with end > start"""
+    if not events:
+        return None
+    root = None
+    stack = [(events, None, None)]
+    while stack:
+        events, parent, side = stack.pop()
+        starts = sorted(event.start for event in events)
+        center = starts[len(starts) // 2]
+        here = [event for event in events if event.start <= center < event.end]
+        node = IntervalNode(center, here)
+        if parent is None:
+            root = node
+        else:
+            setattr(parent, side, node)
+        before = [event for event in events if event.end <= center]
+        after = [event for event in events if event.start > center]
+        if before:
+            stack.append((before, node, 'left'))
+        if after:
+            stack.append((after, node, 'right'))
+    return root
+
+
+class IntervalIndex:
+    """Events sorted by start, with an interval tree for multi-day events"""
+
+    def __init__(self, events):
+        self.events = sorted(events, key=start_of)
+        self.starts = [event.start for event in self.events]
+        self.short = [event for event in self.events if event.end - event.start <= SHORT_SPAN]
+        self.short_starts = [event.start for event in self.short]
+        self.tree = build_tree([event for event in self.events if event.end - event.start > SHORT_SPAN])
+
+    def __len__(self):
+        return len(self.events)
+
+    def starting(self, t0, t1=None):
+        """Return the events starting in [t0, t1), in start order"""
+        first = bisect_left(self.starts, t0)
+        last = len(self.starts) if t1 is None else bisect_left(self.starts, t1, first)
+        return self.events[first:last]
+
+    def overlapping(self, t0, t1):
+        """Return the events overlapping [t0, t1), in start order"""
+        first = bisect_left(self.short_starts, t0 - SHORT_SPAN)
+        last = bisect_left(self.short_starts, t1, first)
+        found = [event for event in self.short[first:last] if overlaps(event, t0, t1)]
+        long_found = self._tree_overlapping(t0, t1)
+        if long_found:
+            found = sorted(found + long_found, key=start_of)
+        return found
+
+    def _tree_overlapping(self, t0, t1):
+        found = []
+        stack = [self.tree] if self.tree is not None else []
+        while stack:
+            node = stack.pop()
+            if t1 <= node.center:
+                # Every event here ends after the center, so after t0
+                for event in node.by_start:
+                    if event.start >= t1:
+                        break
+                    found.append(event)
+                if node.left is not None:
+                    stack.append(node.left)
+            elif t0 >= node.center:
+                # Every event here starts at or before the center, so before t1
+                for event in node.by_end:
+                    if event.end <= t0:
+                        break
+                    found.append(event)
+                if node.right is not None:
+                    stack.append(node.right)
+            else:
+                found.extend(node.by_start)
+                for child in (node.left, node.right):
+                    if child is not None:
+                        stack.append(child)
+        return found
@@ -0,0 +1,366 @@
+# ics_events.py
+"""Streaming reader for the events in an iCalendar (.ics) feed.
+
+A Canvas feed for an instructor who has taught for a few years holds
+thousands of events. ics.Calendar builds a full object graph for all of
+them, with an arrow datetime for every date field, and st.cache_data then
+has to pickle that graph. iter_events reads the feed one line at a time
+instead and yields a small Event record per VEVENT. Only the fields the
+faculty tools use are kept.
+
+Handled: folded lines, escaped text, VALUE=DATE all-day events, UTC times,
+TZID times (looked up in the IANA time zone database), DURATION in place
+of DTEND, and components nested in an event such as VALARM. Custom
+VTIMEZONE definitions are not read; a TZID that is not an IANA zone name
+is treated as UTC.
+
+Recurrence properties (RRULE, RDATE, EXDATE, RECURRENCE-ID) are kept on
+the record for recurrence.EventTimeline to expand.
+
+shift_lines moves every date in a feed by a number of days in the same
+single pass, copying all other lines exactly as they are.
+"""
+
+import re
+from collections import namedtuple
+from datetime import date, datetime, timedelta, timezone
+from functools import lru_cache
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+# start and end are timezone-aware datetimes. Floating times and all-day
+# dates are taken as UTC, as ics.Calendar does, so every event sorts together.
+# rrule is the RRULE text ('' if none); rdate and exdate are tuples of
+# datetimes; recurrence_id is the start of the occurrence an override replaces.
+Event = namedtuple(
+    'Event', 'uid summary description start end all_day rrule rdate exdate recurrence_id',
+    defaults=('', (), (), None)
+)
+
+DURATION_PATTERN = re.compile(
+    r'([-+])?P(?:(\d+)W)?(?:(\d+)D)?(?:T(?:(\d+)H)?(?:(\d+)M)?(?:(\d+)S)?)?$'
+)
+TEXT_ESCAPES = re.compile(r'\\([\\;,nN])')
+KEPT_PROPERTIES = {
+    'UID', 'SUMMARY', 'DESCRIPTION', 'DTSTART', 'DTEND', 'DURATION',
+    'RRULE', 'RDATE', 'EXDATE', 'RECURRENCE-ID'
+}
+LIST_PROPERTIES = {'RDATE', 'EXDATE'}  # May appear more than once in an event
+PROPERTY_NAME = re.compile(r'[A-Za-z0-9-]*')
+SHIFTED_PROPERTIES = {'DTSTART', 'DTEND', 'DUE', 'RECURRENCE-ID', 'EXDATE', 'RDATE', 'RRULE'}
+MAX_LINE_OCTETS = 75
+
+
+class CalendarParseError(ValueError):
+    """A property in the feed could not be read"""
+
+
+def text_lines(text):
+    """Yield the lines of a string without copying the whole string"""
+    start = 0
+    while start < len(text):
+        end = text.find('\n', start)
+        if end < 0:
+            end = len(text)
+        yield text[start:end]
+        start = end + 1
+
+
+def text_lines_with_endings(text):
+    """Yield the lines of a string with their line endings"""
+    start = 0
+    while start < len(text):
+        end = text.find('\n', start) + 1 or len(text)
+        yield text[start:end]
+        start = end
+
+
+def unfold(lines):
+    """Join folded continuation lines, yielding one logical content line at a time"""
+    current = None
+    for line in lines:
+        line = line.rstrip('\r\n')
+        if line[:1] in (' ', '\t'):
+            if current is not None:
+                current += line[1:]
+            continue
+        if current is not None:
+            yield current
+        current = line
+    if current:
+        yield current
+
+
+def split_property(line):
+    """Split a content line into (NAME, {PARAM: value}, value)"""
+    colon = line.find(':')
+    if colon < 0:
+        raise CalendarParseError(f"Not a property line: {line[:60]!r}")
+    semicolon = line.find(';', 0, colon)
+    if semicolon < 0:
+        return line[:colon].upper(), {}, line[colon + 1:]
+    if '"' in line[:colon]:
+        # Quoted parameter values can contain ':' and ';'
+        quoted = False
+        for colon, char in enumerate(line):
+            if char == '"':
+                quoted = not quoted
+            elif char == ':' and not quoted:
+                break
+    params = {}
+    for param in line[semicolon + 1:colon].split(';'):
+        key, _, value = param.partition('=')
+        params[key.upper()] = value.strip('"')
+    return line[:semicolon].upper(), params, line[colon + 1:]
+
+
+def unescape_text(value):
+    if '\\' not in value:
+        return value
+    if '\\\\' not in value:
+        # No escaped backslashes, so each escape can be replaced on its own
+        return value.replace('\\n', '\n').replace('\\N', '\n').replace('\\,', ',').replace('\\;', ';')
+    return TEXT_ESCAPES.sub(lambda m: '\n' if m.group(1) in 'nN' else m.group(1), value)
+
+
+@lru_cache(maxsize=64)
+def zone(tzid):
+    """Return the time zone for a TZID, or UTC if it is not an IANA name"""
+    try:
+        return ZoneInfo(tzid.strip('/'))
+    except (ZoneInfoNotFoundError, ValueError):
+        return timezone.utc
+
+
+def parse_date_time(value, params):
+    """Parse a DATE or DATE-TIME value.
+
+    Returns:
+        (timezone-aware datetime, True if the value is a date)
+    """
+    value = value.strip()
+    try:
+        if params.get('VALUE') == 'DATE' or len(value) == 8:
+            return datetime(int(value[:4]), int(value[4:6]), int(value[6:8]), tzinfo=timezone.utc), True
+        moment = datetime(
+            int(value[:4]), int(value[4:6]), int(value[6:8]),
+            int(value[9:11]), int(value[11:13]), int(value[13:15])
+        )
+    except ValueError:
+        raise CalendarParseError(f"Not a date or date-time: {value!r}") from None
+    if value.endswith('Z'):
+        return moment.replace(tzinfo=timezone.utc), False
+    tzid = params.get('TZID')
+    return moment.replace(tzinfo=zone(tzid) if tzid else timezone.utc), False
+
+
+def parse_duration(value):
+    match = DURATION_PATTERN.match(value.strip())
+    if not match:
+        raise CalendarParseError(f"Not a duration: {value!r}")
+    sign, weeks, days, hours, minutes, seconds = match.groups()
+    duration = timedelta(
+        weeks=int(weeks or 0), days=int(days or 0),
+        hours=int(hours or 0), minutes=int(minutes or 0), seconds=int(seconds or 0)
+    )
+    return -duration if sign == '-' else duration
+
+
+def parse_date_list(values):
+    """Parse RDATE or EXDATE properties into a tuple of start datetimes"""
+    return tuple(
+        parse_date_time(item.partition('/')[0], params)[0]
+        for value, params in values for item in value.split(',')
+    )
+
+
+def make_event(props):
+    """Build an Event from a VEVENT's kept properties, or None without DTSTART"""
+    if 'DTSTART' not in props:
+        return None
+    start, all_day = parse_date_time(*props['DTSTART'])
+    if 'DTEND' in props:
+        end = parse_date_time(*props['DTEND'])[0]
+    elif 'DURATION' in props:
+        end = start + parse_duration(props['DURATION'][0])
+    else:
+        # RFC 5545: a date lasts one day, a date-time is an instant
+        end = start + timedelta(days=1) if all_day else start
+    return Event(
+        uid=props.get('UID', ('', None))[0],
+        summary=unescape_text(props.get('SUMMARY', ('', None))[0]),
+        description=unescape_text(props.get('DESCRIPTION', ('', None))[0]),
+        start=start,
+        end=end,
+        all_day=all_day,
+        rrule=props['RRULE'][0].strip() if 'RRULE' in props else '',
+        rdate=parse_date_list(props.get('RDATE', ())),
+        exdate=parse_date_list(props.get('EXDATE', ())),
+        recurrence_id=parse_date_time(*props['RECURRENCE-ID'])[0] if 'RECURRENCE-ID' in props else None,
+    )
+
+
+def iter_events(source):
+    """Yield an Event for every VEVENT in a feed, in file order.
+
+    Args:
+        source: Feed text, or an iterable of lines such as an open file
+
+    Raises:
+        CalendarParseError: A date, time or duration cannot be read
+    """
+    if isinstance(source, str):
+        source = text_lines(source)
+    props = None
+    depth = 0  # Components open inside the current VEVENT
+    for line in unfold(source):
+        if props is None:
+            if line.upper() == 'BEGIN:VEVENT':
+                props = {}
+            continue
+        name, _, value = line.partition(':')
+        name = name.upper()
+        if name == 'BEGIN':
+            depth += 1
+        elif name == 'END':
+            if depth:
+                depth -= 1
+            else:
+                event = make_event(props)
+                if event is not None:
+                    yield event
+                props = None
+        elif depth == 0 and name.partition(';')[0] in KEPT_PROPERTIES:
+            name, params, value = split_property(line)
+            if name in LIST_PROPERTIES:
+                props.setdefault(name, []).append((value, params))
+            else:
+                props[name] = (value, params)
+
+
+def fold_line(line):
+    """Fold a content line (without its ending) at 75 octets"""
+    if len(line.encode('utf-8')) <= MAX_LINE_OCTETS:
+        return [line]
+    parts = []
+    current, size = '', 0
+    for char in line:
+        octets = len(char.encode('utf-8'))
+        if size + octets > MAX_LINE_OCTETS:
+            parts.append(current)
+            current, size = ' ', 1
+        current += char
+        size += octets
+    parts.append(current)
+    return parts
+
+
+def shift_date_time(value, params, days, local_zone=None):
+    """Move a DATE or DATE-TIME value by whole days, in the value's own format.
+
+    Local and TZID times keep their wall-clock time. UTC times keep their
+    wall-clock time in local_zone when one is given, so a 9 AM class stays
+    at 9 AM across a daylight saving change.
+    """
+    value = value.strip()
+    try:
+        if params.get('VALUE') == 'DATE' or len(value) == 8:
+            moved = date(int(value[:4]), int(value[4:6]), int(value[6:8])) + timedelta(days=days)
+            return f'{moved.year:04d}{moved.month:02d}{moved.day:02d}'
+        moment = datetime(
+            int(value[:4]), int(value[4:6]), int(value[6:8]),
+            int(value[9:11]), int(value[11:13]), int(value[13:15])
+        )
+    except ValueError:
+        raise CalendarParseError(f"Not a date or date-time: {value!r}") from None
+    is_utc = value.endswith('Z')
+    if is_utc and local_zone is not None:
+        local = moment.replace(tzinfo=timezone.utc).astimezone(local_zone).replace(tzinfo=None)
+        moved = (local + timedelta(days=days)).replace(tzinfo=local_zone)
+        moment = moved.astimezone(timezone.utc).replace(tzinfo=None)
+    else:
+        moment += timedelta(days=days)
+    return (f'{moment.year:04d}{moment.month:02d}{moment.day:02d}T'
+            f'{moment.hour:02d}{moment.minute:02d}{moment.second:02d}{"Z" if is_utc else ""}')
+
+
+def shift_property_value(value, params, days, local_zone=None):
+    """Shift a comma-separated list of dates, date-times or PERIODs"""
+    shifted = []
+    for item in value.split(','):
+        start, slash, end = item.partition('/')
+        start = shift_date_time(start, params, days, local_zone)
+        if slash and not end.lstrip('+-').startswith('P'):
+            end = shift_date_time(end, params, days, local_zone)
+        shifted.append(start + slash + end)
+    return ','.join(shifted)
+
+
+def physical_groups(lines):
+    """Group physical lines (with endings) into one list per folded content line"""
+    group = []
+    for line in lines:
+        if group and line[:1] not in (' ', '\t'):
+            yield group
+            group = []
+        group.append(line)
+    if group:
+        yield group
+
+
+def shift_rule(value, days, local_zone=None):
+    """Shift the UNTIL date of an RRULE value"""
+    parts = value.split(';')
+    for i, part in enumerate(parts):
+        key, _, until = part.partition('=')
+        if key.upper() == 'UNTIL':
+            parts[i] = f'{key}={shift_date_time(until, {}, days, local_zone)}'
+    return ';'.join(parts)
+
+
+def shift_property(group, days, local_zone=None):
+    """Rewrite one property, given as its physical lines, with its dates shifted"""
+    line = group[0].rstrip('\r\n') + ''.join(part.rstrip('\r\n')[1:] for part in group[1:])
+    ending = group[0][len(group[0].rstrip('\r\n')):]
+    name, params, value = split_property(line)
+    if name == 'RRULE':
+        if 'UNTIL' not in value.upper():
+            return group
+        shifted = shift_rule(value, days, local_zone)
+    else:
+        shifted = shift_property_value(value, params, days, local_zone)
+    head = line[:len(line) - len(value)]
+    return [part + ending for part in fold_line(head + shifted)]
+
+
+def shift_lines(source, days, local_zone=None):
+    """Yield a feed's lines with every date moved by a number of days.
+
+    DTSTART, DTEND, DUE, RECURRENCE-ID, EXDATE and RDATE values and RRULE
+    UNTIL dates are rewritten, except in VTIMEZONE definitions. Every
+    other line, with its folding and line ending, is copied unchanged. Only
+    one property is held in memory at a time.
+
+    Args:
+        source: Feed text, or an iterable of lines with their endings such
+            as a file opened with newline=''
+        days: Days to move the dates; negative moves them earlier
+        local_zone: Zone whose wall-clock time UTC values keep. Defaults
+            to the feed's X-WR-TIMEZONE, if it has one.
+
+    Raises:
+        CalendarParseError: A date or date-time cannot be read
+    """
+    if isinstance(source, str):
+        source = text_lines_with_endings(source)
+    in_timezone = False
+    for group in physical_groups(source):
+        first = group[0]
+        name = PROPERTY_NAME.match(first).group().upper()
+        if name in SHIFTED_PROPERTIES and not in_timezone:
+            yield from shift_property(group, days, local_zone)
+            continue
+        if name in ('BEGIN', 'END') and first.rstrip('\r\n').upper().endswith(':VTIMEZONE'):
+            in_timezone = name == 'BEGIN'
+        elif name == 'X-WR-TIMEZONE' and local_zone is None:
+            local_zone = zone(first.partition(':')[2].strip())
+        yield from group
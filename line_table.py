@@ -0,0 +1,261 @@
+# line_table.py
+"""Columnar storage for the text lines of an analyzed PDF.
+
+A 200-page handout has thousands of lines, and the accessibility tagger
+keeps all of them in session state for as long as the user reviews tags.
+As one dict per line, each line costs over a kilobyte of Python objects.
+LineTable keeps each field in its own NumPy array instead. Font names are
+stored once per document, and tags are stored as small integer codes.
+Indexing a table still returns a line dict, for code that handles one
+line at a time.
+"""
+
+import sys
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+
+TAGS = ['H1', 'H2', 'H3', 'Body Text']
+BODY_LEVEL = len(TAGS) - 1
+
+
+class LineTable:
+    """Text lines of a document in page order, one array per field"""
+
+    __slots__ = (
+        'text', 'page', 'font_size', 'bold', 'italic', 'y_position', 'bbox',
+        'char_count', 'word_count', 'font_names', 'font_codes', 'font_offsets',
+        'ocr', 'suggested', 'user', 'edited'
+    )
+
+    def __init__(self, text, page, font_size, bold, italic, y_position, bbox,
+                 char_count, word_count, font_names, font_codes, font_offsets,
+                 ocr=None, suggested=None, user=None, edited=None):
+        n = len(text)
+        self.text = text                              # list of str
+        self.page = np.asarray(page, np.int32)        # 1-based page numbers
+        self.font_size = np.asarray(font_size, np.float64)
+        self.bold = np.asarray(bold, bool)
+        self.italic = np.asarray(italic, bool)
+        self.y_position = np.asarray(y_position, np.float32)   # Top of the line, from the page top
+        self.bbox = np.asarray(bbox, np.float32).reshape(n, 4)  # x0, y0, x1, y1 in PDF user space
+        self.char_count = np.asarray(char_count, np.int32)
+        self.word_count = np.asarray(word_count, np.int32)
+        # Fonts of line i are font_names[font_codes[font_offsets[i]:font_offsets[i + 1]]]
+        self.font_names = font_names
+        self.font_codes = np.asarray(font_codes, np.int16)
+        self.font_offsets = np.asarray(font_offsets, np.int32)
+        # Lines read from a scanned page by OCR rather than from its text layer
+        self.ocr = np.zeros(n, bool) if ocr is None else np.asarray(ocr, bool)
+        # Tags as indexes into TAGS
+        self.suggested = np.full(n, BODY_LEVEL, np.int8) if suggested is None else np.asarray(suggested, np.int8)
+        self.user = self.suggested.copy() if user is None else np.asarray(user, np.int8)
+        # Lines whose tag the user set by hand, which re-classifying leaves alone
+        self.edited = np.zeros(n, bool) if edited is None else np.asarray(edited, bool)
+
+    @classmethod
+    def from_elements(cls, text_elements):
+        """Pack line dicts, as page_lines returns them, into a table"""
+        font_index = {}
+        font_codes = []
+        font_offsets = [0]
+        for elem in text_elements:
+            font_codes.extend(font_index.setdefault(font, len(font_index)) for font in elem['fonts'])
+            font_offsets.append(len(font_codes))
+        return cls(
+            text=[elem['text'] for elem in text_elements],
+            page=[elem['page'] for elem in text_elements],
+            font_size=[elem['font_size'] for elem in text_elements],
+            bold=[elem['bold'] for elem in text_elements],
+            italic=[elem['italic'] for elem in text_elements],
+            y_position=[elem['y_position'] for elem in text_elements],
+            bbox=[elem['bbox'] for elem in text_elements],
+            char_count=[elem['char_count'] for elem in text_elements],
+            word_count=[elem['word_count'] for elem in text_elements],
+            font_names=list(font_index),
+            font_codes=font_codes,
+            font_offsets=font_offsets,
+            ocr=[elem.get('ocr', False) for elem in text_elements],
+        )
+
+    @classmethod
+    def concat(cls, tables):
+        """Join tables end to end, merging their font names"""
+        if not tables:
+            return cls.from_elements([])
+        font_index = {}
+        font_codes = []
+        font_offsets = [np.zeros(1, np.int32)]
+        fonts_before = 0
+        for table in tables:
+            remap = np.array([font_index.setdefault(font, len(font_index)) for font in table.font_names], np.int16)
+            font_codes.append(remap[table.font_codes] if len(remap) else table.font_codes)
+            font_offsets.append(table.font_offsets[1:] + fonts_before)
+            fonts_before += len(table.font_codes)
+
+        def join(field):
+            return np.concatenate([getattr(table, field) for table in tables])
+
+        return cls(
+            text=[text for table in tables for text in table.text],
+            page=join('page'),
+            font_size=join('font_size'),
+            bold=join('bold'),
+            italic=join('italic'),
+            y_position=join('y_position'),
+            bbox=join('bbox'),
+            char_count=join('char_count'),
+            word_count=join('word_count'),
+            font_names=list(font_index),
+            font_codes=np.concatenate(font_codes),
+            font_offsets=np.concatenate(font_offsets),
+            ocr=join('ocr'),
+            suggested=join('suggested'),
+            user=join('user'),
+            edited=join('edited'),
+        )
+
+    def take(self, rows):
+        """Return a new table with the given rows, in that order"""
+        font_counts = np.diff(self.font_offsets)[rows]
+        font_offsets = np.concatenate(([0], np.cumsum(font_counts)))
+        font_rows = np.repeat(self.font_offsets[rows], font_counts) + (
+            np.arange(font_offsets[-1]) - np.repeat(font_offsets[:-1], font_counts)
+        )
+        return LineTable(
+            text=[self.text[i] for i in np.asarray(rows).tolist()],
+            page=self.page[rows],
+            font_size=self.font_size[rows],
+            bold=self.bold[rows],
+            italic=self.italic[rows],
+            y_position=self.y_position[rows],
+            bbox=self.bbox[rows],
+            char_count=self.char_count[rows],
+            word_count=self.word_count[rows],
+            font_names=self.font_names,
+            font_codes=self.font_codes[font_rows],
+            font_offsets=font_offsets,
+            ocr=self.ocr[rows],
+            suggested=self.suggested[rows],
+            user=self.user[rows],
+            edited=self.edited[rows],
+        )
+
+    def __len__(self):
+        return len(self.text)
+
+    def __getitem__(self, i):
+        """Return line i as a dict with the keys page_lines produces"""
+        return {
+            'page': int(self.page[i]),
+            'text': self.text[i],
+            'font_size': float(self.font_size[i]),
+            'fonts': self.fonts(i),
+            'bold': bool(self.bold[i]),
+            'italic': bool(self.italic[i]),
+            'y_position': float(self.y_position[i]),
+            'bbox': tuple(self.bbox[i].tolist()),
+            'char_count': int(self.char_count[i]),
+            'word_count': int(self.word_count[i]),
+            'ocr': bool(self.ocr[i]),
+            'suggested_tag': TAGS[self.suggested[i]],
+            'user_tag': TAGS[self.user[i]],
+        }
+
+    def __iter__(self):
+        return (self[i] for i in range(len(self)))
+
+    def fonts(self, i):
+        """Return the font names of line i, one per span"""
+        codes = self.font_codes[self.font_offsets[i]:self.font_offsets[i + 1]]
+        return [self.font_names[code] for code in codes]
+
+    def tags(self, rows=None):
+        """Return the user's tag names for the given rows (all lines by default)"""
+        codes = self.user if rows is None else self.user[rows]
+        return [TAGS[code] for code in codes]
+
+    def tag_counts(self):
+        """Return the number of lines with each user tag"""
+        return dict(zip(TAGS, np.bincount(self.user, minlength=len(TAGS)).tolist()))
+
+    def set_suggestions(self, levels):
+        """Store suggested tag levels and reset the user's tags to them"""
+        self.suggested = np.asarray(levels, np.int8)
+        self.user = self.suggested.copy()
+        self.edited = np.zeros(len(self), bool)
+
+    def update_suggestions(self, levels):
+        """Store new suggested tag levels, keeping the tags the user set by hand.
+
+        Returns the number of lines whose tag changed.
+        """
+        self.suggested = np.asarray(levels, np.int8)
+        user = np.where(self.edited, self.user, self.suggested).astype(np.int8)
+        changed = int(np.count_nonzero(user != self.user))
+        self.user = user
+        return changed
+
+    def set_tag(self, rows, tag):
+        """Set the user tag of the given rows by hand and return how many lines changed"""
+        code = TAGS.index(tag)
+        changed = int(np.count_nonzero(self.user[rows] != code))
+        self.user[rows] = code
+        self.edited[rows] = True
+        return changed
+
+    def page_offsets(self):
+        """Index of the first line on or after every page, so a page range is a slice"""
+        last_page = int(self.page[-1]) if len(self) else 0
+        return np.searchsorted(self.page, np.arange(last_page + 2)).tolist()
+
+    def nbytes(self):
+        """Approximate memory held by the table, text included"""
+        arrays = sum(getattr(self, field).nbytes for field in self.__slots__
+                     if isinstance(getattr(self, field), np.ndarray))
+        strings = sys.getsizeof(self.text) + sum(sys.getsizeof(text) for text in self.text)
+        return arrays + strings + sum(sys.getsizeof(name) for name in self.font_names)
+
+    def to_arrow(self):
+        """Convert to an Arrow table for the analysis cache"""
+        fonts = pa.array(self.font_names, pa.string()).take(pa.array(self.font_codes))
+        return pa.table({
+            'page': pa.array(self.page),
+            'text': pa.array(self.text, pa.string()),
+            'font_size': pa.array(self.font_size),
+            'fonts': pa.ListArray.from_arrays(pa.array(self.font_offsets), fonts),
+            'bold': pa.array(self.bold),
+            'italic': pa.array(self.italic),
+            'y_position': pa.array(self.y_position),
+            'bbox': pa.FixedSizeListArray.from_arrays(pa.array(self.bbox.ravel()), 4),
+            'char_count': pa.array(self.char_count),
+            'word_count': pa.array(self.word_count),
+            'ocr': pa.array(self.ocr),
+            'suggested_tag': pa.array(TAGS, pa.string()).take(pa.array(self.suggested)),
+        })
+
+    @classmethod
+    def from_arrow(cls, table):
+        """Load a table written by to_arrow, with user tags reset to the suggestions"""
+        fonts = table.column('fonts').combine_chunks()
+        font_offsets = fonts.offsets.to_numpy() - fonts.offsets[0].as_py()
+        font_ids = fonts.flatten().dictionary_encode()
+        bbox = table.column('bbox').combine_chunks().flatten().to_numpy()
+        suggested = pc.index_in(table.column('suggested_tag'), value_set=pa.array(TAGS)).fill_null(BODY_LEVEL)
+        return cls(
+            text=table.column('text').to_pylist(),
+            page=table.column('page').to_numpy(),
+            font_size=table.column('font_size').to_numpy(),
+            bold=table.column('bold').to_numpy(),
+            italic=table.column('italic').to_numpy(),
+            y_position=table.column('y_position').to_numpy(),
+            bbox=bbox,
+            char_count=table.column('char_count').to_numpy(),
+            word_count=table.column('word_count').to_numpy(),
+            font_names=font_ids.dictionary.to_pylist(),
+            font_codes=font_ids.indices.to_numpy(),
+            font_offsets=font_offsets,
+            ocr=table.column('ocr').to_numpy(),
+            suggested=suggested.to_numpy(),
+        )
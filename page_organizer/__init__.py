@@ -0,0 +1,48 @@
+# page_organizer/__init__.py
+"""Drag-and-drop page organizer for the PDF editor.
+
+A Streamlit custom component (plain HTML and JavaScript, no build step)
+that shows a file's pages as a virtualized thumbnail grid. Reordering,
+rotating and deleting happen in the browser; Python only hears about them
+when the user applies the edits, as one batch of ops for apply_page_ops.
+"""
+
+import base64
+import os
+
+import streamlit.components.v1 as components
+
+_component = components.declare_component(
+    "page_organizer",
+    path=os.path.join(os.path.dirname(os.path.abspath(__file__)), "frontend")
+)
+
+
+def page_organizer(pages, thumbnails, applied_batch=None, height=640, key=None):
+    """Show the organizer grid and return the last event the browser sent.
+
+    Args:
+        pages: The file's page refs in their current order
+        thumbnails: {page_index: png_bytes} for pages whose images are loaded;
+            the browser keeps the ones it has already received
+        applied_batch: The last 'ops_batch' Python handled, applied or
+            rejected, so the browser stops resending it
+        height: Height of the grid in pixels
+        key: Streamlit widget key
+
+    Returns:
+        None until the user acts, then a dict with a unique 'batch' id and
+        any of 'ops' with its 'ops_batch' id (edits to apply) and
+        'thumbnails' (page indexes in view that still have no image)
+    """
+    return _component(
+        pages=[{'page_index': p['page_index'], 'rotation': p['rotation']} for p in pages],
+        thumbnails={
+            str(i): "data:image/png;base64," + base64.b64encode(png).decode('ascii')
+            for i, png in thumbnails.items()
+        },
+        applied_batch=applied_batch,
+        height=height,
+        key=key,
+        default=None
+    )
@@ -1,11 +1,20 @@
 import streamlit as st
-from pypdf import PdfReader, PdfWriter
-from io import BytesIO
-import fitz  # PyMuPDF
-from collections import defaultdict
+import math
+import time
+import uuid
+import numpy as np
+from blob_store import BlobNotFoundError, QuotaExceededError, create_blob_store
+from analysis_cache import AnalysisCache
+from line_table import BODY_LEVEL, LineTable
+from pdf_structure import DEFAULT_THRESHOLDS, analyze_pdf, reclassify
+from pdf_tagging import create_tagged_pdf
+from process_pool import RestartingPool
 
 st.set_page_config(page_title="PDF Accessibility Tagger", page_icon="🏷️", layout="wide")
 
+TAG_OPTIONS = ["H1", "H2", "H3", "Body Text"]
+REVIEW_PAGES_PER_VIEW = 5
+
 # Custom CSS for clean, professional look with dark mode support
 st.markdown("""
 <style>
@@ -123,120 +132,59 @@ st.markdown("""
 if 'pdf_uploaded' not in st.session_state:
     st.session_state.pdf_uploaded = False
 if 'text_elements' not in st.session_state:
-    st.session_state.text_elements = []
+    st.session_state.text_elements = LineTable.from_elements([])
 if 'current_step' not in st.session_state:
     st.session_state.current_step = 1
+if 'session_id' not in st.session_state:
+    st.session_state.session_id = uuid.uuid4().hex
+if 'review_version' not in st.session_state:
+    st.session_state.review_version = 0
+if 'thresholds' not in st.session_state:
+    st.session_state.thresholds = dict(DEFAULT_THRESHOLDS)
 
-def analyze_pdf_hierarchy(pdf_bytes):
-    """Analyze PDF to detect text hierarchy based on multiple factors"""
-    doc = fitz.open(stream=pdf_bytes, filetype="pdf")
-    text_elements = []
-    
-    for page_num, page in enumerate(doc):
-        blocks = page.get_text("dict")["blocks"]
-        
-        for block in blocks:
-            if block["type"] == 0:  # Text block
-                for line in block["lines"]:
-                    # Combine all spans in a line into one element
-                    line_text = " ".join(span["text"] for span in line["spans"]).strip()
-                    
-                    if line_text and len(line_text) > 1:  # Skip single characters
-                        # Get the largest font in this line (usually the dominant one)
-                        max_font_size = max(span["size"] for span in line["spans"])
-                        fonts = [span["font"] for span in line["spans"]]
-                        is_bold = any("Bold" in font for font in fonts)
-                        is_italic = any("Italic" in font or "Oblique" in font for font in fonts)
-                        
-                        # Get vertical position on page
-                        y_position = line["bbox"][1]
-                        
-                        text_elements.append({
-                            'page': page_num + 1,
-                            'text': line_text,
-                            'font_size': max_font_size,
-                            'fonts': fonts,
-                            'bold': is_bold,
-                            'italic': is_italic,
-                            'y_position': y_position,
-                            'char_count': len(line_text),
-                            'word_count': len(line_text.split()),
-                            'suggested_tag': None,
-                            'user_tag': None
-                        })
-    
-    # Analyze patterns to suggest tags
-    if text_elements:
-        # Look for common patterns
-        for i, elem in enumerate(text_elements):
-            text = elem['text']
-            char_count = elem['char_count']
-            word_count = elem['word_count']
-            
-            # Skip very long paragraphs
-            if char_count > 300:
-                elem['suggested_tag'] = 'Body Text'
-                elem['user_tag'] = 'Body Text'
-                continue
-            
-            # Pattern 1: Short lines (likely titles or headings)
-            if char_count < 100 and word_count <= 10:
-                # Check if it's isolated (has space before/after)
-                has_space_before = i == 0 or text_elements[i-1]['char_count'] > 200
-                has_space_after = i == len(text_elements)-1 or text_elements[i+1]['char_count'] > 200
-                
-                if has_space_before or has_space_after:
-                    # Check position on page (titles often at top)
-                    if elem['y_position'] < 200:
-                        elem['suggested_tag'] = 'H1'
-                    else:
-                        # Look for name patterns (likely author names)
-                        words = text.split()
-                        # Check if it looks like a name (2-4 capitalized words)
-                        if 2 <= word_count <= 4 and all(w[0].isupper() for w in words if w):
-                            elem['suggested_tag'] = 'H2'
-                        else:
-                            elem['suggested_tag'] = 'H2'
-                else:
-                    elem['suggested_tag'] = 'H3'
-            
-            # Pattern 2: Moderate length (50-200 chars)
-            elif 50 <= char_count <= 200:
-                if elem['bold'] or elem['italic']:
-                    elem['suggested_tag'] = 'H3'
-                else:
-                    elem['suggested_tag'] = 'Body Text'
-            
-            # Pattern 3: Everything else is body text
-            else:
-                elem['suggested_tag'] = 'Body Text'
-            
-            elem['user_tag'] = elem['suggested_tag']
-    
-    doc.close()
-    return text_elements
+@st.cache_resource
+def get_blob_store():
+    """PDF bytes for every session live here; session state only keeps blob ids"""
+    return create_blob_store()
 
-def create_tagged_pdf(original_pdf_bytes, text_elements):
-    """Create a tagged PDF with accessibility markup"""
-    # For now, we'll return a modified version
-    # In production, you'd use pikepdf or similar for full tagging
-    reader = PdfReader(BytesIO(original_pdf_bytes))
-    writer = PdfWriter()
-    
-    # Copy all pages
-    for page in reader.pages:
-        writer.add_page(page)
-    
-    # Add metadata
-    writer.add_metadata({
-        '/Title': 'Accessible Document',
-        '/Tagged': 'True'
-    })
-    
-    output = BytesIO()
-    writer.write(output)
-    output.seek(0)
-    return output.read()
+@st.cache_resource
+def get_extract_pool():
+    """Process pool for text extraction, shared by all sessions"""
+    return RestartingPool()
+
+@st.cache_resource
+def get_analysis_cache():
+    """Analyses of every PDF seen by any session, keyed by content hash"""
+    return AnalysisCache()
+
+def analyze_pdf_hierarchy(pdf_bytes, progress=None, ocr_progress=None):
+    """Analyze PDF to detect text hierarchy from each document's font sizes and weights.
+
+    Scanned pages are read with OCR. Reuses the cached analysis when the
+    same PDF was analyzed before.
+    """
+    return analyze_pdf(
+        pdf_bytes, cache=get_analysis_cache(), progress=progress,
+        executor=get_extract_pool(), ocr_progress=ocr_progress,
+        thresholds=st.session_state.thresholds
+    )
+
+def apply_review_edits(editor_key):
+    """Copy tag edits from the review grid onto the text elements they show"""
+    rows = st.session_state.review_rows
+    for position, changes in st.session_state[editor_key]['edited_rows'].items():
+        if changes.get('Tag') in TAG_OPTIONS:
+            st.session_state.text_elements.set_tag(rows[int(position)], changes['Tag'])
+    # A fresh grid, so row positions always match the current filter
+    st.session_state.review_version += 1
+
+def start_over():
+    """Forget the uploaded PDF and its analysis"""
+    get_blob_store().release_session(st.session_state.session_id)
+    for key in ['pdf_uploaded', 'text_elements', 'page_offsets', 'pdf_blob_id', 'tagged_blob_id', 'ocr_pages']:
+        if key in st.session_state:
+            del st.session_state[key]
+    st.session_state.current_step = 1
 
 # Header
 st.markdown('<div class="main-header">PDF Accessibility Tagger</div>', unsafe_allow_html=True)
@@ -281,7 +229,7 @@ st.markdown("---")
 
 # Step 1: Upload
 st.markdown("### Step 1: Upload Your PDF")
-st.markdown("Select a PDF file from your computer. The tool works best with text-based PDFs (not scanned images).")
+st.markdown("Select a PDF file from your computer. Scanned pages are read with OCR, which is slower and less accurate than a PDF's own text.")
 
 uploaded_file = st.file_uploader(
     "Choose a PDF file",
@@ -291,16 +239,45 @@ uploaded_file = st.file_uploader(
 
 if uploaded_file:
     if not st.session_state.pdf_uploaded:
-        with st.spinner("Analyzing PDF structure..."):
-            pdf_bytes = uploaded_file.read()
-            st.session_state.pdf_bytes = pdf_bytes
-            st.session_state.text_elements = analyze_pdf_hierarchy(pdf_bytes)
-            st.session_state.pdf_uploaded = True
-            st.session_state.current_step = 2
+        pdf_bytes = uploaded_file.read()
+        try:
+            st.session_state.pdf_blob_id = get_blob_store().put(pdf_bytes, st.session_state.session_id)
+        except QuotaExceededError as e:
+            st.error(f"Could not store this PDF: {str(e)}")
+            st.stop()
+        progress_bar = st.progress(0.0, text="Analyzing PDF structure...")
+        st.session_state.ocr_pages = []
+
+        def ocr_progress(report, done, total):
+            st.session_state.ocr_pages.append(report)
+            progress_bar.progress(done / total, text=f"Reading scanned page {done} of {total} with OCR...")
+
+        st.session_state.text_elements = analyze_pdf_hierarchy(
+            pdf_bytes,
+            progress=lambda done, total: progress_bar.progress(
+                done / total, text=f"Analyzing page {done} of {total}..."
+            ),
+            ocr_progress=ocr_progress
+        )
+        progress_bar.empty()
+        st.session_state.page_offsets = st.session_state.text_elements.page_offsets()
+        st.session_state.pdf_uploaded = True
+        st.session_state.current_step = 2
         st.rerun()
 
+if st.session_state.pdf_uploaded:
+    ocr_errors = [r for r in st.session_state.get('ocr_pages', []) if r['error']]
+    if ocr_errors:
+        st.warning(
+            f"{len(ocr_errors)} scanned page(s) could not be read: {ocr_errors[0]['error']}. "
+            f"Pages: {', '.join(str(r['page']) for r in ocr_errors)}"
+        )
+    if not len(st.session_state.text_elements):
+        st.warning("No text was found in this PDF, so there is nothing to tag.")
+        st.button("Start Over", on_click=start_over)
+
 # Step 2: Review and Edit Tags
-if st.session_state.pdf_uploaded and st.session_state.text_elements:
+if st.session_state.pdf_uploaded and len(st.session_state.text_elements):
     st.markdown("---")
     st.markdown("### Step 2: Review and Adjust Heading Tags")
     st.markdown("""
@@ -310,23 +287,133 @@ if st.session_state.pdf_uploaded and st.session_state.text_elements:
     
     # Summary statistics
     col1, col2, col3, col4 = st.columns(4)
-    h1_count = sum(1 for e in st.session_state.text_elements if e['user_tag'] == 'H1')
-    h2_count = sum(1 for e in st.session_state.text_elements if e['user_tag'] == 'H2')
-    h3_count = sum(1 for e in st.session_state.text_elements if e['user_tag'] == 'H3')
-    body_count = sum(1 for e in st.session_state.text_elements if e['user_tag'] == 'Body Text')
+    lines = st.session_state.text_elements
+    tag_counts = lines.tag_counts()
     
     with col1:
-        st.metric("H1 Headings", h1_count)
+        st.metric("H1 Headings", tag_counts['H1'])
     with col2:
-        st.metric("H2 Headings", h2_count)
+        st.metric("H2 Headings", tag_counts['H2'])
     with col3:
-        st.metric("H3 Headings", h3_count)
+        st.metric("H3 Headings", tag_counts['H3'])
     with col4:
-        st.metric("Body Text", body_count)
+        st.metric("Body Text", tag_counts['Body Text'])
+    
+    ocr_read = [r for r in st.session_state.get('ocr_pages', []) if not r['error']]
+    if ocr_read:
+        with st.expander(f"Scanned pages read with OCR ({len(ocr_read)})"):
+            st.caption("OCR text can contain mistakes. Check these pages' lines carefully.")
+            st.dataframe(
+                {
+                    'Page': [r['page'] for r in ocr_read],
+                    'Lines': [r['lines'] for r in ocr_read],
+                    'Seconds': [r['seconds'] for r in ocr_read],
+                    'Cached': [r['cached'] for r in ocr_read],
+                },
+                column_config={'Seconds': st.column_config.NumberColumn(format="%.2f")},
+                hide_index=True
+            )
+    
+    # Tunable detection thresholds
+    with st.expander("Heading detection settings"):
+        st.caption(
+            "Headings are detected again from the lines already read from your PDF, so changes apply "
+            "right away. Tags you changed by hand are kept."
+        )
+        thresholds = st.session_state.thresholds
+        with st.form("detection_settings"):
+            col_left, col_right = st.columns(2)
+            with col_left:
+                min_heading_ratio = st.number_input(
+                    "Bold headings are at least this many times body text size",
+                    min_value=1.0, max_value=3.0, step=0.01, value=float(thresholds['min_heading_ratio'])
+                )
+                min_plain_heading_ratio = st.number_input(
+                    "Regular-weight headings are at least this many times body text size",
+                    min_value=1.0, max_value=3.0, step=0.01, value=float(thresholds['min_plain_heading_ratio'])
+                )
+                size_gap = st.number_input(
+                    "Font sizes within this many points count as one style",
+                    min_value=0.0, max_value=5.0, step=0.25, value=float(thresholds['size_gap'])
+                )
+                set_off_space = st.number_input(
+                    "Bold body-size headings need this much space above them (× font size)",
+                    min_value=0.0, max_value=3.0, step=0.1, value=float(thresholds['set_off_space'])
+                )
+            with col_right:
+                max_heading_share = st.slider(
+                    "A style carrying more than this share of the text is body text",
+                    min_value=5, max_value=100, format="%d%%",
+                    value=int(round(thresholds['max_heading_share'] * 100))
+                )
+                max_heading_chars = st.number_input(
+                    "Longest heading, in characters",
+                    min_value=10, max_value=2000, step=10, value=int(thresholds['max_heading_chars'])
+                )
+                max_heading_words = st.number_input(
+                    "Longest heading, in words",
+                    min_value=1, max_value=300, step=1, value=int(thresholds['max_heading_words'])
+                )
+            col_detect, col_defaults = st.columns(2)
+            with col_detect:
+                redetect = st.form_submit_button("Re-detect headings", type="primary", use_container_width=True)
+            with col_defaults:
+                restore = st.form_submit_button("Restore defaults", use_container_width=True)
+        if redetect or restore:
+            if restore:
+                st.session_state.thresholds = dict(DEFAULT_THRESHOLDS)
+            else:
+                st.session_state.thresholds = {
+                    'size_gap': size_gap,
+                    'min_heading_ratio': min_heading_ratio,
+                    'min_plain_heading_ratio': min_plain_heading_ratio,
+                    'max_heading_share': max_heading_share / 100,
+                    'max_heading_chars': max_heading_chars,
+                    'max_heading_words': max_heading_words,
+                    'set_off_space': set_off_space,
+                }
+            start = time.perf_counter()
+            changed = reclassify(lines, st.session_state.thresholds)
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            st.session_state.review_version += 1
+            st.toast(
+                f"Re-detected headings in {elapsed_ms:.0f} ms: {changed} line(s) changed, "
+                f"{int(lines.edited.sum())} hand-set tag(s) kept"
+            )
+            st.rerun()
     
     st.markdown("---")
     
+    # Bulk changes by font style
+    with st.expander("Change many lines at once"):
+        rounded_sizes = np.round(lines.font_size * 2) / 2
+        sizes, counts = np.unique(rounded_sizes, return_counts=True)
+        size_counts = dict(zip(sizes.tolist(), counts.tolist()))
+        col_size, col_bold, col_tag, col_apply = st.columns([2, 1, 1, 1])
+        with col_size:
+            bulk_size = st.selectbox(
+                "Lines with font size",
+                sorted(size_counts, reverse=True),
+                format_func=lambda size: f"{size:.1f}pt ({size_counts[size]} lines)"
+            )
+        with col_bold:
+            st.markdown("<div style='padding-top: 2rem;'></div>", unsafe_allow_html=True)
+            bulk_bold_only = st.checkbox("Bold only")
+        with col_tag:
+            bulk_tag = st.selectbox("Set tag to", TAG_OPTIONS, index=1)
+        with col_apply:
+            st.markdown("<div style='padding-top: 1.75rem;'></div>", unsafe_allow_html=True)
+            if st.button("Apply", use_container_width=True):
+                matches = (rounded_sizes == bulk_size) & (lines.bold | (not bulk_bold_only))
+                changed = lines.set_tag(matches, bulk_tag)
+                st.session_state.review_version += 1
+                st.toast(f"Set {changed} line(s) to {bulk_tag}")
+                st.rerun()
+    
     # Filter options
+    offsets = st.session_state.page_offsets
+    num_pages = len(offsets) - 2
+    num_views = math.ceil(num_pages / REVIEW_PAGES_PER_VIEW)
     col_filter1, col_filter2 = st.columns([2, 1])
     with col_filter1:
         filter_option = st.radio(
@@ -334,47 +421,59 @@ if st.session_state.pdf_uploaded and st.session_state.text_elements:
             ["All Elements", "Only Headings (H1, H2, H3)", "Only Body Text"],
             horizontal=True
         )
+    with col_filter2:
+        view = st.selectbox(
+            "PDF pages",
+            range(num_views),
+            format_func=lambda v: f"{v * REVIEW_PAGES_PER_VIEW + 1}–"
+                                  f"{min((v + 1) * REVIEW_PAGES_PER_VIEW, num_pages)}"
+        )
     
     # Display text elements for review
     st.markdown("### Text Elements")
-    st.markdown("Use the dropdown next to each text element to change its tag type.")
+    st.markdown("Change a line's tag in the **Tag** column. Lines are grouped by the PDF page they appear on.")
     
-    elements_to_show = st.session_state.text_elements
+    first_page = view * REVIEW_PAGES_PER_VIEW + 1
+    last_page = min(first_page + REVIEW_PAGES_PER_VIEW, num_pages + 1)
+    rows = np.arange(offsets[first_page], offsets[last_page])
     if filter_option == "Only Headings (H1, H2, H3)":
-        elements_to_show = [e for e in elements_to_show if e['user_tag'] in ['H1', 'H2', 'H3']]
+        rows = rows[lines.user[rows] != BODY_LEVEL]
     elif filter_option == "Only Body Text":
-        elements_to_show = [e for e in elements_to_show if e['user_tag'] == 'Body Text']
+        rows = rows[lines.user[rows] == BODY_LEVEL]
+    # Row positions in the grid map straight to line indexes
+    st.session_state.review_rows = rows.tolist()
     
-    for idx, elem in enumerate(elements_to_show):
-        original_idx = st.session_state.text_elements.index(elem)
-        
-        col1, col2, col3 = st.columns([3, 2, 1])
-        
-        with col1:
-            # Display text preview
-            tag_class = f"tag-{elem['user_tag'].lower().replace(' ', '-')}"
-            st.markdown(f"""
-                <div class="text-preview">
-                    <small style="color: #64748b;">Page {elem['page']}</small><br>
-                    {elem['text'][:200]}{'...' if len(elem['text']) > 200 else ''}
-                </div>
-            """, unsafe_allow_html=True)
-        
-        with col2:
-            new_tag = st.selectbox(
-                "Tag Type",
-                ["H1", "H2", "H3", "Body Text"],
-                index=["H1", "H2", "H3", "Body Text"].index(elem['user_tag']),
-                key=f"tag_{original_idx}",
-                label_visibility="collapsed"
-            )
-            st.session_state.text_elements[original_idx]['user_tag'] = new_tag
-        
-        with col3:
-            st.markdown(f"<div style='padding-top: 1rem;'><small>Font: {elem['font_size']:.1f}pt</small></div>", unsafe_allow_html=True)
-        
-        if idx < len(elements_to_show) - 1:
-            st.markdown("<hr style='margin: 0.5rem 0; border: none; border-top: 1px solid #e2e8f0;'>", unsafe_allow_html=True)
+    editor_key = f"review_{st.session_state.review_version}"
+    if len(rows):
+        texts = [lines.text[i] for i in st.session_state.review_rows]
+        columns = {
+            'Page': lines.page[rows].tolist(),
+            'Text': [text[:200] + ('...' if len(text) > 200 else '') for text in texts],
+            'Font': lines.font_size[rows].tolist(),
+            'Bold': lines.bold[rows].tolist(),
+            'Tag': lines.tags(rows),
+        }
+        if lines.ocr.any():
+            columns['OCR'] = lines.ocr[rows].tolist()
+        st.data_editor(
+            columns,
+            column_config={
+                'Page': st.column_config.NumberColumn(width="small"),
+                'Text': st.column_config.TextColumn(width="large"),
+                'Font': st.column_config.NumberColumn(format="%.1f pt", width="small"),
+                'Bold': st.column_config.CheckboxColumn(width="small"),
+                'Tag': st.column_config.SelectboxColumn(options=TAG_OPTIONS, required=True),
+                'OCR': st.column_config.CheckboxColumn(width="small", help="Read from a scanned page"),
+            },
+            disabled=['Page', 'Text', 'Font', 'Bold', 'OCR'],
+            hide_index=True,
+            use_container_width=True,
+            key=editor_key,
+            on_change=apply_review_edits,
+            args=(editor_key,)
+        )
+    else:
+        st.info("No lines on these pages match the filter.")
     
     st.markdown("---")
     
@@ -387,27 +486,32 @@ if st.session_state.pdf_uploaded and st.session_state.text_elements:
     with col1:
         if st.button("Generate Accessible PDF", type="primary", use_container_width=True):
             with st.spinner("Creating accessible PDF..."):
-                tagged_pdf = create_tagged_pdf(st.session_state.pdf_bytes, st.session_state.text_elements)
-                st.session_state.tagged_pdf = tagged_pdf
-                st.success("Accessible PDF generated successfully!")
+                store = get_blob_store()
+                try:
+                    tagged_pdf = create_tagged_pdf(
+                        store.get(st.session_state.pdf_blob_id), st.session_state.text_elements
+                    )
+                    if 'tagged_blob_id' in st.session_state:
+                        store.release(st.session_state.tagged_blob_id, st.session_state.session_id)
+                    st.session_state.tagged_blob_id = store.put(tagged_pdf, st.session_state.session_id)
+                    st.success("Accessible PDF generated successfully!")
+                except BlobNotFoundError:
+                    st.error("The uploaded PDF expired from temporary storage. Click Start Over and upload it again.")
+                except QuotaExceededError as e:
+                    st.error(f"Could not store the accessible PDF: {str(e)}")
     
     with col2:
-        if 'tagged_pdf' in st.session_state:
+        if 'tagged_blob_id' in st.session_state and get_blob_store().contains(st.session_state.tagged_blob_id):
             st.download_button(
                 label="Download Accessible PDF",
-                data=st.session_state.tagged_pdf,
+                data=get_blob_store().get(st.session_state.tagged_blob_id),
                 file_name=f"accessible_{uploaded_file.name}",
                 mime="application/pdf",
                 use_container_width=True
             )
     
     with col3:
-        if st.button("Start Over", use_container_width=True):
-            for key in ['pdf_uploaded', 'text_elements', 'pdf_bytes', 'tagged_pdf']:
-                if key in st.session_state:
-                    del st.session_state[key]
-            st.session_state.current_step = 1
-            st.rerun()
+        st.button("Start Over", on_click=start_over, use_container_width=True)
 
 # Footer
 st.markdown("---")
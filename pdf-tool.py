@@ -1,13 +1,34 @@
 import streamlit as st
-from pypdf import PdfReader, PdfWriter
-from reportlab.pdfgen import canvas
-from reportlab.lib.pagesizes import letter
-from io import BytesIO
-import fitz  # PyMuPDF for thumbnails
-import base64
+import uuid
+from functools import partial
+
+from pdf_merge import (
+    PAGE_NUMBER_POSITIONS,
+    apply_page_ops,
+    document_id,
+    extract_pages_from_pdf,
+    merge_pdfs,
+    optimize_pdf,
+)
+from thumbnails import ThumbnailService
+from page_organizer import page_organizer
+from blob_store import BlobNotFoundError, QuotaExceededError, create_blob_store
 
 st.set_page_config(page_title="PDF Merger & Editor", page_icon="📄", layout="wide")
 
+PAGES_PER_VIEW = 20
+NUMBER_FORMATS = {
+    "1, 2, 3": "{n}",
+    "Page 1": "Page {n}",
+    "Page 1 of N": "Page {n} of {total}",
+}
+IMAGE_DPI_OPTIONS = {
+    "Off": None,
+    "300 DPI (print)": 300,
+    "150 DPI (screen)": 150,
+    "96 DPI (smallest)": 96,
+}
+
 # Custom CSS for clean, professional look
 st.markdown("""
 <style>
@@ -32,136 +53,72 @@ if 'file_uploader_key' not in st.session_state:
     st.session_state.file_uploader_key = 0
 if 'editing_file_idx' not in st.session_state:
     st.session_state.editing_file_idx = None
+if 'seen_uploads' not in st.session_state:
+    st.session_state.seen_uploads = set()
+if 'session_id' not in st.session_state:
+    st.session_state.session_id = uuid.uuid4().hex
 
-def extract_pages_from_pdf(pdf_bytes):
-    """Extract individual pages from a PDF with thumbnails"""
-    reader = PdfReader(BytesIO(pdf_bytes))
-    doc = fitz.open(stream=pdf_bytes, filetype="pdf")
-    pages = []
-    
-    for i, page in enumerate(reader.pages):
-        # Extract page as separate PDF
-        writer = PdfWriter()
-        writer.add_page(page)
-        output = BytesIO()
-        writer.write(output)
-        output.seek(0)
-        
-        # Generate thumbnail
-        fitz_page = doc[i]
-        pix = fitz_page.get_pixmap(matrix=fitz.Matrix(0.3, 0.3))  # Scale down for thumbnail
-        img_bytes = pix.tobytes("png")
-        thumbnail_base64 = base64.b64encode(img_bytes).decode()
-        
-        pages.append({
-            'page_num': i + 1,
-            'bytes': output.read(),
-            'thumbnail': thumbnail_base64
-        })
-    
-    doc.close()
-    return pages
+@st.cache_resource
+def get_blob_store():
+    """PDF bytes for every session live here; session state only keeps blob ids"""
+    return create_blob_store()
 
-def add_page_numbers(input_pdf_bytes, position='bottom-center', start_num=1):
-    """Add page numbers to PDF"""
-    reader = PdfReader(BytesIO(input_pdf_bytes))
-    writer = PdfWriter()
-    
-    for page_num, page in enumerate(reader.pages):
-        packet = BytesIO()
-        can = canvas.Canvas(packet, pagesize=letter)
-        
-        page_width = float(page.mediabox.width)
-        page_height = float(page.mediabox.height)
-        
-        positions = {
-            'bottom-center': (page_width / 2, 30),
-            'bottom-right': (page_width - 50, 30),
-            'bottom-left': (50, 30),
-            'top-center': (page_width / 2, page_height - 30),
-            'top-right': (page_width - 50, page_height - 30),
-            'top-left': (50, page_height - 30),
-        }
-        
-        x, y = positions.get(position, (page_width / 2, 30))
-        
-        can.setFont("Helvetica", 10)
-        can.drawCentredString(x, y, str(page_num + start_num))
-        can.save()
-        
-        packet.seek(0)
-        overlay = PdfReader(packet)
-        page.merge_page(overlay.pages[0])
-        writer.add_page(page)
-    
-    output = BytesIO()
-    writer.write(output)
-    output.seek(0)
-    return output.read()
+def load_pdf(pdf_file):
+    """Return the original bytes of an uploaded file"""
+    try:
+        return get_blob_store().get(pdf_file['blob_id'])
+    except BlobNotFoundError:
+        # Evicted since this run started; the expiry check on the next run removes the file and says so
+        st.rerun()
 
-def create_toc_page(toc_entries):
-    """Create a table of contents page"""
-    packet = BytesIO()
-    can = canvas.Canvas(packet, pagesize=letter)
-    
-    can.setFont("Helvetica-Bold", 20)
-    can.drawString(50, 750, "Table of Contents")
-    
-    can.setFont("Helvetica", 12)
-    y_position = 700
-    
-    for entry in toc_entries:
-        if y_position < 50:
-            can.showPage()
-            y_position = 750
-        can.drawString(70, y_position, f"{entry['title']}")
-        can.drawRightString(550, y_position, f"Page {entry['page']}")
-        y_position -= 25
-    
-    can.save()
-    packet.seek(0)
-    return packet.read()
+def with_sources(pdf_files):
+    """Attach a read-only stream over each file's stored bytes for merging"""
+    try:
+        return [{**pdf_file, 'bytes': get_blob_store().open(pdf_file['blob_id'])} for pdf_file in pdf_files]
+    except BlobNotFoundError:
+        st.rerun()
 
-def merge_pdfs(pdf_list, add_toc=True, page_num_position='bottom-center', start_num=1):
-    """Merge multiple PDFs with optional TOC and page numbers"""
-    writer = PdfWriter()
-    toc_entries = []
-    current_page = 1
-    
-    if add_toc:
-        current_page += 1
+def release_files(pdf_files):
+    """Drop this session's hold on the stored bytes of these files"""
+    for pdf_file in pdf_files:
+        get_blob_store().release(pdf_file['blob_id'], st.session_state.session_id)
+
+@st.cache_resource
+def get_thumbnail_service():
+    """One thumbnail renderer and disk cache shared by all sessions"""
+    return ThumbnailService()
+
+def ingest_uploads(new_uploads):
+    """Read new uploads and return their file entries in upload order"""
+    page_refs = {}
+    progress = st.progress(0.0, text=f"Reading {len(new_uploads)} file(s)...")
+    try:
+        for done, (name, pdf_bytes, doc_id) in enumerate(new_uploads, 1):
+            try:
+                page_refs[doc_id] = extract_pages_from_pdf(pdf_bytes, doc_id)
+            except Exception as e:
+                st.error(f"Could not read {name}: {str(e)}")
+            progress.progress(done / len(new_uploads), text=f"Read {name} ({done}/{len(new_uploads)})")
+    finally:
+        progress.empty()
     
-    all_pages = []
-    for pdf_info in pdf_list:
-        toc_entries.append({
-            'title': pdf_info['toc_title'],
-            'page': current_page
+    new_files = []
+    for name, pdf_bytes, doc_id in new_uploads:
+        if doc_id not in page_refs:
+            continue
+        try:
+            blob_id = get_blob_store().put(pdf_bytes, st.session_state.session_id)
+        except QuotaExceededError as e:
+            st.error(f"Could not add {name}: {str(e)}. Remove some files first.")
+            continue
+        new_files.append({
+            'id': doc_id,
+            'name': name,
+            'blob_id': blob_id,
+            'toc_title': name.replace('.pdf', ''),
+            'pages': page_refs[doc_id]
         })
-        
-        # Add pages in order they appear in the pages list
-        for page_info in pdf_info['pages']:
-            reader = PdfReader(BytesIO(page_info['bytes']))
-            all_pages.append(reader.pages[0])
-            current_page += 1
-    
-    if add_toc:
-        toc_pdf_bytes = create_toc_page(toc_entries)
-        toc_reader = PdfReader(BytesIO(toc_pdf_bytes))
-        for page in toc_reader.pages:
-            writer.add_page(page)
-    
-    for page in all_pages:
-        writer.add_page(page)
-    
-    output = BytesIO()
-    writer.write(output)
-    output.seek(0)
-    merged_bytes = output.read()
-    
-    if page_num_position != 'none':
-        merged_bytes = add_page_numbers(merged_bytes, page_num_position, start_num)
-    
-    return merged_bytes
+    return new_files
 
 # UI
 col_title, col_clear = st.columns([5, 1])
@@ -171,9 +128,11 @@ with col_title:
 with col_clear:
     st.markdown("<br>", unsafe_allow_html=True)  # Add spacing
     if st.button("Reset All", use_container_width=True, help="Clear all uploaded files and start fresh"):
+        release_files(st.session_state.pdf_files)
         st.session_state.pdf_files = []
         st.session_state.file_uploader_key += 1
         st.session_state.editing_file_idx = None
+        st.session_state.seen_uploads = set()
         st.rerun()
 
 # Sidebar settings
@@ -181,23 +140,53 @@ with st.sidebar:
     st.header("Settings")
     
     add_toc = st.checkbox("Add Table of Contents", value=False)
+    add_bookmarks = st.checkbox("Add Bookmarks", value=True,
+                                help="Let readers jump to each file from the viewer's sidebar")
+    include_source_outlines = st.checkbox(
+        "Include Bookmarks From Files", value=False,
+        help="Nest each file's own bookmarks under its entry in the TOC and bookmarks"
+    )
     
     page_num_position = st.selectbox(
         "Page Number Position",
-        options=['none', 'bottom-center', 'bottom-right', 'bottom-left', 
-                'top-center', 'top-right', 'top-left'],
+        options=['none'] + PAGE_NUMBER_POSITIONS,
         index=0
     )
     
     start_page_num = st.number_input("Start Page Number", min_value=1, value=1, step=1)
     
+    number_format = st.selectbox(
+        "Number Format",
+        options=list(NUMBER_FORMATS.keys()),
+        index=0
+    )
+    
+    front_matter_pages = st.number_input(
+        "Roman Numeral Pages (i, ii, iii)",
+        min_value=0, value=0, step=1,
+        help="Number this many leading pages (e.g. the TOC) with Roman numerals"
+    )
+    
+    optimize_size = st.checkbox(
+        "Optimize File Size", value=True,
+        help="Merge duplicate fonts and images and recompress the merged PDF"
+    )
+    
+    image_dpi = st.selectbox(
+        "Downsample Images Above",
+        options=list(IMAGE_DPI_OPTIONS.keys()),
+        index=0,
+        disabled=not optimize_size
+    )
+    
     st.markdown("---")
     st.markdown("### Features")
     st.markdown("• Merge multiple PDFs")
     st.markdown("• Reorder pages within PDFs")
     st.markdown("• Add page numbers")
-    st.markdown("• Generate TOC")
+    st.markdown("• Generate linked TOC & bookmarks")
     st.markdown("• Delete pages")
+    st.markdown("• Shrink file size")
 
 # File uploader
 uploaded_files = st.file_uploader(
@@ -208,18 +197,45 @@ uploaded_files = st.file_uploader(
     key=f"file_uploader_{st.session_state.file_uploader_key}"
 )
 
-# Add uploaded files to session state
+# Add uploaded files to session state, skipping content we already have
 if uploaded_files:
+    known_ids = {f['id'] for f in st.session_state.pdf_files}
+    new_uploads = []
     for uploaded_file in uploaded_files:
-        if not any(f['name'] == uploaded_file.name for f in st.session_state.pdf_files):
-            pdf_bytes = uploaded_file.read()
-            pages = extract_pages_from_pdf(pdf_bytes)
-            st.session_state.pdf_files.append({
-                'name': uploaded_file.name,
-                'bytes': pdf_bytes,
-                'toc_title': uploaded_file.name.replace('.pdf', ''),
-                'pages': pages
-            })
+        if uploaded_file.file_id in st.session_state.seen_uploads:
+            continue
+        pdf_bytes = uploaded_file.getvalue()
+        doc_id = document_id(pdf_bytes)
+        if doc_id not in known_ids:
+            known_ids.add(doc_id)
+            new_uploads.append((uploaded_file.name, pdf_bytes, doc_id))
+    
+    if new_uploads:
+        new_files = ingest_uploads(new_uploads)
+        st.session_state.pdf_files.extend(new_files)
+        for pdf_file in new_files:
+            get_thumbnail_service().prefetch(
+                partial(load_pdf, pdf_file), pdf_file['id'],
+                range(min(PAGES_PER_VIEW, len(pdf_file['pages'])))
+            )
+    st.session_state.seen_uploads.update(f.file_id for f in uploaded_files)
+
+# Files idle past the storage TTL (or evicted under memory pressure) are gone
+expired = [f for f in st.session_state.pdf_files if not get_blob_store().contains(f['blob_id'])]
+if expired:
+    st.warning(
+        "These files expired from temporary storage and were removed; please upload them again: "
+        + ", ".join(f['name'] for f in expired)
+    )
+    st.session_state.pdf_files = [f for f in st.session_state.pdf_files if f not in expired]
+    st.session_state.editing_file_idx = None
+
+if st.session_state.pdf_files:
+    store = get_blob_store()
+    st.sidebar.caption(
+        f"Storage: {store.session_bytes(st.session_state.session_id) / 1048576:.1f} MB "
+        f"of {store.session_quota_bytes / 1048576:.0f} MB"
+    )
 
 # Page editing view
 if st.session_state.editing_file_idx is not None:
@@ -235,17 +251,12 @@ if st.session_state.editing_file_idx is not None:
         with col2:
             # Download single edited PDF
             if st.button("Download This PDF", use_container_width=True):
-                writer = PdfWriter()
-                for page_info in pdf_file['pages']:
-                    reader = PdfReader(BytesIO(page_info['bytes']))
-                    writer.add_page(reader.pages[0])
-                output = BytesIO()
-                writer.write(output)
-                output.seek(0)
+                with merge_pdfs(with_sources([pdf_file]), add_toc=False, page_num_position='none') as output:
+                    edited_pdf = output.read()
                 
                 st.download_button(
                     label="Download",
-                    data=output.read(),
+                    data=edited_pdf,
                     file_name=f"edited_{pdf_file['name']}",
                     mime="application/pdf"
                 )
@@ -256,44 +267,51 @@ if st.session_state.editing_file_idx is not None:
         
         st.markdown("---")
         
-        # Display pages with thumbnails
-        for page_idx, page_info in enumerate(pdf_file['pages']):
-            col1, col2, col3, col4, col5 = st.columns([0.5, 1.5, 2, 1, 1])
-            
-            with col1:
-                st.markdown(f"**{page_idx + 1}**")
-            
-            with col2:
-                # Display thumbnail
-                st.image(
-                    f"data:image/png;base64,{page_info['thumbnail']}", 
-                    width=150
+        if 'organizer_error' in st.session_state:
+            st.error(st.session_state.pop('organizer_error'))
+
+        # Edits happen in the browser and arrive as one batch of ops
+        organizer_id = pdf_file['id']
+        thumb_key = f"organizer_thumbs_{organizer_id}"
+        batch_key = f"organizer_batch_{organizer_id}"
+        if thumb_key not in st.session_state:
+            st.session_state[thumb_key] = [p['page_index'] for p in pdf_file['pages'][:PAGES_PER_VIEW]]
+
+        thumbnail_service = get_thumbnail_service()
+        thumbnails = thumbnail_service.get_thumbnails(
+            partial(load_pdf, pdf_file), pdf_file['id'], st.session_state[thumb_key]
+        )
+        event = page_organizer(
+            pdf_file['pages'], thumbnails,
+            applied_batch=st.session_state.get(batch_key),
+            key=f"organizer_{organizer_id}"
+        )
+
+        if event and event.get('ops_batch') and event['ops_batch'] != st.session_state.get(batch_key):
+            st.session_state[batch_key] = event['ops_batch']
+            try:
+                apply_page_ops(pdf_file['pages'], event['ops'])
+            except (KeyError, TypeError, ValueError) as e:
+                # Shown after the rerun that tells the organizer the batch was handled
+                st.session_state.organizer_error = f"Could not apply page changes: {str(e)}"
+            if len(pdf_file['pages']) == 0:
+                release_files([pdf_file])
+                st.session_state.pdf_files.pop(idx)
+                st.session_state.editing_file_idx = None
+            st.rerun()
+
+        if event and event.get('thumbnails'):
+            positions = {p['page_index']: n for n, p in enumerate(pdf_file['pages'])}
+            wanted = sorted(i for i in set(event['thumbnails']) if i in positions)
+            if wanted and wanted != st.session_state[thumb_key]:
+                st.session_state[thumb_key] = wanted
+                # Warm the cache for the pages just past the requested ones
+                last = max(positions[i] for i in wanted) + 1
+                thumbnail_service.prefetch(
+                    partial(load_pdf, pdf_file), pdf_file['id'],
+                    [p['page_index'] for p in pdf_file['pages'][last:last + PAGES_PER_VIEW]]
                 )
-            
-            with col3:
-                st.text(f"Original page {page_info['page_num']}")
-            
-            with col4:
-                col_up, col_down = st.columns(2)
-                with col_up:
-                    if st.button("↑", key=f"page_up_{page_idx}", disabled=(page_idx == 0)):
-                        pdf_file['pages'][page_idx], pdf_file['pages'][page_idx - 1] = \
-                            pdf_file['pages'][page_idx - 1], pdf_file['pages'][page_idx]
-                        st.rerun()
-                with col_down:
-                    if st.button("↓", key=f"page_down_{page_idx}", 
-                               disabled=(page_idx == len(pdf_file['pages']) - 1)):
-                        pdf_file['pages'][page_idx], pdf_file['pages'][page_idx + 1] = \
-                            pdf_file['pages'][page_idx + 1], pdf_file['pages'][page_idx]
-                        st.rerun()
-            
-            with col5:
-                if st.button("×", key=f"page_remove_{page_idx}", help="Remove this page"):
-                    pdf_file['pages'].pop(page_idx)
-                    if len(pdf_file['pages']) == 0:
-                        st.session_state.pdf_files.pop(idx)
-                        st.session_state.editing_file_idx = None
-                    st.rerun()
+                st.rerun()
 
 # Main file list view
 elif st.session_state.pdf_files:
@@ -326,6 +344,7 @@ elif st.session_state.pdf_files:
         st.markdown("---")
         st.caption("Tip: Click 'Edit Pages' to reorder, remove pages, or download with page numbers")
         if st.button("🔄 Start Over", use_container_width=False):
+            release_files(st.session_state.pdf_files)
             st.session_state.pdf_files = []
             st.session_state.file_uploader_key += 1
             st.rerun()
@@ -380,7 +399,7 @@ elif st.session_state.pdf_files:
                     
                     with subcol4:
                         if st.button("×", key=f"remove_{idx}", help="Remove"):
-                            st.session_state.pdf_files.pop(idx)
+                            release_files([st.session_state.pdf_files.pop(idx)])
                             st.rerun()
                 
                 st.markdown("---")
@@ -394,12 +413,24 @@ elif st.session_state.pdf_files:
             if st.button("Merge & Download All", type="primary", use_container_width=True):
                 with st.spinner("Merging PDFs..."):
                     try:
-                        merged_pdf = merge_pdfs(
-                            st.session_state.pdf_files,
+                        with merge_pdfs(
+                            with_sources(st.session_state.pdf_files),
                             add_toc=add_toc,
                             page_num_position=page_num_position,
-                            start_num=start_page_num
-                        )
+                            start_num=start_page_num,
+                            label_format=NUMBER_FORMATS[number_format],
+                            front_matter=front_matter_pages,
+                            add_bookmarks=add_bookmarks,
+                            include_source_outlines=include_source_outlines
+                        ) as merged_file:
+                            merged_pdf = merged_file.read()
+                        
+                        if optimize_size:
+                            merged_pdf, size_report = optimize_pdf(merged_pdf, IMAGE_DPI_OPTIONS[image_dpi])
+                            st.caption(
+                                f"File size: {size_report['before'] / 1024:,.0f} KB → "
+                                f"{size_report['after'] / 1024:,.0f} KB"
+                            )
                         
                         st.download_button(
                             label="Download Merged PDF",
@@ -414,6 +445,7 @@ elif st.session_state.pdf_files:
         
         with col2:
             if st.button("Clear All", use_container_width=True, help="Remove all files"):
+                release_files(st.session_state.pdf_files)
                 st.session_state.pdf_files = []
                 st.session_state.file_uploader_key += 1
                 st.session_state.editing_file_idx = None
@@ -0,0 +1,275 @@
+# pdf_audit.py
+"""Headless accessibility audit for a folder of course PDFs.
+
+Runs the same analysis as the PDF Accessibility Tagger over every PDF in
+a directory tree, several files at a time across CPU cores, and writes a
+report of what each file needs before it goes to students:
+
+    python pdf_audit.py handouts/ --csv audit.csv --json audit.json --jobs 4
+
+For each PDF the report gives the page and heading counts, problems in
+the heading structure, a missing document title or language, whether the
+PDF is tagged, and the pages that are scanned images with no text layer.
+Scanned pages are read with OCR when Tesseract is installed, with the
+time it took.
+
+Results are kept in a manifest (default: .accessibility-audit.json in the
+audited folder). On the next run, files whose modification time and size
+are unchanged are not opened again. Files that were touched or copied but
+have the same content are only hashed. Analyses are also stored in the
+shared analysis cache, so the tagger app opens audited files instantly.
+"""
+
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import fitz  # PyMuPDF
+
+from analysis_cache import AnalysisCache, content_hash
+from line_table import TAGS
+from pdf_structure import ANALYZER_VERSION, analyze_pdf, scanned_pages
+
+# Bump when the report fields, checks or heading classifier change, so manifests are redone
+AUDIT_VERSION = 2
+MANIFEST_NAME = '.accessibility-audit.json'
+# Titles that export tools fill in by default, which tell a reader nothing
+PLACEHOLDER_TITLES = {'untitled', 'untitled document'}
+PLACEHOLDER_PREFIXES = ('microsoft word - ', 'microsoft powerpoint - ')
+
+CSV_FIELDS = [
+    'path', 'pages', 'lines', 'h1', 'h2', 'h3', 'title', 'missing_title', 'lang', 'tagged',
+    'scanned_pages', 'ocr_seconds', 'ocr_errors', 'heading_issues', 'error', 'seconds'
+]
+
+_cache = None
+
+
+def find_pdfs(root):
+    """Return the paths of all PDFs under root, sorted"""
+    paths = []
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = sorted(d for d in dirnames if not d.startswith('.'))
+        paths.extend(os.path.join(dirpath, name) for name in filenames if name.lower().endswith('.pdf'))
+    return sorted(paths)
+
+
+def is_placeholder_title(title):
+    title = title.strip().lower()
+    return not title or title in PLACEHOLDER_TITLES or title.startswith(PLACEHOLDER_PREFIXES)
+
+
+def heading_issues(lines):
+    """Describe problems in a document's heading structure"""
+    levels = [code for code in lines.user.tolist() if code < len(TAGS) - 1]
+    if not levels:
+        return ["no headings"]
+    issues = []
+    h1_count = levels.count(0)
+    if h1_count == 0:
+        issues.append("no H1")
+    elif h1_count > 1:
+        issues.append(f"{h1_count} H1 headings")
+
+    previous = -1
+    for row, code in enumerate(lines.user.tolist()):
+        if code < len(TAGS) - 1:
+            if code > previous + 1:
+                issues.append(
+                    f"{TAGS[code]} follows {TAGS[previous] if previous >= 0 else 'the start'} "
+                    f"on page {lines.page[row]}"
+                )
+                break  # One skipped level usually repeats all through the document
+            previous = code
+    return issues
+
+
+def audit_pdf(pdf_bytes):
+    """Audit one PDF's accessibility.
+
+    Returns:
+        Dict of report fields for the PDF
+    """
+    doc = fitz.open(stream=pdf_bytes, filetype="pdf")
+    try:
+        if doc.needs_pass:
+            raise ValueError("PDF is password protected")
+        catalog = doc.pdf_catalog()
+        tagged = (
+            doc.xref_get_key(catalog, 'StructTreeRoot')[0] != 'null'
+            and doc.xref_get_key(catalog, 'MarkInfo/Marked')[1] == 'true'
+        )
+        lang = doc.xref_get_key(catalog, 'Lang')
+        title = ((doc.metadata or {}).get('title') or '').strip()
+
+        # Extraction already runs in a pool worker, so stay in this process
+        ocr_reports = []
+        lines = analyze_pdf(
+            pdf_bytes, cache=_cache, parallel=False,
+            ocr_progress=lambda report, done, total: ocr_reports.append(report)
+        )
+        counts = lines.tag_counts()
+
+        return {
+            'pages': doc.page_count,
+            'lines': len(lines),
+            'h1': counts['H1'],
+            'h2': counts['H2'],
+            'h3': counts['H3'],
+            'title': title,
+            'missing_title': is_placeholder_title(title),
+            'lang': lang[1].strip('()') if lang[0] == 'string' else '',
+            'tagged': tagged,
+            'scanned_pages': [page_num + 1 for page_num in scanned_pages(doc, lines)],
+            'ocr_seconds': round(sum(r['seconds'] or 0 for r in ocr_reports), 3),
+            'ocr_errors': sorted({r['error'] for r in ocr_reports if r['error']}),
+            'heading_issues': heading_issues(lines),
+            'outline': [
+                {'tag': TAGS[code], 'page': int(lines.page[row]), 'text': lines.text[row]}
+                for row, code in enumerate(lines.user.tolist()) if code < len(TAGS) - 1
+            ],
+        }
+    finally:
+        doc.close()
+
+
+def audit_file(path, known_sha=None):
+    """Audit a PDF file.
+
+    Runs in a pool worker. When the file's hash equals known_sha its
+    previous result still holds, and the file is not analyzed again.
+
+    Returns:
+        (sha256 of the file, report dict or None if unchanged)
+    """
+    global _cache
+    if _cache is None:
+        _cache = AnalysisCache()
+    start = time.perf_counter()
+    with open(path, 'rb') as f:
+        pdf_bytes = f.read()
+    sha = content_hash(pdf_bytes)
+    if sha == known_sha:
+        return sha, None
+    try:
+        result = audit_pdf(pdf_bytes)
+        result['error'] = ''
+    except Exception as e:
+        result = {'error': str(e) or type(e).__name__}
+    result['seconds'] = round(time.perf_counter() - start, 3)
+    return sha, result
+
+
+def load_manifest(path):
+    """Read the results of the previous audit, or an empty manifest"""
+    try:
+        with open(path, encoding='utf-8') as f:
+            manifest = json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}
+    if manifest.get('version') != [AUDIT_VERSION, ANALYZER_VERSION]:
+        return {}  # Written by an older auditor; every file is redone
+    return manifest.get('files', {})
+
+
+def save_manifest(path, files):
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump({'version': [AUDIT_VERSION, ANALYZER_VERSION], 'files': files}, f)
+    os.replace(tmp_path, path)
+
+
+def write_csv(path, results):
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=CSV_FIELDS, extrasaction='ignore')
+        writer.writeheader()
+        for result in results:
+            row = dict(result)
+            row['scanned_pages'] = ' '.join(str(page) for page in result.get('scanned_pages', []))
+            row['heading_issues'] = '; '.join(result.get('heading_issues', []))
+            row['ocr_errors'] = '; '.join(result.get('ocr_errors', []))
+            writer.writerow(row)
+
+
+def audit_tree(root, jobs=None, manifest_path=None, report=print):
+    """Audit every PDF under root, reusing the manifest's results for unchanged files.
+
+    Returns:
+        (report dicts sorted by path, number of files analyzed)
+    """
+    manifest_path = manifest_path or os.path.join(root, MANIFEST_NAME)
+    previous = load_manifest(manifest_path)
+    files = {}
+    pending = {}
+    for path in find_pdfs(root):
+        rel_path = os.path.relpath(path, root)
+        stat = os.stat(path)
+        entry = previous.get(rel_path)
+        unchanged = entry and entry['mtime_ns'] == stat.st_mtime_ns and entry['size'] == stat.st_size
+        if unchanged and not entry['result']['error']:
+            files[rel_path] = entry
+        else:
+            pending[rel_path] = (path, stat, entry)
+
+    analyzed = 0
+    if pending:
+        with ProcessPoolExecutor(max_workers=max(1, jobs or os.cpu_count() or 1)) as pool:
+            futures = {
+                pool.submit(audit_file, path, entry and not entry['result']['error'] and entry['sha256']): rel_path
+                for rel_path, (path, stat, entry) in pending.items()
+            }
+            for future in as_completed(futures):
+                rel_path = futures[future]
+                path, stat, entry = pending[rel_path]
+                sha, result = future.result()
+                if result is None:
+                    result = entry['result']
+                else:
+                    analyzed += 1
+                    report(f"{'FAILED ' if result['error'] else 'ok     '} {rel_path}"
+                           f"{': ' + result['error'] if result['error'] else ''}")
+                files[rel_path] = {
+                    'mtime_ns': stat.st_mtime_ns, 'size': stat.st_size, 'sha256': sha, 'result': result
+                }
+
+    save_manifest(manifest_path, files)
+    results = [{'path': rel_path, **files[rel_path]['result']} for rel_path in sorted(files)]
+    return results, analyzed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Audit a folder of PDFs for accessibility.")
+    parser.add_argument('root', help="Folder to search for PDFs, including subfolders")
+    parser.add_argument('--csv', help="Write the report as CSV to this file")
+    parser.add_argument('--json', help="Write the report, with heading outlines, as JSON to this file")
+    parser.add_argument('--manifest', help=f"Results of previous runs (default: ROOT/{MANIFEST_NAME})")
+    parser.add_argument('--jobs', '-j', type=int, default=os.cpu_count() or 1,
+                        help="Files to audit in parallel (default: CPU count)")
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    results, analyzed = audit_tree(args.root, jobs=args.jobs, manifest_path=args.manifest)
+    if args.csv:
+        write_csv(args.csv, results)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+
+    failed = [r for r in results if r['error']]
+    needs_work = [
+        r for r in results
+        if not r['error'] and (not r['tagged'] or r['missing_title'] or r['scanned_pages'] or r['heading_issues'])
+    ]
+    print(
+        f"{len(results)} PDFs ({analyzed} analyzed, {len(results) - analyzed} unchanged) "
+        f"in {time.perf_counter() - start:.1f} s: {len(needs_work)} need work, {len(failed)} failed"
+    )
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,173 @@
+# pdf_batch.py
+"""Headless merge, split and page numbering for course packs.
+
+Runs the same engine as the PDF Merger & Editor app from JSON or YAML
+manifests, several manifests at a time across CPU cores:
+
+    python pdf_batch.py packs/*.json --jobs 4
+
+A manifest describes one output PDF. Paths are relative to the manifest:
+
+    {
+        "output": "out/engl-1181-s1601.pdf",
+        "toc": true,
+        "page_numbers": "bottom-center",
+        "number_format": "Page {n} of {total}",
+        "start_num": 1,
+        "front_matter": 1,
+        "bookmarks": true,
+        "source_bookmarks": false,
+        "optimize": true,
+        "max_image_dpi": 150,
+        "files": [
+            {"path": "syllabus.pdf", "title": "Syllabus"},
+            {"path": "readings.pdf", "title": "Week 1 Readings", "pages": "3-10, 12"},
+            {"path": "scan.pdf", "pages": "1", "rotate": 90}
+        ]
+    }
+
+Splitting is a manifest with a single file and a page range. YAML
+manifests need PyYAML installed.
+"""
+
+import argparse
+import json
+import os
+import shutil
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from pdf_merge import (
+    PAGE_NUMBER_POSITIONS,
+    document_id,
+    extract_pages_from_pdf,
+    merge_pdfs,
+    optimize_pdf,
+    parse_page_ranges,
+)
+
+
+def load_manifest(path):
+    """Read a JSON or YAML manifest file into a dict"""
+    with open(path, encoding='utf-8') as f:
+        if path.lower().endswith(('.yaml', '.yml')):
+            try:
+                import yaml
+            except ImportError:
+                raise ValueError("YAML manifests need PyYAML (pip install pyyaml)")
+            manifest = yaml.safe_load(f)
+        else:
+            manifest = json.load(f)
+
+    if not isinstance(manifest, dict):
+        raise ValueError("Manifest must be a mapping")
+    if not manifest.get('output'):
+        raise ValueError("Manifest is missing 'output'")
+    if not manifest.get('files'):
+        raise ValueError("Manifest has no 'files'")
+    position = manifest.get('page_numbers', 'none')
+    if position != 'none' and position not in PAGE_NUMBER_POSITIONS:
+        raise ValueError(f"Unknown page_numbers position '{position}'")
+    return manifest
+
+
+def build_pdf_list(manifest, base_dir):
+    """Load the manifest's files into the pdf_list shape merge_pdfs expects"""
+    pdf_list = []
+    for file_entry in manifest['files']:
+        if isinstance(file_entry, str):
+            file_entry = {'path': file_entry}
+        path = os.path.join(base_dir, file_entry['path'])
+        with open(path, 'rb') as f:
+            pdf_bytes = f.read()
+
+        doc_id = document_id(pdf_bytes)
+        all_pages = extract_pages_from_pdf(pdf_bytes, doc_id)
+        rotation = int(file_entry.get('rotate', 0)) % 360
+        pages = []
+        for page_index in parse_page_ranges(file_entry.get('pages'), len(all_pages)):
+            pages.append({'doc_id': doc_id, 'page_index': page_index, 'rotation': rotation})
+
+        name = os.path.basename(path)
+        pdf_list.append({
+            'id': doc_id,
+            'name': name,
+            'bytes': pdf_bytes,
+            'toc_title': file_entry.get('title') or os.path.splitext(name)[0],
+            'pages': pages
+        })
+    return pdf_list
+
+
+def run_manifest(manifest_path):
+    """Build one manifest's output PDF.
+
+    Runs in a pool worker.
+
+    Returns:
+        Dict describing the result for the summary report
+    """
+    start = time.perf_counter()
+    manifest = load_manifest(manifest_path)
+    base_dir = os.path.dirname(os.path.abspath(manifest_path))
+    output_path = os.path.join(base_dir, manifest['output'])
+    pdf_list = build_pdf_list(manifest, base_dir)
+
+    merged = merge_pdfs(
+        pdf_list,
+        add_toc=bool(manifest.get('toc', False)),
+        page_num_position=manifest.get('page_numbers', 'none'),
+        start_num=int(manifest.get('start_num', 1)),
+        label_format=manifest.get('number_format', '{n}'),
+        front_matter=int(manifest.get('front_matter', 0)),
+        add_bookmarks=bool(manifest.get('bookmarks', True)),
+        include_source_outlines=bool(manifest.get('source_bookmarks', False))
+    )
+
+    os.makedirs(os.path.dirname(output_path) or '.', exist_ok=True)
+    with merged:
+        if manifest.get('optimize', False):
+            optimized, _ = optimize_pdf(merged.read(), manifest.get('max_image_dpi'))
+            with open(output_path, 'wb') as f:
+                f.write(optimized)
+        else:
+            with open(output_path, 'wb') as f:
+                shutil.copyfileobj(merged, f)
+
+    return {
+        'manifest': manifest_path,
+        'output': output_path,
+        'pages': sum(len(pdf_info['pages']) for pdf_info in pdf_list),
+        'bytes': os.path.getsize(output_path),
+        'seconds': time.perf_counter() - start
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Merge, split and number PDFs from manifests.")
+    parser.add_argument('manifests', nargs='+', help="JSON or YAML manifest files")
+    parser.add_argument('--jobs', '-j', type=int, default=os.cpu_count() or 1,
+                        help="Manifests to process in parallel (default: CPU count)")
+    args = parser.parse_args(argv)
+
+    failures = 0
+    with ProcessPoolExecutor(max_workers=max(1, args.jobs)) as pool:
+        futures = {pool.submit(run_manifest, path): path for path in args.manifests}
+        for future in as_completed(futures):
+            try:
+                result = future.result()
+            except Exception as e:
+                failures += 1
+                print(f"FAILED  {futures[future]}: {e}", file=sys.stderr)
+                continue
+            print(
+                f"ok      {result['manifest']} -> {result['output']} "
+                f"({result['pages']} pages, {result['bytes'] / 1024:,.0f} KB, {result['seconds']:.1f} s)"
+            )
+
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
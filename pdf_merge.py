@@ -0,0 +1,531 @@
+# pdf_merge.py
+"""Page model and merge engine for the PDF Merger & Editor app.
+
+An uploaded file is kept once as its original bytes. Its pages are plain
+references ({'doc_id', 'page_index', 'rotation'}) that are only resolved
+against the source document when a PDF is exported, so each source file is
+parsed once per merge. Page numbers are stamped as content streams while
+pages are written.
+"""
+
+import hashlib
+from io import BytesIO
+from tempfile import SpooledTemporaryFile
+
+import fitz  # PyMuPDF for the size optimization pass
+from pypdf import PdfReader, PdfWriter
+from pypdf.annotations import Link
+from pypdf.generic import ArrayObject, DecodedStreamObject, DictionaryObject, NameObject
+from reportlab.pdfbase.pdfmetrics import stringWidth
+from reportlab.lib.pagesizes import letter
+
+# Merged output stays in memory up to this size, then spills to a temp file
+SPOOL_MAX_BYTES = 16 * 1024 * 1024
+PAGE_NUMBER_POSITIONS = [
+    'bottom-center', 'bottom-right', 'bottom-left',
+    'top-center', 'top-right', 'top-left',
+]
+
+
+def document_id(pdf_bytes):
+    """Return a stable id for an uploaded PDF based on its content"""
+    return hashlib.sha256(pdf_bytes).hexdigest()[:16]
+
+
+def extract_pages_from_pdf(pdf_bytes, doc_id):
+    """Return a page reference for every page of a PDF, in original order"""
+    num_pages = len(PdfReader(BytesIO(pdf_bytes)).pages)
+    return [
+        {'doc_id': doc_id, 'page_index': i, 'rotation': 0}
+        for i in range(num_pages)
+    ]
+
+
+def parse_page_ranges(spec, num_pages):
+    """Turn a page range spec like "1-3, 5, 8-" into 0-based page indexes.
+
+    Pages are 1-based and inclusive; an open end runs to the last page and
+    a descending range ("5-3") selects pages in reverse.
+
+    Raises:
+        ValueError: If the spec is malformed or names a page out of range
+    """
+    if spec is None or str(spec).strip().lower() in ('', 'all'):
+        return list(range(num_pages))
+
+    indexes = []
+    for part in str(spec).split(','):
+        part = part.strip()
+        if not part:
+            continue
+        first, sep, last = part.partition('-')
+        try:
+            start = int(first) if first.strip() else 1
+            end = (int(last) if last.strip() else num_pages) if sep else start
+        except ValueError:
+            raise ValueError(f"Invalid page range '{part}'")
+        for page in (start, end):
+            if not 1 <= page <= num_pages:
+                raise ValueError(f"Page {page} is out of range (document has {num_pages} pages)")
+        step = 1 if end >= start else -1
+        indexes.extend(i - 1 for i in range(start, end + step, step))
+    return indexes
+
+
+def apply_page_ops(pages, ops):
+    """Apply a batch of page edits to a file's page list in place.
+
+    Each op refers to positions in the list as left by the ops before it:
+
+        {'op': 'move', 'from': 4, 'to': 0}
+        {'op': 'delete', 'index': 2}
+        {'op': 'rotate', 'index': 0, 'degrees': 90}
+
+    The batch is checked before anything changes, so a bad op leaves the
+    pages untouched.
+
+    Raises:
+        ValueError: If an op is unknown or names a position out of range
+    """
+    count = len(pages)
+    for op in ops:
+        kind = op.get('op')
+        if kind == 'move':
+            positions = (op['from'], op['to'])
+        elif kind in ('delete', 'rotate'):
+            positions = (op['index'],)
+        else:
+            raise ValueError(f"Unknown page operation '{kind}'")
+        for position in positions:
+            if not isinstance(position, int) or not 0 <= position < count:
+                raise ValueError(f"Page position {position} is out of range")
+        if kind == 'delete':
+            count -= 1
+
+    for op in ops:
+        if op['op'] == 'move':
+            pages.insert(op['to'], pages.pop(op['from']))
+        elif op['op'] == 'delete':
+            del pages[op['index']]
+        else:
+            page = pages[op['index']]
+            page['rotation'] = (page['rotation'] + int(op.get('degrees', 90))) % 360
+    return pages
+
+
+def number_position(position, page_width, page_height):
+    """Return the (x, y) anchor for a page number on a page of this size"""
+    positions = {
+        'bottom-center': (page_width / 2, 30),
+        'bottom-right': (page_width - 50, 30),
+        'bottom-left': (50, 30),
+        'top-center': (page_width / 2, page_height - 30),
+        'top-right': (page_width - 50, page_height - 30),
+        'top-left': (50, page_height - 30),
+    }
+    return positions.get(position, (page_width / 2, 30))
+
+
+def _add_font(writer, base_font):
+    """Add a standard Type 1 font dictionary to the writer"""
+    return writer._add_object(DictionaryObject({
+        NameObject('/Type'): NameObject('/Font'),
+        NameObject('/Subtype'): NameObject('/Type1'),
+        NameObject('/BaseFont'): NameObject(base_font),
+        NameObject('/Encoding'): NameObject('/WinAnsiEncoding'),
+    }))
+
+
+def _add_stream(writer, data):
+    """Add a content stream to the writer and return its reference"""
+    stream = DecodedStreamObject()
+    stream.set_data(data)
+    return writer._add_object(stream)
+
+
+def _set_font_resource(page, name, font_ref):
+    if '/Resources' not in page:
+        page[NameObject('/Resources')] = DictionaryObject()
+    resources = page['/Resources']
+    if '/Font' not in resources:
+        resources[NameObject('/Font')] = DictionaryObject()
+    resources['/Font'][NameObject(name)] = font_ref
+
+
+def _show_text(font_name, font_size, x, y, text):
+    """Return content stream operators that draw text at (x, y)"""
+    data = text.encode('cp1252', errors='replace')
+    data = data.replace(b'\\', b'\\\\').replace(b'(', b'\\(').replace(b')', b'\\)')
+    return b"BT %s %g Tf %.2f %.2f Td (%s) Tj ET\n" % (font_name.encode(), font_size, x, y, data)
+
+
+def to_roman(number):
+    """Return a lowercase Roman numeral for a positive integer"""
+    numerals = [
+        (1000, 'm'), (900, 'cm'), (500, 'd'), (400, 'cd'), (100, 'c'), (90, 'xc'),
+        (50, 'l'), (40, 'xl'), (10, 'x'), (9, 'ix'), (5, 'v'), (4, 'iv'), (1, 'i'),
+    ]
+    result = ''
+    for value, numeral in numerals:
+        count, number = divmod(number, value)
+        result += numeral * count
+    return result
+
+
+def page_labels(num_pages, start_num=1, label_format='{n}', front_matter=0):
+    """Return the page number text for every page of a document.
+
+    Args:
+        num_pages: Total number of pages being numbered
+        start_num: Number printed on the first page after the front matter
+        label_format: Format string using {n} and optionally {total},
+            e.g. 'Page {n} of {total}'
+        front_matter: Leading pages numbered i, ii, iii... instead
+
+    Returns:
+        List of label strings, one per page
+    """
+    front_matter = min(front_matter, num_pages)
+    body_pages = num_pages - front_matter
+    labels = [
+        label_format.format(n=to_roman(i + 1), total=to_roman(front_matter))
+        for i in range(front_matter)
+    ]
+    labels.extend(
+        label_format.format(n=start_num + i, total=start_num + body_pages - 1)
+        for i in range(body_pages)
+    )
+    return labels
+
+
+class PageNumberStamper:
+    """Stamps page numbers by appending a small text stream to each page.
+
+    The font resource and the graphics-state wrapper are written once per
+    document and number anchors are computed once per page box, so each
+    page only costs one tiny content stream.
+    """
+
+    FONT_NAME = '/FacultyToolsPageNumber'
+
+    def __init__(self, writer, position='bottom-center', font_size=10):
+        self.writer = writer
+        self.position = position
+        self.font_size = font_size
+        self._font = _add_font(writer, '/Helvetica')
+        # Isolates the page's own graphics state from the number
+        self._save_state = _add_stream(writer, b"q\n")
+        self._anchors = {}
+
+    def _anchor(self, page):
+        box = page.mediabox
+        box_key = (float(box.left), float(box.bottom), float(box.width), float(box.height))
+        if box_key not in self._anchors:
+            left, bottom, width, height = box_key
+            x, y = number_position(self.position, width, height)
+            self._anchors[box_key] = (left + x, bottom + y)
+        return self._anchors[box_key]
+
+    def stamp(self, page, text):
+        """Draw text centred at the configured position of a writer page"""
+        if page.rotation:
+            # Bake the rotation in so the number lands upright
+            page.transfer_rotation_to_content()
+        x, y = self._anchor(page)
+        x -= stringWidth(text, 'Helvetica', self.font_size) / 2
+
+        _set_font_resource(page, self.FONT_NAME, self._font)
+        overlay = _add_stream(
+            self.writer,
+            b"Q q 0 g " + _show_text(self.FONT_NAME, self.font_size, x, y, text) + b"Q\n"
+        )
+
+        contents = ArrayObject([self._save_state])
+        if '/Contents' in page:
+            original = page.raw_get('/Contents')
+            if isinstance(original.get_object(), ArrayObject):
+                contents.extend(original.get_object())
+            else:
+                contents.append(original)
+        contents.append(overlay)
+        page[NameObject('/Contents')] = contents
+
+
+def add_page_numbers(input_pdf_bytes, position='bottom-center', start_num=1,
+                     label_format='{n}', front_matter=0):
+    """Add page numbers to PDF"""
+    reader = PdfReader(BytesIO(input_pdf_bytes))
+    writer = PdfWriter()
+    stamper = PageNumberStamper(writer, position)
+    labels = page_labels(len(reader.pages), start_num, label_format, front_matter)
+
+    for page, label in zip(reader.pages, labels):
+        stamper.stamp(writer.add_page(page), label)
+
+    output = BytesIO()
+    writer.write(output)
+    output.seek(0)
+    return output.read()
+
+
+# Table of contents layout on letter paper, in points
+TOC_PAGE_SIZE = letter
+TOC_TITLE_Y = 750
+TOC_FIRST_LINE_Y = 700
+TOC_TOP_Y = 750
+TOC_BOTTOM_Y = 50
+TOC_LINE_HEIGHT = 25
+TOC_INDENT = 15
+
+
+def toc_layout(num_lines):
+    """Return the (TOC page offset, y) position of every TOC line"""
+    positions = []
+    page_offset = 0
+    y_position = TOC_FIRST_LINE_Y
+    for _ in range(num_lines):
+        if y_position < TOC_BOTTOM_Y:
+            page_offset += 1
+            y_position = TOC_TOP_Y
+        positions.append((page_offset, y_position))
+        y_position -= TOC_LINE_HEIGHT
+    return positions
+
+
+def source_outline(reader):
+    """Flatten a PDF's own bookmarks into entries below a file's TOC entry.
+
+    Returns:
+        List of {'title', 'level', 'source_page'} dicts in outline order,
+        starting at level 2
+    """
+    entries = []
+
+    def walk(items, level):
+        for item in items:
+            if isinstance(item, list):
+                walk(item, level + 1)
+                continue
+            try:
+                source_page = reader.get_destination_page_number(item)
+            except Exception:
+                source_page = None
+            if source_page is not None and item.title:
+                entries.append({'title': item.title, 'level': level, 'source_page': source_page})
+
+    try:
+        walk(reader.outline, 2)
+    except Exception:
+        # A damaged outline should not block the merge
+        pass
+    return entries
+
+
+def write_toc_pages(writer, toc_entries, layout):
+    """Draw TOC pages straight into the writer and link each line to its page.
+
+    Args:
+        writer: PdfWriter the TOC pages are appended to
+        toc_entries: Dicts with 'title', 'level', 'label' and 'page_index'
+            (0-based index of the target page in the output)
+        layout: Line positions from toc_layout()
+
+    Returns:
+        List of the TOC PageObjects, in order
+    """
+    num_pages = layout[-1][0] + 1 if layout else 1
+    page_width, page_height = TOC_PAGE_SIZE
+    regular = _add_font(writer, '/Helvetica')
+    bold = _add_font(writer, '/Helvetica-Bold')
+
+    streams = [[] for _ in range(num_pages)]
+    streams[0].append(_show_text('/F1', 20, 50, TOC_TITLE_Y, "Table of Contents"))
+    for entry, (page_offset, y_position) in zip(toc_entries, layout):
+        x = 70 + (entry['level'] - 1) * TOC_INDENT
+        font = '/F1' if entry['level'] == 1 else '/F2'
+        page_text = f"Page {entry['label']}"
+        streams[page_offset].append(_show_text(font, 12, x, y_position, entry['title']))
+        streams[page_offset].append(
+            _show_text('/F2', 12, 550 - stringWidth(page_text, 'Helvetica', 12), y_position, page_text)
+        )
+
+    toc_pages = []
+    for ops in streams:
+        page = writer.add_blank_page(page_width, page_height)
+        _set_font_resource(page, '/F1', bold)
+        _set_font_resource(page, '/F2', regular)
+        page[NameObject('/Contents')] = _add_stream(writer, b"".join(ops))
+        toc_pages.append(page)
+    return toc_pages
+
+
+def link_toc_pages(writer, toc_pages, toc_entries, layout):
+    """Add a link annotation over every TOC line pointing at its target page"""
+    for entry, (page_offset, y_position) in zip(toc_entries, layout):
+        x = 70 + (entry['level'] - 1) * TOC_INDENT
+        writer.add_annotation(toc_pages[page_offset], Link(
+            rect=(x - 2, y_position - 6, 552, y_position + 14),
+            border=[0, 0, 0],
+            target_page_index=entry['page_index']
+        ))
+
+
+def add_outline(writer, toc_entries):
+    """Add the TOC entries as a nested bookmark tree"""
+    open_items = []  # (level, outline item) for the current branch
+    for entry in toc_entries:
+        while open_items and open_items[-1][0] >= entry['level']:
+            open_items.pop()
+        parent = open_items[-1][1] if open_items else None
+        item = writer.add_outline_item(
+            entry['title'], entry['page_index'], parent=parent, is_open=entry['level'] == 1
+        )
+        open_items.append((entry['level'], item))
+
+
+def build_manifest(pdf_list):
+    """Return the page references of every file in output order"""
+    return [page_ref for pdf_info in pdf_list for page_ref in pdf_info['pages']]
+
+
+def collect_toc_entries(pdf_list, readers, include_source_outlines=False):
+    """Build TOC entries with page positions relative to the first merged page.
+
+    Every file gets a level 1 entry at its first page. With
+    include_source_outlines, each file's own bookmarks are added below it,
+    mapped through the edited page order; bookmarks to removed pages are
+    dropped.
+    """
+    toc_entries = []
+    offset = 0
+    for pdf_info in pdf_list:
+        toc_entries.append({'title': pdf_info['toc_title'], 'level': 1, 'position': offset})
+        if include_source_outlines:
+            positions = {}
+            for position, page_ref in enumerate(pdf_info['pages']):
+                positions.setdefault(page_ref['page_index'], offset + position)
+            for entry in source_outline(readers[pdf_info['id']]):
+                if entry['source_page'] in positions:
+                    toc_entries.append({
+                        'title': entry['title'],
+                        'level': entry['level'],
+                        'position': positions[entry['source_page']]
+                    })
+        offset += len(pdf_info['pages'])
+    return toc_entries
+
+
+def merge_pdfs(pdf_list, add_toc=True, page_num_position='bottom-center', start_num=1,
+               label_format='{n}', front_matter=0, add_bookmarks=False,
+               include_source_outlines=False):
+    """Merge multiple PDFs with optional TOC, bookmarks and page numbers.
+
+    Args:
+        pdf_list: File dicts with the original upload in 'bytes' (bytes
+            or a seekable binary stream), its 'id', a 'toc_title' and the
+            edited page references in 'pages'
+        add_toc: Prepend a linked table of contents
+        page_num_position: Key from number_position(), or 'none'
+        start_num: Number printed on the first page after the front matter
+        label_format: Page number format passed to page_labels()
+        front_matter: Leading pages numbered with Roman numerals
+        add_bookmarks: Add a PDF outline with an entry per file
+        include_source_outlines: Nest each file's own bookmarks under its
+            entry in the TOC and outline
+
+    Returns:
+        SpooledTemporaryFile positioned at the start of the merged PDF
+    """
+    writer = PdfWriter()
+    # One reader per source file, shared by the outline scan and page copy
+    readers = {}
+    for pdf_info in pdf_list:
+        if pdf_info['id'] not in readers:
+            source = pdf_info['bytes']
+            if isinstance(source, (bytes, bytearray)):
+                source = BytesIO(source)
+            readers[pdf_info['id']] = PdfReader(source)
+    manifest = build_manifest(pdf_list)
+
+    toc_entries = []
+    if add_toc or add_bookmarks:
+        toc_entries = collect_toc_entries(pdf_list, readers, include_source_outlines)
+
+    # The TOC length is known before anything is written, so page targets are exact
+    layout = toc_layout(len(toc_entries)) if add_toc else []
+    num_toc_pages = (layout[-1][0] + 1 if layout else 1) if add_toc else 0
+    num_pages = num_toc_pages + len(manifest)
+
+    labels = None
+    # The TOC quotes the printed page number, or the physical one if unnumbered
+    toc_labels = [str(i + 1) for i in range(num_pages)]
+    if page_num_position != 'none':
+        stamper = PageNumberStamper(writer, page_num_position)
+        labels = page_labels(num_pages, start_num, label_format, front_matter)
+        toc_labels = page_labels(num_pages, start_num, '{n}', front_matter)
+    for entry in toc_entries:
+        entry['page_index'] = num_toc_pages + entry['position']
+        entry['label'] = toc_labels[entry['page_index']]
+
+    toc_pages = []
+    if add_toc:
+        toc_pages = write_toc_pages(writer, toc_entries, layout)
+        if labels:
+            for i, page in enumerate(toc_pages):
+                stamper.stamp(page, labels[i])
+
+    for page_ref in manifest:
+        new_page = writer.add_page(readers[page_ref['doc_id']].pages[page_ref['page_index']])
+        if page_ref['rotation']:
+            new_page.rotate(page_ref['rotation'])
+        if labels:
+            stamper.stamp(new_page, labels[len(writer.pages) - 1])
+
+    if add_toc:
+        link_toc_pages(writer, toc_pages, toc_entries, layout)
+    if add_bookmarks:
+        add_outline(writer, toc_entries)
+
+    output = SpooledTemporaryFile(max_size=SPOOL_MAX_BYTES)
+    writer.write(output)
+    output.seek(0)
+    return output
+
+
+def optimize_pdf(pdf_bytes, max_image_dpi=None):
+    """Shrink a merged PDF for upload caps and mobile downloads.
+
+    Identical objects and streams (fonts, logos, form XObjects repeated
+    across source files) are merged by content, unused objects dropped and
+    every stream recompressed. With max_image_dpi, images rendered above
+    that resolution are downsampled to it.
+
+    Returns:
+        (optimized_bytes, report) where report has 'before' and 'after'
+        sizes in bytes and 'images_downsampled' as a bool. The input is
+        returned unchanged if optimizing would not make it smaller.
+    """
+    doc = fitz.open(stream=pdf_bytes, filetype="pdf")
+    try:
+        images_downsampled = False
+        # rewrite_images needs PyMuPDF 1.24.11+
+        if max_image_dpi and hasattr(doc, 'rewrite_images'):
+            doc.rewrite_images(dpi_threshold=max_image_dpi + 1, dpi_target=max_image_dpi)
+            images_downsampled = True
+        optimized = doc.tobytes(
+            garbage=4,  # 4 also merges duplicate streams by content
+            clean=True,
+            deflate=True,
+            deflate_images=True,
+            deflate_fonts=True
+        )
+    finally:
+        doc.close()
+
+    if len(optimized) >= len(pdf_bytes):
+        optimized = pdf_bytes
+    return optimized, {
+        'before': len(pdf_bytes),
+        'after': len(optimized),
+        'images_downsampled': images_downsampled
+    }
@@ -0,0 +1,456 @@
+# pdf_structure.py
+"""Text extraction and heading classification for the accessibility tagger.
+
+Lines are pulled from each page with PyMuPDF (in parallel page chunks for
+long documents) into a LineTable, put in reading order by pdf_layout, then
+classified in a single vectorized pass over its columns. Only extraction
+is cached; classifying takes milliseconds, so it is redone with the
+current thresholds whenever a table is loaded or a threshold changes.
+
+The document's body text is the font size cluster that carries the most
+characters. Larger size clusters become heading levels from largest to
+smallest, and bold lines at body size form the level below them, when set
+off from the text above by whitespace. Sizes a fraction of a point apart
+(13.9pt and 14pt) fall into the same cluster.
+
+Scanned pages, which have images but no text layer, are read with
+Tesseract OCR through PyMuPDF, one page per pool task, and their lines
+join the table like any other text.
+"""
+
+import functools
+import hashlib
+import os
+import tempfile
+import time
+from concurrent.futures import as_completed
+
+import fitz  # PyMuPDF
+import numpy as np
+
+from analysis_cache import content_hash
+from line_table import BODY_LEVEL, TAGS, LineTable
+from pdf_layout import order_lines
+from process_pool import MAX_WORKERS, spawn_pool
+
+# Bump when extraction or the cached table layout changes, so cached
+# analyses are redone. Classification is never cached.
+ANALYZER_VERSION = 4
+
+# get_text("dict") without image blocks, whose pixel data we never use
+EXTRACT_FLAGS = fitz.TEXTFLAGS_DICT & ~fitz.TEXT_PRESERVE_IMAGES
+PARALLEL_MIN_PAGES = 32
+CHUNK_PAGES = 25
+
+OCR_LANGUAGE = os.environ.get('OCR_LANGUAGE', 'eng')  # Tesseract language codes, e.g. 'eng+spa'
+OCR_DPI = int(os.environ.get('OCR_DPI', 300))
+OCR_VERSION = 1  # Bump when OCR output changes, so cached pages are read again
+
+SIZE_STEP = 0.5            # Sizes are rounded to this before clustering
+SIZE_GAP = 0.75            # A larger gap between sizes starts a new cluster
+MIN_HEADING_RATIO = 1.08   # Bold heading clusters are at least this much larger than body
+MIN_PLAIN_HEADING_RATIO = 1.25  # Regular-weight ones need more, so bylines stay body text
+MAX_HEADING_SHARE = 0.3    # A style carrying more of the text than this is body
+MAX_HEADING_CHARS = 200
+MAX_HEADING_WORDS = 25
+SET_OFF_SPACE = 0.4        # Space above a bold body-size heading, as a share of its font size
+
+# The thresholds above that users can tune; heading_levels takes overrides by these names
+DEFAULT_THRESHOLDS = {
+    'size_gap': SIZE_GAP,
+    'min_heading_ratio': MIN_HEADING_RATIO,
+    'min_plain_heading_ratio': MIN_PLAIN_HEADING_RATIO,
+    'max_heading_share': MAX_HEADING_SHARE,
+    'max_heading_chars': MAX_HEADING_CHARS,
+    'max_heading_words': MAX_HEADING_WORDS,
+    'set_off_space': SET_OFF_SPACE,
+}
+
+
+def page_lines(page, page_num, textpage=None):
+    """Return the text lines of one page as dicts, before they are packed into a LineTable.
+
+    Args:
+        textpage: An OCR text page to read instead of the page's text layer
+    """
+    text_elements = []
+    # Maps PyMuPDF's top-left page coordinates back to PDF user space
+    to_pdf = ~page.transformation_matrix
+    blocks = page.get_text("dict", flags=EXTRACT_FLAGS, textpage=textpage)["blocks"]
+
+    for block in blocks:
+        if block["type"] == 0:  # Text block
+            for line in block["lines"]:
+                # Combine all spans in a line into one element
+                line_text = " ".join(span["text"] for span in line["spans"]).strip()
+
+                if line_text and len(line_text) > 1:  # Skip single characters
+                    # Get the largest font in this line (usually the dominant one)
+                    max_font_size = max(span["size"] for span in line["spans"])
+                    fonts = [span["font"] for span in line["spans"]]
+                    is_bold = any("Bold" in font for font in fonts)
+                    is_italic = any("Italic" in font or "Oblique" in font for font in fonts)
+
+                    text_elements.append({
+                        'page': page_num + 1,
+                        'text': line_text,
+                        'font_size': max_font_size,
+                        'fonts': fonts,
+                        'bold': is_bold,
+                        'italic': is_italic,
+                        'y_position': line["bbox"][1],
+                        'bbox': tuple(fitz.Rect(line["bbox"]) * to_pdf),
+                        'char_count': len(line_text),
+                        'word_count': len(line_text.split()),
+                        'ocr': textpage is not None,
+                        'suggested_tag': None,
+                        'user_tag': None
+                    })
+    return text_elements
+
+
+def extract_page_range(path, first, last):
+    """Extract lines from pages [first, last) of a PDF file.
+
+    Runs inside pool workers; every worker opens the same temp file. The
+    lines are returned as a LineTable, which pickles far smaller than dicts.
+    """
+    doc = fitz.open(path)
+    try:
+        return order_lines(LineTable.from_elements(
+            [elem for page_num in range(first, last) for elem in page_lines(doc[page_num], page_num)]
+        ))
+    finally:
+        doc.close()
+
+
+def extract_lines(pdf_bytes, progress=None, executor=None, parallel=True):
+    """Return a LineTable of every text line, in reading order, with the features the classifier uses.
+
+    Documents longer than PARALLEL_MIN_PAGES are extracted in chunks of
+    CHUNK_PAGES across a process pool (PyMuPDF is not thread-safe).
+
+    Args:
+        progress: Optional callback taking (pages_done, total_pages)
+        executor: Process pool to use; one is created for this call if omitted
+        parallel: False to always extract in this process, e.g. inside a pool worker
+    """
+    doc = fitz.open(stream=pdf_bytes, filetype="pdf")
+    num_pages = doc.page_count
+    if num_pages < PARALLEL_MIN_PAGES or not parallel or (executor is None and MAX_WORKERS == 1):
+        try:
+            # Pack each page right away so the line dicts never pile up
+            tables = []
+            for page_num, page in enumerate(doc):
+                tables.append(order_lines(LineTable.from_elements(page_lines(page, page_num))))
+                if progress:
+                    progress(page_num + 1, num_pages)
+            return LineTable.concat(tables)
+        finally:
+            doc.close()
+    doc.close()
+
+    # Workers open the document from a temp file rather than each
+    # receiving a pickled copy of the bytes
+    fd, path = tempfile.mkstemp(suffix='.pdf')
+    own_executor = executor is None
+    if own_executor:
+        executor = spawn_pool()
+    futures = {}
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(pdf_bytes)
+        for first in range(0, num_pages, CHUNK_PAGES):
+            last = min(first + CHUNK_PAGES, num_pages)
+            futures[executor.submit(extract_page_range, path, first, last)] = (first, last)
+
+        chunks = {}
+        pages_done = 0
+        for future in as_completed(futures):
+            first, last = futures[future]
+            chunks[first] = future.result()
+            pages_done += last - first
+            if progress:
+                progress(pages_done, num_pages)
+        return LineTable.concat([chunks[first] for first in sorted(chunks)])
+    finally:
+        for future in futures:
+            future.cancel()
+        if own_executor:
+            executor.shutdown()
+        os.remove(path)
+
+
+@functools.lru_cache(maxsize=None)
+def ocr_available():
+    """Return True when PyMuPDF can find a Tesseract installation"""
+    try:
+        fitz.get_tessdata()
+        return True
+    except RuntimeError:
+        return False
+
+
+def scanned_pages(doc, lines):
+    """Return the 0-based numbers of pages with images but no text layer.
+
+    Lines that came from OCR don't count as a text layer.
+    """
+    text_pages = set(lines.page[~lines.ocr].tolist())
+    return [
+        page_num for page_num, page in enumerate(doc)
+        if page_num + 1 not in text_pages and page.get_images()
+    ]
+
+
+def page_hash(doc, page):
+    """Hash what a page looks like: its content streams, images, size and rotation.
+
+    The same scan appearing in another PDF has the same hash, so its OCR
+    result is reused.
+    """
+    digest = hashlib.sha256(f"{OCR_LANGUAGE}:{OCR_DPI}:{page.rotation}:{tuple(page.rect)}".encode())
+    for xref in page.get_contents():
+        digest.update(doc.xref_stream_raw(xref) or b'')
+    for image in page.get_images(full=True):
+        digest.update(doc.xref_stream_raw(image[0]) or b'')
+    return digest.hexdigest()
+
+
+def ocr_page(path, page_num):
+    """Read one page of a PDF file with OCR.
+
+    Runs inside pool workers.
+
+    Returns:
+        (LineTable of the page in reading order, seconds taken)
+    """
+    start = time.perf_counter()
+    doc = fitz.open(path)
+    try:
+        page = doc[page_num]
+        textpage = page.get_textpage_ocr(language=OCR_LANGUAGE, dpi=OCR_DPI, full=True)
+        lines = order_lines(LineTable.from_elements(page_lines(page, page_num, textpage=textpage)))
+    finally:
+        doc.close()
+    return lines, time.perf_counter() - start
+
+
+def ocr_scanned_pages(pdf_bytes, lines, cache=None, progress=None, executor=None, parallel=True):
+    """Add OCR text for the scanned pages to the lines of a document.
+
+    Pages are looked up in the cache by page_hash first. The rest are read
+    in a process pool, one page per task.
+
+    Args:
+        progress: Optional callback taking (page report, pages_done, total_pages).
+            A report has 'page' (1-based), 'lines', 'seconds', 'cached' and
+            'error', which is set when OCR is unavailable or failed.
+
+    Returns:
+        The LineTable with the OCR lines merged in page order
+    """
+    doc = fitz.open(stream=pdf_bytes, filetype="pdf")
+    try:
+        pages = scanned_pages(doc, lines)
+        hashes = {page_num: page_hash(doc, doc[page_num]) for page_num in pages}
+    finally:
+        doc.close()
+    if not pages:
+        return lines
+
+    done = 0
+
+    def report(page_num, page_table=None, seconds=None, cached=False, error=None):
+        nonlocal done
+        done += 1
+        if progress:
+            progress({
+                'page': page_num + 1,
+                'lines': len(page_table) if page_table is not None else 0,
+                'seconds': seconds,
+                'cached': cached,
+                'error': error,
+            }, done, len(pages))
+
+    tables = [lines]
+    remaining = []
+    for page_num in pages:
+        table = cache.get(hashes[page_num], 'ocr', OCR_VERSION) if cache is not None else None
+        if table is None:
+            remaining.append(page_num)
+            continue
+        page_table = LineTable.from_arrow(table)
+        page_table.page = np.full(len(page_table), page_num + 1, np.int32)  # Cached under any page number
+        tables.append(page_table)
+        report(page_num, page_table, seconds=0.0, cached=True)
+
+    if remaining and not ocr_available():
+        for page_num in remaining:
+            report(page_num, error="OCR is not installed (Tesseract was not found)")
+        remaining = []
+
+    def finish(page_num, result):
+        try:
+            page_table, seconds = result()
+        except Exception as e:
+            report(page_num, error=str(e) or type(e).__name__)
+            return
+        if cache is not None:
+            cache.put(hashes[page_num], 'ocr', OCR_VERSION, page_table.to_arrow())
+        tables.append(page_table)
+        report(page_num, page_table, seconds=seconds)
+
+    if remaining:
+        fd, path = tempfile.mkstemp(suffix='.pdf')
+        own_executor = parallel and executor is None and MAX_WORKERS > 1
+        if own_executor:
+            executor = spawn_pool()
+        futures = {}
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(pdf_bytes)
+            if parallel and executor is not None:
+                futures = {executor.submit(ocr_page, path, page_num): page_num for page_num in remaining}
+                for future in as_completed(futures):
+                    finish(futures[future], future.result)
+            else:
+                for page_num in remaining:
+                    finish(page_num, functools.partial(ocr_page, path, page_num))
+        finally:
+            for future in futures:
+                future.cancel()
+            if own_executor:
+                executor.shutdown()
+            os.remove(path)
+
+    merged = LineTable.concat(tables)
+    # A stable sort keeps each page's reading order
+    return merged.take(np.argsort(merged.page, kind='stable'))
+
+
+def space_before(lines):
+    """Return the whitespace above each line, from the line before it in reading order.
+
+    The first line of a page, and of each column, is set off by definition
+    and gets infinity.
+    """
+    space = np.full(len(lines), np.inf)
+    if len(lines) > 1:
+        gap = lines.bbox[:-1, 1] - lines.bbox[1:, 3]
+        follows = (lines.page[1:] == lines.page[:-1]) & (gap > -lines.font_size[1:])
+        space[1:] = np.where(follows, gap, np.inf)
+    return space
+
+
+def line_features(lines):
+    """Return the per-line features the classifier uses, from a LineTable in reading order"""
+    return {
+        'font_size': lines.font_size,
+        'bold': lines.bold,
+        'char_count': lines.char_count,
+        'word_count': lines.word_count,
+        'space_before': space_before(lines),
+    }
+
+
+def heading_levels(features, thresholds=None):
+    """Return a level per line: 0-2 for H1-H3, BODY_LEVEL for body text.
+
+    Args:
+        thresholds: Optional overrides of DEFAULT_THRESHOLDS
+    """
+    t = {**DEFAULT_THRESHOLDS, **(thresholds or {})}
+    size = features['font_size']
+    chars = features['char_count']
+    if len(size) == 0:
+        return np.zeros(0, dtype=int)
+
+    # Cluster the size histogram: sorted distinct sizes split at wide gaps
+    sizes, size_index = np.unique(np.round(size / SIZE_STEP) * SIZE_STEP, return_inverse=True)
+    cluster_of_size = np.concatenate(([0], np.cumsum(np.diff(sizes) > t['size_gap'])))
+    cluster = cluster_of_size[size_index]
+
+    cluster_chars = np.bincount(cluster, weights=chars)
+    cluster_bold_chars = np.bincount(cluster, weights=chars * features['bold'])
+    cluster_size = np.bincount(cluster, weights=size * chars) / np.maximum(cluster_chars, 1)
+    body = np.argmax(cluster_chars)
+    max_chars = chars.sum() * t['max_heading_share']
+
+    # Heading styles from largest to smallest, then bold body text
+    ratio = cluster_size / cluster_size[body]
+    mostly_bold = cluster_bold_chars * 2 >= cluster_chars
+    larger = np.flatnonzero(
+        (ratio >= np.where(mostly_bold, t['min_heading_ratio'], t['min_plain_heading_ratio']))
+        & (cluster_chars <= max_chars)
+    )
+    larger = larger[np.argsort(-cluster_size[larger])]
+    rank = np.full(len(cluster_chars), -1)
+    rank[larger] = np.arange(len(larger))
+    levels = rank[cluster]
+
+    # Bold text inside a paragraph is emphasis, not a heading
+    set_off = features['space_before'] >= size * t['set_off_space']
+    bold_body = (cluster == body) & features['bold'] & set_off
+    if chars[bold_body].sum() <= max_chars:
+        levels[bold_body] = len(larger)
+
+    # Long lines are text set large (pull quotes, title pages), not headings
+    heading_like = (chars <= t['max_heading_chars']) & (features['word_count'] <= t['max_heading_words'])
+    levels[~heading_like] = -1
+    # Styles past the third heading level share H3
+    return np.where(levels < 0, BODY_LEVEL, np.minimum(levels, BODY_LEVEL - 1))
+
+
+def classify_lines(lines, thresholds=None):
+    """Return a suggested tag for every line"""
+    levels = heading_levels(line_features(lines), thresholds)
+    return np.array(TAGS)[levels].tolist()
+
+
+def suggest_tags(lines, thresholds=None):
+    """Classify every line, storing the suggestions as the lines' tags"""
+    lines.set_suggestions(heading_levels(line_features(lines), thresholds))
+    return lines
+
+
+def reclassify(lines, thresholds=None):
+    """Classify every line again, keeping the tags the user set by hand.
+
+    Returns the number of lines whose tag changed.
+    """
+    return lines.update_suggestions(heading_levels(line_features(lines), thresholds))
+
+
+def analyze_pdf(pdf_bytes, cache=None, progress=None, executor=None, parallel=True, ocr_progress=None,
+                thresholds=None):
+    """Return a PDF's lines with suggested tags, reusing cached extracted lines when there are some.
+
+    Args:
+        cache: AnalysisCache to read and fill, or None
+        thresholds: Passed to heading_levels
+        progress, executor, parallel: Passed to extract_lines on a cache miss
+        ocr_progress: Passed to ocr_scanned_pages as its progress callback
+    """
+    sha = content_hash(pdf_bytes)
+    if cache is not None:
+        table = cache.get(sha, 'lines', ANALYZER_VERSION)
+        if table is not None:
+            return suggest_tags(LineTable.from_arrow(table), thresholds)
+
+    ocr_failed = False
+
+    def on_ocr_page(report, done, total):
+        nonlocal ocr_failed
+        ocr_failed = ocr_failed or report['error'] is not None
+        if ocr_progress:
+            ocr_progress(report, done, total)
+
+    lines = extract_lines(pdf_bytes, progress=progress, executor=executor, parallel=parallel)
+    lines = suggest_tags(ocr_scanned_pages(
+        pdf_bytes, lines, cache=cache, progress=on_ocr_page, executor=executor, parallel=parallel
+    ), thresholds)
+    # Pages OCR could not read are tried again next time, e.g. once Tesseract is installed
+    if cache is not None and not ocr_failed:
+        cache.put(sha, 'lines', ANALYZER_VERSION, lines.to_arrow())
+    return lines
@@ -0,0 +1,378 @@
+# pdf_tagging.py
+"""Structure tree writer for the accessibility tagger.
+
+Turns the reviewed LineTable into a tagged PDF. Every text-showing
+operator in a page's content stream is wrapped in marked content with an
+MCID, and tied to an H1/H2/H3/P structure element through the
+StructTreeRoot and its ParentTree. Text that matches no line is marked as
+an Artifact. Operators are matched to lines by where they start drawing,
+tracked through the graphics and text matrices, and looked up in a
+per-page LineIndex. Structure elements follow the lines' reading order.
+
+Scanned pages have no text operators to wrap, so their OCR lines are
+first written onto the page as invisible text, over the words in the
+page image, and then tagged like any other text.
+
+Pages are rewritten and compressed one at a time, so only one decoded
+content stream is held in memory.
+"""
+
+import math
+from collections import defaultdict
+from itertools import groupby
+from io import BytesIO
+
+import fitz  # PyMuPDF, for the OCR text layer
+import numpy as np
+from pypdf import PdfReader, PdfWriter
+from pypdf.generic import (
+    ArrayObject,
+    BooleanObject,
+    ContentStream,
+    DecodedStreamObject,
+    DictionaryObject,
+    NameObject,
+    NumberObject,
+    TextStringObject,
+)
+
+from line_table import TAGS
+
+STRUCTURE_TYPES = {'H1': '/H1', 'H2': '/H2', 'H3': '/H3', 'Body Text': '/P'}
+MATCH_TOLERANCE = 2.0  # Points a text origin may fall outside its line's box
+INDEX_BAND = 8.0  # Height of a LineIndex bucket, in points
+IDENTITY = [1, 0, 0, 1, 0, 0]
+
+TEXT_SHOW_OPERATORS = {b'Tj', b'TJ', b"'", b'"'}
+# A marked-content sequence is closed before any of these
+SEQUENCE_BREAKS = {b'ET', b'BMC', b'BDC', b'EMC', b'q', b'Q', b'Do', b'BI', b'INLINE IMAGE'}
+
+
+def multiply(m, n):
+    """Multiply two PDF transformation matrices (m applied first)"""
+    a, b, c, d, e, f = m
+    A, B, C, D, E, F = n
+    return [
+        a * A + b * C, a * B + b * D,
+        c * A + d * C, c * B + d * D,
+        e * A + f * C + E, e * B + f * D + F
+    ]
+
+
+def group_lines(lines):
+    """Group consecutive lines into structure elements.
+
+    Lines join the element before them when they are on the same page, have
+    the same tag and follow without a paragraph-sized gap or column jump.
+
+    Returns:
+        (group id per line, structure type per group)
+    """
+    if len(lines) == 0:
+        return np.zeros(0, dtype=int), []
+    gap = lines.bbox[:-1, 1] - lines.bbox[1:, 3]
+    size = lines.font_size[1:]
+    same_run = (
+        (lines.page[1:] == lines.page[:-1])
+        & (lines.user[1:] == lines.user[:-1])
+        & (-size < gap) & (gap < size * 0.5)
+    )
+    starts = np.concatenate(([True], ~same_run))
+    line_groups = np.cumsum(starts) - 1
+    group_types = [STRUCTURE_TYPES[TAGS[code]] for code in lines.user[starts]]
+    return line_groups, group_types
+
+
+def match_line(lines, x, y):
+    """Return the group of the line whose box contains (x, y), or None"""
+    best = None
+    best_distance = MATCH_TOLERANCE
+    for x0, y0, x1, y1, group in lines:
+        dx = max(x0 - x, 0, x - x1)
+        dy = max(y0 - y, 0, y - y1)
+        distance = max(dx, dy)
+        if distance <= best_distance:
+            best, best_distance = group, distance
+            if distance == 0:
+                break
+    return best
+
+
+class LineIndex:
+    """Lines of one page bucketed into horizontal bands, for match_line lookups.
+
+    A text origin is only compared with the lines near its band, so dense
+    pages cost about one comparison per line in the band rather than one
+    per line on the page. Lines keep their reading order within a band.
+    """
+
+    def __init__(self, boxes):
+        self.bands = defaultdict(list)
+        for box in boxes:
+            first = math.floor((box[1] - MATCH_TOLERANCE) / INDEX_BAND)
+            last = math.floor((box[3] + MATCH_TOLERANCE) / INDEX_BAND)
+            for band in range(first, last + 1):
+                self.bands[band].append(box)
+
+    @classmethod
+    def for_page(cls, lines, line_groups, offsets, page):
+        """Index the lines of a page, as (x0, y0, x1, y1, group) boxes"""
+        if page + 1 >= len(offsets):
+            return cls([])
+        rows = slice(offsets[page], offsets[page + 1])
+        return cls(
+            (x0, y0, x1, y1, group)
+            for (x0, y0, x1, y1), group in zip(lines.bbox[rows].tolist(), line_groups[rows].tolist())
+        )
+
+    def match(self, x, y):
+        """Return the group of the line whose box contains (x, y), or None"""
+        return match_line(self.bands.get(math.floor(y / INDEX_BAND), ()), x, y)
+
+
+def has_mcid(operands, properties=None):
+    """Return whether a BDC operator's property list gives an MCID.
+
+    The property list is either inline or named in the page's /Properties
+    resources.
+    """
+    if len(operands) < 2:
+        return False
+    props = operands[1]
+    if isinstance(props, NameObject):
+        props = properties.get(props) if properties is not None else None
+        props = props.get_object() if props is not None else None
+    return isinstance(props, dict) and '/MCID' in props
+
+
+def mark_operations(operations, lines, group_types, properties=None):
+    """Wrap the text-showing operators of a content stream in marked content.
+
+    Marked content that already has an MCID, as in a PDF tagged by Word or
+    by this tool, is removed first, so the page's MCIDs are all new. Text
+    inside an existing Artifact, such as a running header, is left as it
+    is.
+
+    Args:
+        operations: Parsed (operands, operator) pairs of the page
+        lines: LineIndex of the page's lines
+        group_types: Structure type of every group, from group_lines
+        properties: The page's /Properties resource dictionary, if any
+
+    Returns:
+        (rewritten operations, group of each MCID in order)
+    """
+    output = []
+    mcid_groups = []
+    open_key = None  # Group id, 'artifact', or None when no sequence is open
+    marked = []  # For each open BMC/BDC of the input: 'removed', 'artifact' or 'kept'
+
+    ctm = IDENTITY
+    stack = []
+    tm = tlm = IDENTITY
+    leading = rise = 0.0
+    current = None  # Group of the text at the current text position
+    positioned = True
+
+    def close():
+        nonlocal open_key
+        if open_key is not None:
+            output.append(([], b'EMC'))
+            open_key = None
+
+    for operands, operator in operations:
+        if operator in (b'BMC', b'BDC'):
+            if operator == b'BDC' and has_mcid(operands, properties):
+                marked.append('removed')
+                continue
+            marked.append('artifact' if operands and operands[0] == '/Artifact' else 'kept')
+        elif operator == b'EMC' and marked:
+            if marked.pop() == 'removed':
+                continue
+
+        try:
+            if operator == b'q':
+                stack.append(ctm)
+            elif operator == b'Q':
+                ctm = stack.pop() if stack else IDENTITY
+            elif operator == b'cm':
+                ctm = multiply([float(v) for v in operands], ctm)
+            elif operator == b'BT':
+                tm = tlm = IDENTITY
+                positioned = True
+            elif operator == b'Tm':
+                tm = tlm = [float(v) for v in operands]
+                positioned = True
+            elif operator in (b'Td', b'TD'):
+                tx, ty = float(operands[0]), float(operands[1])
+                if operator == b'TD':
+                    leading = -ty
+                tm = tlm = multiply([1, 0, 0, 1, tx, ty], tlm)
+                positioned = True
+            elif operator in (b'T*', b"'", b'"'):
+                tm = tlm = multiply([1, 0, 0, 1, 0, -leading], tlm)
+                positioned = True
+            elif operator == b'TL':
+                leading = float(operands[0])
+            elif operator == b'Ts':
+                rise = float(operands[0])
+        except (ValueError, TypeError, IndexError):
+            pass  # Malformed operands; keep the last known position
+
+        if operator in SEQUENCE_BREAKS:
+            close()
+
+        if operator in TEXT_SHOW_OPERATORS and 'artifact' not in marked:
+            if positioned:
+                # Where the text starts: (0, rise) in text space, through Tm and the CTM
+                x = rise * tm[2] + tm[4]
+                y = rise * tm[3] + tm[5]
+                current = lines.match(
+                    x * ctm[0] + y * ctm[2] + ctm[4],
+                    x * ctm[1] + y * ctm[3] + ctm[5]
+                )
+                # Without glyph widths the position after showing text is unknown,
+                # so text that follows without repositioning stays with this line
+                positioned = False
+            key = 'artifact' if current is None else current
+            if key != open_key:
+                close()
+                if key == 'artifact':
+                    output.append(([NameObject('/Artifact')], b'BMC'))
+                else:
+                    mcid_props = DictionaryObject({NameObject('/MCID'): NumberObject(len(mcid_groups))})
+                    output.append(([NameObject(group_types[key]), mcid_props], b'BDC'))
+                    mcid_groups.append(key)
+                open_key = key
+
+        output.append((operands, operator))
+
+    close()
+    return output, mcid_groups
+
+
+def add_ocr_text(pdf_bytes, lines):
+    """Write the OCR lines of a document onto their pages as invisible text.
+
+    Each line is drawn in render mode 3 from its box's lower left corner
+    and stretched to the box width, so selecting and searching follow the
+    page image too.
+
+    Returns:
+        Bytes of the PDF with the text added
+    """
+    doc = fitz.open(stream=pdf_bytes, filetype="pdf")
+    try:
+        ocr_rows = np.flatnonzero(lines.ocr)
+        for page_num, rows in groupby(ocr_rows.tolist(), key=lambda i: int(lines.page[i])):
+            page = doc[page_num - 1]
+            shape = page.new_shape()
+            for i in rows:
+                rect = fitz.Rect(lines.bbox[i].tolist()) * page.transformation_matrix
+                size = float(lines.font_size[i]) or rect.height
+                # The baseline sits about a fifth of the line height above its bottom
+                origin = fitz.Point(rect.x0, rect.y1 - rect.height * 0.2)
+                width = fitz.get_text_length(lines.text[i], fontname='helv', fontsize=size)
+                morph = (origin, fitz.Matrix(rect.width / width, 1)) if width > 0 else None
+                shape.insert_text(origin, lines.text[i], fontname='helv', fontsize=size, render_mode=3, morph=morph)
+            shape.commit()
+        return doc.tobytes()
+    finally:
+        doc.close()
+
+
+def create_tagged_pdf(original_pdf_bytes, lines, lang='en-US'):
+    """Create a tagged PDF whose structure tree follows the user's tags.
+
+    Args:
+        original_pdf_bytes: The uploaded PDF
+        lines: LineTable from extract_lines, with the user's tags set
+        lang: Natural language of the document for screen readers
+
+    Returns:
+        Bytes of the tagged PDF
+    """
+    if lines.ocr.any():
+        original_pdf_bytes = add_ocr_text(original_pdf_bytes, lines)
+    reader = PdfReader(BytesIO(original_pdf_bytes))
+    writer = PdfWriter()
+
+    line_groups, group_types = group_lines(lines)
+    offsets = lines.page_offsets()
+
+    struct_root = DictionaryObject({NameObject('/Type'): NameObject('/StructTreeRoot')})
+    struct_root_ref = writer._add_object(struct_root)
+    document = DictionaryObject({
+        NameObject('/Type'): NameObject('/StructElem'),
+        NameObject('/S'): NameObject('/Document'),
+        NameObject('/P'): struct_root_ref,
+    })
+    document_ref = writer._add_object(document)
+    document_kids = ArrayObject()
+    parent_tree_nums = ArrayObject()
+
+    for page_num, page in enumerate(reader.pages):
+        contents = page.get_contents()
+        if contents is not None:
+            # Parse, rewrite and compress this page's content before moving on
+            content = ContentStream(contents, reader)
+            resources = page.get('/Resources')
+            properties = resources.get_object().get('/Properties') if resources is not None else None
+            content.operations, mcid_groups = mark_operations(
+                content.operations, LineIndex.for_page(lines, line_groups, offsets, page_num + 1), group_types,
+                properties.get_object() if properties is not None else None
+            )
+            stream = DecodedStreamObject()
+            stream.set_data(content.get_data())
+            page[NameObject('/Contents')] = writer._add_object(stream.flate_encode())
+            del content, stream
+        else:
+            mcid_groups = []
+        page[NameObject('/StructParents')] = NumberObject(page_num)
+        for annotation in page.get('/Annots') or []:
+            # Its key would point into the old ParentTree, or at one of this tree's pages
+            annotation.get_object().pop('/StructParent', None)
+        page_ref = writer.add_page(page).indirect_reference
+
+        # One structure element per group on this page, in reading order
+        elements = {}
+        for mcid, group in enumerate(mcid_groups):
+            if group not in elements:
+                elements[group] = DictionaryObject({
+                    NameObject('/Type'): NameObject('/StructElem'),
+                    NameObject('/S'): NameObject(group_types[group]),
+                    NameObject('/P'): document_ref,
+                    NameObject('/Pg'): page_ref,
+                    NameObject('/K'): ArrayObject(),
+                })
+            elements[group]['/K'].append(NumberObject(mcid))
+        element_refs = {group: writer._add_object(elem) for group, elem in sorted(elements.items())}
+        document_kids.extend(element_refs.values())
+
+        parent_tree_nums.append(NumberObject(page_num))
+        parent_tree_nums.append(writer._add_object(
+            ArrayObject(element_refs[group] for group in mcid_groups)
+        ))
+
+    document[NameObject('/K')] = document_kids
+    struct_root[NameObject('/K')] = document_ref
+    struct_root[NameObject('/ParentTree')] = writer._add_object(
+        DictionaryObject({NameObject('/Nums'): parent_tree_nums})
+    )
+    struct_root[NameObject('/ParentTreeNextKey')] = NumberObject(len(reader.pages))
+
+    catalog = writer._root_object
+    catalog[NameObject('/StructTreeRoot')] = struct_root_ref
+    catalog[NameObject('/MarkInfo')] = DictionaryObject({NameObject('/Marked'): BooleanObject(True)})
+    catalog[NameObject('/Lang')] = TextStringObject(lang)
+    catalog[NameObject('/ViewerPreferences')] = DictionaryObject({
+        NameObject('/DisplayDocTitle'): BooleanObject(True)
+    })
+
+    h1_lines = np.flatnonzero(lines.user == TAGS.index('H1'))
+    title = lines.text[h1_lines[0]] if len(h1_lines) else 'Accessible Document'
+    writer.add_metadata({'/Title': title})
+
+    output = BytesIO()
+    writer.write(output)
+    return output.getvalue()
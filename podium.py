@@ -1,9 +1,11 @@
 import streamlit as st
 import streamlit.components.v1 as components
-from ics import Calendar
 from datetime import datetime, timedelta
 import requests
 
+from ics_events import iter_events
+from recurrence import EventTimeline, as_utc, event_dates
+
 # Import configuration
 from podium_config import CLASS_CALENDARS, DEFAULT_TFW_PROMPT, DEFAULT_TFW_MINUTES, DEFAULT_AGENDA
 
@@ -26,6 +28,21 @@ if 'tfw_minutes' not in st.session_state:
 
 # --- HELPER FUNCTIONS ---
 
+@st.cache_resource(ttl=600)
+def load_calendar(cal_url):
+    """Fetch a calendar feed and index its events, kept for 10 minutes.
+    
+    Returns:
+        EventTimeline of the feed
+        
+    Raises:
+        requests.RequestException: If the feed could not be fetched. Errors
+            are not cached, so the next rerun tries again.
+    """
+    r = requests.get(cal_url, timeout=10)
+    r.raise_for_status()
+    return EventTimeline(list(iter_events(r.text)))
+
 def fetch_calendar_events(cal_url, days_ahead=7):
     """Fetch and parse calendar events from Google Calendar ICS URL.
     
@@ -37,22 +54,24 @@ def fetch_calendar_events(cal_url, days_ahead=7):
         List of formatted event strings with day labels
     """
     try:
-        r = requests.get(cal_url, timeout=10)
-        if r.status_code == 200:
-            c = Calendar(r.text)
-            now = datetime.now().date()
-            sorted_events = sorted(list(c.events), key=lambda x: x.begin)
-            
-            upcoming = []
-            for e in sorted_events:
-                edate = e.begin.date()
-                if now <= edate <= (now + timedelta(days=days_ahead)):
-                    day_label = "Today" if edate == now else edate.strftime('%a')
-                    upcoming.append(
-                        f"{e.name} <span style='color:#38bdf8; font-weight:600; "
-                        f"margin-left:8px;'>({day_label})</span>"
-                    )
-            return upcoming
+        timeline = load_calendar(cal_url)
+        now = datetime.now().date()
+        # Events overlapping the window, which has a day to spare on each side;
+        # multi-day events already underway are listed as today's
+        window = timeline.overlapping(
+            as_utc(now - timedelta(days=1)), as_utc(now + timedelta(days=days_ahead + 2))
+        )
+        
+        upcoming = []
+        for e in window:
+            first_day, last_day = event_dates(e)
+            if first_day <= (now + timedelta(days=days_ahead)) and last_day >= now:
+                day_label = "Today" if first_day <= now else first_day.strftime('%a')
+                upcoming.append(
+                    f"{e.summary} <span style='color:#38bdf8; font-weight:600; "
+                    f"margin-left:8px;'>({day_label})</span>"
+                )
+        return upcoming
     except Exception as e:
         st.warning(f"Could not fetch calendar: {str(e)}")
         return []
@@ -0,0 +1,90 @@
+# process_pool.py
+"""Process pools for page work in the Streamlit apps.
+
+PyMuPDF is not thread-safe, so rendering, extraction and OCR run in
+worker processes. Workers are started with spawn rather than fork: forking
+the Streamlit server would copy its threads' locks in whatever state they
+happen to be in.
+
+A pool shared by every session must survive a worker dying, say when
+MuPDF crashes or runs out of memory on a bad upload. A plain executor is
+broken for good after that, so the shared pools are RestartingPools.
+"""
+
+import multiprocessing
+import os
+import threading
+from concurrent.futures import Future, InvalidStateError, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+MAX_WORKERS = min(4, os.cpu_count() or 1)
+
+
+def spawn_pool(max_workers=MAX_WORKERS):
+    """Return a ProcessPoolExecutor whose workers are started with spawn"""
+    return ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context('spawn'))
+
+
+class RestartingPool:
+    """A spawn pool that replaces its executor once a worker has died.
+
+    Every task that was lost with the dead worker is run once more, alone
+    in a one-worker executor, so a document that kills its worker cannot
+    take the other sessions' retries down with it. If that run dies too,
+    the task's future raises BrokenProcessPool.
+    """
+
+    def __init__(self, max_workers=MAX_WORKERS):
+        self.max_workers = max_workers
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def submit(self, fn, *args):
+        """Schedule fn(*args) and return a Future for its result"""
+        future = Future()
+        try:
+            task = self._executor_submit(fn, args)
+        except Exception as e:
+            future.set_exception(e)
+            return future
+        self._chain(future, task, retry=(fn, args))
+        return future
+
+    def shutdown(self, wait=True):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=wait)
+                self._executor = None
+
+    def _executor_submit(self, fn, args):
+        with self._lock:
+            if self._executor is None:
+                self._executor = spawn_pool(self.max_workers)
+            try:
+                return self._executor.submit(fn, *args)
+            except BrokenProcessPool:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = spawn_pool(self.max_workers)
+                return self._executor.submit(fn, *args)
+
+    def _chain(self, future, task, retry=None):
+        """Settle the caller's future from a task, running (fn, args) alone if the task's worker died"""
+        # Cancelling the caller's future drops the task if it has not started
+        future.add_done_callback(lambda f: f.cancelled() and task.cancel())
+
+        def done(task):
+            try:
+                if task.cancelled():
+                    future.cancel()
+                elif isinstance(task.exception(), BrokenProcessPool) and retry is not None:
+                    executor = spawn_pool(1)
+                    self._chain(future, executor.submit(retry[0], *retry[1]))
+                    executor.shutdown(wait=False)
+                elif task.exception() is not None:
+                    future.set_exception(task.exception())
+                else:
+                    future.set_result(task.result())
+            except InvalidStateError:
+                pass  # Cancelled by the caller meanwhile
+
+        task.add_done_callback(done)
@@ -0,0 +1,211 @@
+# recurrence.py
+"""Occurrences of recurring calendar events within a time window.
+
+A class meeting or a weekly reading quiz is stored in a feed once, as an
+event with an RRULE. EventTimeline expands such series only as far as a
+query asks. Occurrences are generated lazily from the start of the window,
+so a FREQ=DAILY rule with no end never materializes more than the window
+holds. RDATE adds occurrences, EXDATE removes them, and an event with a
+RECURRENCE-ID replaces the occurrence it names. Events that happen once
+are kept in an event_index.IntervalIndex.
+
+Rules are evaluated with dateutil.rrule. For rules without COUNT or
+BYSETPOS, the rule's start is first moved forward by whole intervals to
+just before the window, so a series that began years ago costs no more
+than one that began last week. Monthly and yearly rules are only moved
+when the start falls on a day every month has. RANGE=THISANDFUTURE
+overrides are treated as overriding one occurrence.
+"""
+
+import heapq
+from bisect import bisect_left
+from datetime import datetime, timedelta, timezone
+from itertools import groupby
+
+from dateutil.relativedelta import relativedelta
+from dateutil.rrule import rrulestr
+
+from event_index import IntervalIndex, overlaps, start_of
+from ics_events import parse_date_time
+
+# Rules whose start can be moved forward by a whole number of these steps
+FAST_FORWARD_DAYS = {'DAILY': 1, 'WEEKLY': 7}
+FAST_FORWARD_MONTHS = {'MONTHLY': 1, 'YEARLY': 12}
+
+
+def rule_parts(rule):
+    """Split an RRULE value into {NAME: value}"""
+    return {key.upper(): value for key, _, value in (part.partition('=') for part in rule.split(';') if part)}
+
+
+def utc_until(until, start):
+    """Return an UNTIL value as a UTC date-time, which dateutil needs for timezone-aware starts.
+
+    Date and floating UNTIL values are read in the start's time zone; a
+    date includes the whole day.
+    """
+    moment, is_date = parse_date_time(until, {})
+    if is_date:
+        moment = moment.replace(hour=23, minute=59, second=59)
+    if not until.strip().endswith('Z'):
+        moment = moment.replace(tzinfo=start.tzinfo)
+    return moment.astimezone(timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+
+
+class Series:
+    """One recurring event and the occurrences its overrides replace"""
+
+    def __init__(self, event, overridden=()):
+        self.event = event
+        self.duration = event.end - event.start
+        self.exdates = set(event.exdate) | set(overridden)
+        self.rdates = sorted(set(event.rdate) | {event.start})  # RFC 5545: DTSTART is the first occurrence
+        self.rule = None
+        self.bounded = True  # False for a rule with neither COUNT nor UNTIL
+        self.step_days = None  # Interval of a rule that can be moved forward, in days or months
+        self.step_months = None
+        if event.rrule:
+            # Extension parts such as X-EVOLUTION-ENDDATE mean nothing to dateutil
+            parts = {key: value for key, value in rule_parts(event.rrule).items() if not key.startswith('X-')}
+            try:
+                if 'UNTIL' in parts:
+                    parts['UNTIL'] = utc_until(parts['UNTIL'], event.start)
+                self.rule = rrulestr(';'.join(f'{key}={value}' for key, value in parts.items()), dtstart=event.start)
+                interval = int(parts.get('INTERVAL', 1))
+            except ValueError:
+                # An unreadable rule; the series keeps its DTSTART and RDATE occurrences
+                self.rule = None
+                return
+            self.bounded = 'COUNT' in parts or 'UNTIL' in parts
+            if 'COUNT' not in parts and 'BYSETPOS' not in parts:
+                freq = parts.get('FREQ')
+                if freq in FAST_FORWARD_DAYS:
+                    self.step_days = FAST_FORWARD_DAYS[freq] * interval
+                elif freq in FAST_FORWARD_MONTHS and event.start.day <= 28:
+                    self.step_months = FAST_FORWARD_MONTHS[freq] * interval
+
+    def rule_start(self, after):
+        """The latest start, a whole number of intervals after the series start, well before a moment"""
+        start = self.event.start
+        if self.step_days is not None:
+            # Keep a day's margin so a daylight saving change cannot skip an occurrence
+            steps = (after - start - timedelta(days=1)).days // self.step_days
+            if steps > 0:
+                return start + timedelta(days=steps * self.step_days)
+        elif self.step_months is not None:
+            months = (after.year - start.year) * 12 + after.month - start.month - 1
+            steps = months // self.step_months
+            if steps > 0:
+                return start + relativedelta(months=steps * self.step_months)
+        return None
+
+    def starts(self, after):
+        """Yield the series' occurrence starts at or after a moment, in order"""
+        sources = [self.rdates[bisect_left(self.rdates, after):]]
+        if self.rule is not None:
+            rule = self.rule
+            rule_start = self.rule_start(after)
+            if rule_start is not None:
+                rule = rule.replace(dtstart=rule_start)
+            sources.append(rule.xafter(after, inc=True))
+        for start, _ in groupby(heapq.merge(*sources)):
+            if start not in self.exdates:
+                yield start
+
+    def occurrences(self, after):
+        event = self.event
+        for start in self.starts(after):
+            yield event._replace(
+                start=start, end=start + self.duration, rrule='', rdate=(), exdate=(), recurrence_id=start
+            )
+
+    def last_start(self):
+        """Start of the series' last occurrence, or None if it never ends or has none"""
+        if not self.bounded:
+            return None
+        last = None
+        for last in self.starts(self.event.start):
+            pass
+        return last
+
+    def overlapping(self, t0, t1):
+        """Yield the occurrences overlapping [t0, t1), in start order"""
+        for occurrence in self.occurrences(t0 - self.duration):
+            if occurrence.start >= t1:
+                return
+            if overlaps(occurrence, t0, t1):
+                yield occurrence
+
+
+class EventTimeline:
+    """The events of a feed with recurring series expanded on demand"""
+
+    def __init__(self, events):
+        overrides = {}
+        masters = []
+        single = []  # Events that happen once, including overrides
+        for event in events:
+            if event.recurrence_id is not None:
+                overrides.setdefault(event.uid, []).append(event.recurrence_id)
+                single.append(event)
+            elif event.rrule or event.rdate:
+                masters.append(event)
+            else:
+                single.append(event)
+        self.index = IntervalIndex(single)
+        self.single = self.index.events  # Sorted by start
+        self.series = [Series(event, overrides.get(event.uid, ())) for event in masters]
+
+    def __len__(self):
+        """Number of events and series, not of occurrences"""
+        return len(self.single) + len(self.series)
+
+    def occurrences(self, start, end=None):
+        """Yield the occurrences starting in [start, end), in start order.
+
+        With no end the iterator never stops for a series without an end,
+        so take only as many occurrences as are needed.
+        """
+        first = bisect_left(self.index.starts, start)
+        sources = [map(self.single.__getitem__, range(first, len(self.single)))]
+        sources.extend(series.occurrences(start) for series in self.series)
+        for occurrence in heapq.merge(*sources, key=start_of):
+            if end is not None and occurrence.start >= end:
+                return
+            yield occurrence
+
+    def between(self, start, end):
+        """Return the occurrences starting in [start, end) as a list"""
+        return list(self.occurrences(start, end))
+
+    def overlapping(self, t0, t1):
+        """Return the occurrences overlapping [t0, t1), in start order"""
+        sources = [self.index.overlapping(t0, t1)]
+        sources.extend(series.overlapping(t0, t1) for series in self.series)
+        return list(heapq.merge(*sources, key=start_of))
+
+    def first_start(self):
+        """Start of the earliest event or series, or None if there are none"""
+        starts = self.index.starts[:1] + [series.event.start for series in self.series]
+        return min(starts) if starts else None
+
+    def last_start(self):
+        """Start of the latest occurrence of a single event or ending series.
+
+        Series that never end are left out. Returns None if nothing else
+        is left.
+        """
+        starts = self.index.starts[-1:] + [series.last_start() for series in self.series]
+        starts = [start for start in starts if start is not None]
+        return max(starts) if starts else None
+
+
+def as_utc(day):
+    """Midnight UTC at the start of a date, for window bounds"""
+    return datetime(day.year, day.month, day.day, tzinfo=timezone.utc)
+
+
+def event_dates(event):
+    """Return the first and last dates an event covers, in its own time zone"""
+    last = event.end - timedelta(microseconds=1) if event.end > event.start else event.start
+    return event.start.date(), last.date()
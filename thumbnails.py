@@ -0,0 +1,167 @@
+# thumbnails.py
+"""Thumbnail rendering and on-disk cache for the PDF editor.
+
+Thumbnails are PNG bytes cached on disk under a key built from the
+document's content id, the page index and the render scale, so the same
+upload never renders twice. Misses are rendered in a process pool
+(PyMuPDF is not thread-safe) and the least recently used files are
+evicted once the cache grows past its size budget.
+"""
+
+import math
+import os
+import tempfile
+import threading
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial
+
+import fitz
+
+from disk_cache import DiskCache
+from process_pool import MAX_WORKERS, RestartingPool
+
+THUMBNAIL_SCALE = 0.3
+CACHE_DIR = os.environ.get(
+    'THUMBNAIL_CACHE_DIR',
+    os.path.join(tempfile.gettempdir(), 'faculty-tools-thumbnails')
+)
+CACHE_MAX_BYTES = 256 * 1024 * 1024
+
+
+def render_pages(path, page_indexes, scale=THUMBNAIL_SCALE):
+    """Render PNG thumbnails for some pages of a PDF file.
+
+    Runs inside pool workers, so the document is opened once per chunk.
+
+    Returns:
+        List of (page_index, png_bytes) pairs
+    """
+    doc = fitz.open(path)
+    try:
+        return [
+            (i, doc[i].get_pixmap(matrix=fitz.Matrix(scale, scale)).tobytes("png"))
+            for i in page_indexes
+        ]
+    finally:
+        doc.close()
+
+
+def read_file(path):
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+def write_file(path, data):
+    with open(path, 'wb') as f:
+        f.write(data)
+
+
+class ThumbnailCache(DiskCache):
+    """Disk cache of PNG thumbnails"""
+
+    suffix = '.png'
+
+    def __init__(self, cache_dir=CACHE_DIR, max_bytes=CACHE_MAX_BYTES):
+        super().__init__(cache_dir, max_bytes)
+
+    @staticmethod
+    def key(doc_id, page_index, scale=THUMBNAIL_SCALE):
+        return f"{doc_id}-{page_index}-{scale:g}"
+
+    def get(self, key):
+        """Return cached PNG bytes, or None on a miss"""
+        return self._read(key, read_file)
+
+    def put(self, key, data):
+        """Store PNG bytes and evict old entries if over budget"""
+        self._write(key, partial(write_file, data=data))
+
+
+class ThumbnailService:
+    """Serve thumbnails from the disk cache, rendering misses in a process pool"""
+
+    def __init__(self, cache=None, max_workers=MAX_WORKERS, scale=THUMBNAIL_SCALE):
+        self.cache = cache or ThumbnailCache()
+        self.max_workers = max_workers
+        self.scale = scale
+        self._pool = None
+        self._pending = set()
+        self._lock = threading.Lock()
+
+    def _get_pool(self):
+        if self._pool is None:
+            self._pool = RestartingPool(self.max_workers)
+        return self._pool
+
+    def _submit(self, pdf_bytes, doc_id, page_indexes):
+        """Split page_indexes into one chunk per worker and submit them.
+
+        Workers open the document from a temp file rather than each
+        receiving a pickled copy of the bytes. The file is removed once
+        every chunk is done.
+        """
+        if callable(pdf_bytes):
+            pdf_bytes = pdf_bytes()
+        fd, path = tempfile.mkstemp(suffix='.pdf')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(pdf_bytes)
+        chunk_size = math.ceil(len(page_indexes) / self.max_workers)
+        chunks = [page_indexes[start:start + chunk_size] for start in range(0, len(page_indexes), chunk_size)]
+        remaining = [len(chunks)]
+
+        def chunk_done(chunk, future):
+            self._store(doc_id, chunk, future)
+            with self._lock:
+                remaining[0] -= 1
+                if remaining[0]:
+                    return
+            os.remove(path)
+
+        futures = []
+        for chunk in chunks:
+            future = self._get_pool().submit(render_pages, path, chunk, self.scale)
+            future.add_done_callback(partial(chunk_done, chunk))
+            futures.append(future)
+        return futures
+
+    def _store(self, doc_id, chunk, future):
+        with self._lock:
+            self._pending.difference_update((doc_id, i) for i in chunk)
+        if not future.cancelled() and future.exception() is None:
+            for i, png in future.result():
+                self.cache.put(self.cache.key(doc_id, i, self.scale), png)
+
+    def get_thumbnails(self, pdf_bytes, doc_id, page_indexes):
+        """Return {page_index: png_bytes} for the requested pages, rendering misses.
+
+        pdf_bytes may be a callable returning the bytes, so stored documents
+        are only loaded when something actually needs rendering.
+        """
+        thumbnails = {}
+        missing = []
+        for i in page_indexes:
+            png = self.cache.get(self.cache.key(doc_id, i, self.scale))
+            if png is None:
+                missing.append(i)
+            else:
+                thumbnails[i] = png
+
+        if missing:
+            for future in self._submit(pdf_bytes, doc_id, missing):
+                try:
+                    thumbnails.update(future.result())
+                except BrokenProcessPool:
+                    pass  # The pages kill their worker; leave them without thumbnails
+        return thumbnails
+
+    def prefetch(self, pdf_bytes, doc_id, page_indexes):
+        """Render uncached pages in the background without waiting for them"""
+        with self._lock:
+            missing = [
+                i for i in page_indexes
+                if (doc_id, i) not in self._pending
+                and not self.cache.contains(self.cache.key(doc_id, i, self.scale))
+            ]
+            self._pending.update((doc_id, i) for i in missing)
+        if missing:
+            self._submit(pdf_bytes, doc_id, missing)